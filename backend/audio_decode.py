@@ -0,0 +1,134 @@
+"""
+In-memory audio decoding for transcription.
+Uploads are piped through ffmpeg (stdin -> stdout) into 16 kHz mono PCM and
+wrapped in a WAV header in memory, so neither the upload nor the converted
+audio has to touch disk before whisper sees it.
+"""
+
+import io
+import logging
+import os
+import subprocess
+import wave
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Content types whisper.cpp can read directly without re-encoding
+WAV_CONTENT_TYPES = ("audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave")
+
+# Archive file extension per upload content type
+_EXTENSIONS = {
+    "audio/webm": ".webm",
+    "video/webm": ".webm",
+    "audio/ogg": ".ogg",
+    "audio/mpeg": ".mp3",
+    "audio/mp4": ".m4a",
+    "audio/flac": ".flac",
+}
+
+
+class AudioDecodeError(Exception):
+    """Raised when ffmpeg cannot decode an upload."""
+
+
+def extension_for(content_type: str) -> str:
+    """File extension matching the upload's real container format."""
+    base_type = (content_type or "").split(";")[0].strip().lower()
+    if base_type in WAV_CONTENT_TYPES:
+        return ".wav"
+    return _EXTENSIONS.get(base_type, ".bin")
+
+
+def needs_decode(content_type: str) -> bool:
+    """True unless the upload is already a WAV file."""
+    return extension_for(content_type) != ".wav"
+
+
+def decode_to_pcm(audio_bytes: bytes, sample_rate: int = WHISPER_SAMPLE_RATE,
+                  timeout: float = 30) -> bytes:
+    """Decode any ffmpeg-readable upload to raw 16-bit mono PCM via pipes."""
+    result = subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate), "-ac", "1",
+        "pipe:1"
+    ], input=audio_bytes, capture_output=True, timeout=timeout)
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        logger.error(f"FFmpeg decode failed: {stderr}")
+        raise AudioDecodeError(f"Audio conversion failed: {stderr}")
+    return result.stdout
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> bytes:
+    """Wrap raw 16-bit mono PCM in a WAV header."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def wav_pcm(wav_bytes: bytes) -> Optional[bytes]:
+    """Raw frames of a 16 kHz mono 16-bit WAV, or None for any other audio."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (WHISPER_SAMPLE_RATE, 1, 2):
+                return None
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError, RuntimeError):
+        # RuntimeError: wave cannot skip past a truncated chunk
+        return None
+
+
+def to_whisper_wav(audio_bytes: bytes, content_type: str) -> bytes:
+    """Return WAV bytes whisper can consume, decoding in memory if needed."""
+    if not needs_decode(content_type):
+        return audio_bytes
+    return pcm_to_wav(decode_to_pcm(audio_bytes))
+
+
+class StreamingDecoder:
+    """
+    Long-running ffmpeg process that decodes a live compressed stream
+    (e.g. WebM/Opus from MediaRecorder) to 16 kHz mono PCM as it arrives.
+    write() and read() block, so call them from worker threads.
+    """
+
+    def __init__(self, sample_rate: int = WHISPER_SAMPLE_RATE):
+        self._process = subprocess.Popen([
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ar", str(sample_rate), "-ac", "1",
+            "pipe:1"
+        ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def write(self, data: bytes):
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            raise AudioDecodeError(f"Audio decoder stopped: {str(e)}")
+
+    def read(self, size: int = 64 * 1024) -> bytes:
+        """Next block of decoded PCM; b"" once the stream has ended."""
+        return os.read(self._process.stdout.fileno(), size)
+
+    def close_input(self):
+        """Signal end of stream so ffmpeg flushes its remaining output."""
+        if not self._process.stdin.closed:
+            self._process.stdin.close()
+
+    def close(self):
+        self.close_input()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
@@ -0,0 +1,310 @@
+"""
+Batch summarization jobs.
+A batch selects sessions by filter (no summary yet, a start_ts range, a
+session type), records them as pending items in SQLite and summarizes them
+with a bounded number of concurrent LLM calls. Each finished session is
+checkpointed as it completes, so a batch interrupted by a restart resumes
+with the sessions still pending, and its status reports throughput and an ETA.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from chunked_transcription import stitch
+from database import db_cursor
+from job_queue import QUEUED, RUNNING, COMPLETED
+from llm_client import generate_structured
+from routes.summarize import load_prompt_template, store_parsed_summary, SUMMARY_OUTPUT
+
+logger = logging.getLogger(__name__)
+
+CANCELLED = "cancelled"
+
+# Item states
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def select_sessions(missing_summary: bool = True, start_ts: Optional[int] = None,
+                    end_ts: Optional[int] = None, session_type: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[str]:
+    """Sessions with a transcript matching the filter, oldest first. end_ts is exclusive."""
+    clauses = ["EXISTS (SELECT 1 FROM transcripts t WHERE t.session_id = s.session_id)"]
+    params: List[Any] = []
+    if missing_summary:
+        clauses.append("NOT EXISTS (SELECT 1 FROM summaries m WHERE m.session_id = s.session_id)")
+    if start_ts is not None:
+        clauses.append("s.start_ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        clauses.append("s.start_ts < ?")
+        params.append(end_ts)
+    if session_type is not None:
+        clauses.append("s.session_type = ?")
+        params.append(session_type)
+    sql = f"SELECT s.session_id FROM sessions s WHERE {' AND '.join(clauses)} ORDER BY s.start_ts"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row["session_id"] for row in cursor.fetchall()]
+
+
+def _session_input(session_id: str) -> Tuple[str, str]:
+    """
+    Session type and full transcript. Chunked and live sessions store each
+    chunk's row plus the stitched full row (chunk_id NULL), so the full row
+    is used; chunk rows are stitched only when a session has no full row.
+    """
+    with db_cursor() as cursor:
+        cursor.execute("SELECT session_type FROM sessions WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError("Session not found")
+        cursor.execute(
+            """SELECT text FROM transcripts WHERE session_id = ? AND chunk_id IS NULL
+               ORDER BY created_ts DESC, transcript_id DESC LIMIT 1""",
+            (session_id,)
+        )
+        full = cursor.fetchone()
+        if full is not None:
+            transcript = full["text"] or ""
+        else:
+            cursor.execute(
+                "SELECT text FROM transcripts WHERE session_id = ? ORDER BY created_ts, transcript_id",
+                (session_id,)
+            )
+            transcript = stitch([r["text"] for r in cursor.fetchall() if r["text"]])
+    if not transcript.strip():
+        raise ValueError("Session has no transcript")
+    return row["session_type"], transcript
+
+
+async def summarize_session(session_id: str, bypass_cache: bool = False):
+    """Summarize one stored session with the single-prompt template and store the result."""
+    session_type, transcript = await asyncio.to_thread(_session_input, session_id)
+    parsed = await generate_structured(
+        load_prompt_template(session_type), {"transcript": transcript}, SUMMARY_OUTPUT,
+        bypass_cache=bypass_cache)
+    await asyncio.to_thread(store_parsed_summary, session_id, parsed, True)
+
+
+class BatchRunner:
+    """Creates batches, runs them on the event loop and reports their progress."""
+
+    def __init__(self, default_concurrency: int, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.default_concurrency = max(1, min(default_concurrency, self.max_concurrency))
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def create(self, filters: Dict[str, Any], concurrency: Optional[int] = None,
+               bypass_cache: bool = False) -> str:
+        """Record a batch and its sessions (all pending); returns batch_id."""
+        session_ids = select_sessions(**filters)
+        concurrency = max(1, min(concurrency or self.default_concurrency, self.max_concurrency))
+        batch_id = uuid.uuid4().hex
+        now = _now_ms()
+
+        with db_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO summary_batches (batch_id, status, filter_json, concurrency, bypass_cache,
+                   total, created_ts, finished_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (batch_id, QUEUED if session_ids else COMPLETED, json.dumps(filters), concurrency,
+                 int(bypass_cache), len(session_ids), now, None if session_ids else now)
+            )
+            cursor.executemany(
+                "INSERT INTO summary_batch_items (batch_id, session_id, status) VALUES (?, ?, ?)",
+                [(batch_id, session_id, PENDING) for session_id in session_ids]
+            )
+        logger.info(f"Created summary batch {batch_id}: {len(session_ids)} sessions, concurrency {concurrency}")
+        return batch_id
+
+    def start(self, batch_id: str) -> bool:
+        """Run a batch in the background on the current event loop; False if it is already running."""
+        task = self._tasks.get(batch_id)
+        if task is not None and not task.done():
+            return False
+        self._tasks[batch_id] = asyncio.create_task(self.run(batch_id))
+        return True
+
+    async def run(self, batch_id: str):
+        """Summarize every pending session of a batch, checkpointing each one."""
+        batch = await asyncio.to_thread(self._load, batch_id)
+        if batch is None or batch["status"] in (COMPLETED, CANCELLED):
+            return
+        # Reversed so workers popping from the end take the oldest sessions first
+        pending = list(reversed(await asyncio.to_thread(self._pending_sessions, batch_id)))
+        await asyncio.to_thread(self._mark_running, batch_id)
+
+        async def worker():
+            while pending:
+                session_id = pending.pop()
+                started = time.monotonic()
+                try:
+                    await summarize_session(session_id, bypass_cache=bool(batch["bypass_cache"]))
+                    status, error = DONE, None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    status, error = FAILED, str(getattr(e, "detail", None) or e)
+                    logger.warning(f"Batch {batch_id}: session {session_id} failed: {error}")
+                elapsed_ms = int((time.monotonic() - started) * 1000)
+                await asyncio.to_thread(self._checkpoint, batch_id, session_id, status, error, elapsed_ms)
+
+        await asyncio.gather(*(worker() for _ in range(min(batch["concurrency"], len(pending)))))
+        await asyncio.to_thread(self._finish, batch_id, COMPLETED)
+        status = await asyncio.to_thread(self.status, batch_id)
+        logger.info(f"Summary batch {batch_id} finished: {status['counts']}, {status['throughput']}")
+
+    def cancel(self, batch_id: str) -> bool:
+        """Stop a batch; sessions already summarized keep their summaries. False if unknown or finished."""
+        batch = self._load(batch_id)
+        if batch is None or batch["status"] in (COMPLETED, CANCELLED):
+            return False
+        task = self._tasks.pop(batch_id, None)
+        if task is not None:
+            task.cancel()
+        self._finish(batch_id, CANCELLED)
+        return True
+
+    def retry_failed(self, batch_id: str) -> bool:
+        """Put a batch's failed sessions back to pending and run it again. False if unknown or running."""
+        batch = self._load(batch_id)
+        task = self._tasks.get(batch_id)
+        if batch is None or (task is not None and not task.done()):
+            return False
+        with db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE summary_batch_items SET status = ?, error = NULL WHERE batch_id = ? AND status = ?",
+                (PENDING, batch_id, FAILED)
+            )
+            cursor.execute(
+                "UPDATE summary_batches SET status = ?, finished_ts = NULL WHERE batch_id = ?",
+                (QUEUED, batch_id)
+            )
+        return self.start(batch_id)
+
+    def resume_unfinished(self) -> List[str]:
+        """Restart batches left queued or running by a previous process."""
+        with db_cursor() as cursor:
+            cursor.execute(
+                "SELECT batch_id FROM summary_batches WHERE status IN (?, ?) ORDER BY created_ts",
+                (QUEUED, RUNNING)
+            )
+            batch_ids = [row["batch_id"] for row in cursor.fetchall()]
+        for batch_id in batch_ids:
+            logger.info(f"Resuming summary batch {batch_id}")
+            self.start(batch_id)
+        return batch_ids
+
+    async def shutdown(self):
+        """Stop running batches without marking them cancelled, so the next startup resumes them."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def status(self, batch_id: str) -> Optional[dict]:
+        """Batch state with per-status counts, throughput and an ETA; None if unknown."""
+        batch = self._load(batch_id)
+        if batch is None:
+            return None
+        with db_cursor() as cursor:
+            cursor.execute(
+                """SELECT status, COUNT(*) AS n, AVG(elapsed_ms) AS avg_ms
+                   FROM summary_batch_items WHERE batch_id = ? GROUP BY status""",
+                (batch_id,)
+            )
+            rows = {row["status"]: row for row in cursor.fetchall()}
+            cursor.execute(
+                """SELECT session_id, error FROM summary_batch_items
+                   WHERE batch_id = ? AND status = ? ORDER BY finished_ts DESC LIMIT 20""",
+                (batch_id, FAILED)
+            )
+            failures = [{"session_id": row["session_id"], "error": row["error"]} for row in cursor.fetchall()]
+
+        counts = {state: rows[state]["n"] if state in rows else 0 for state in (PENDING, DONE, FAILED)}
+        processed = counts[DONE] + counts[FAILED]
+        elapsed_sec = None
+        if batch["started_ts"] is not None:
+            elapsed_sec = ((batch["finished_ts"] or _now_ms()) - batch["started_ts"]) / 1000
+        rate = processed / elapsed_sec if elapsed_sec else 0.0
+        return {
+            "batch_id": batch_id,
+            "status": batch["status"],
+            "filter": json.loads(batch["filter_json"]),
+            "concurrency": batch["concurrency"],
+            "total": batch["total"],
+            "counts": counts,
+            "progress": processed / batch["total"] if batch["total"] else 1.0,
+            "created_ts": batch["created_ts"],
+            "started_ts": batch["started_ts"],
+            "finished_ts": batch["finished_ts"],
+            "throughput": {
+                "elapsed_sec": round(elapsed_sec, 3) if elapsed_sec is not None else None,
+                "sessions_per_min": round(rate * 60, 2),
+                "avg_session_ms": round(rows[DONE]["avg_ms"]) if DONE in rows else None,
+                "eta_sec": round(counts[PENDING] / rate, 1) if rate and counts[PENDING] else None,
+            },
+            "recent_failures": failures,
+        }
+
+    def list_batches(self, limit: int = 20) -> List[dict]:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT batch_id FROM summary_batches ORDER BY created_ts DESC LIMIT ?", (limit,))
+            batch_ids = [row["batch_id"] for row in cursor.fetchall()]
+        return [self.status(batch_id) for batch_id in batch_ids]
+
+    def _load(self, batch_id: str) -> Optional[dict]:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT * FROM summary_batches WHERE batch_id = ?", (batch_id,))
+            row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def _pending_sessions(self, batch_id: str) -> List[str]:
+        with db_cursor() as cursor:
+            cursor.execute(
+                """SELECT i.session_id FROM summary_batch_items i JOIN sessions s ON s.session_id = i.session_id
+                   WHERE i.batch_id = ? AND i.status = ? ORDER BY s.start_ts""",
+                (batch_id, PENDING)
+            )
+            return [row["session_id"] for row in cursor.fetchall()]
+
+    def _mark_running(self, batch_id: str):
+        with db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE summary_batches SET status = ?, started_ts = COALESCE(started_ts, ?) WHERE batch_id = ?",
+                (RUNNING, _now_ms(), batch_id)
+            )
+
+    def _checkpoint(self, batch_id: str, session_id: str, status: str, error: Optional[str], elapsed_ms: int):
+        with db_cursor() as cursor:
+            cursor.execute(
+                """UPDATE summary_batch_items SET status = ?, error = ?, elapsed_ms = ?, finished_ts = ?
+                   WHERE batch_id = ? AND session_id = ?""",
+                (status, error, elapsed_ms, _now_ms(), batch_id, session_id)
+            )
+
+    def _finish(self, batch_id: str, status: str):
+        # A cancel that raced the last checkpoint keeps its status
+        with db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE summary_batches SET status = ?, finished_ts = ? WHERE batch_id = ? AND status IN (?, ?)",
+                (status, _now_ms(), batch_id, QUEUED, RUNNING)
+            )
+
+
+runner = BatchRunner(config.CARELINK_BATCH_CONCURRENCY, config.CARELINK_OLLAMA_MAX_CONCURRENCY)
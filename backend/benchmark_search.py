@@ -0,0 +1,123 @@
+"""
+Benchmark full-text search latency.
+
+Fills a scratch database with synthetic care-session transcripts and
+summaries (written through the FTS triggers, as the app writes them), then
+times /api/search queries against a LIKE scan of transcripts.text.
+
+Usage:
+    python benchmark_search.py [--transcripts 100000] [--per-session 4] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import database
+import search
+
+_VOCABULARY = (
+    "morning afternoon evening breakfast lunch dinner tea medication pill garden walk radio "
+    "daughter son grandson neighbour doctor nurse church music photo album blanket window "
+    "calm tired restless confused cheerful worried asked remembered forgot looked sat laughed "
+    "kitchen bedroom door keys coat shoes bus car home weather rain sunshine birthday letter"
+).split()
+_PHRASES = ("where is my husband", "when is my daughter coming", "did I take my pills",
+            "I want to go home", "who are you")
+
+QUERIES = ("husband", "where is my husband", "daughter coming", "pills", "garden walk", "go home", "birthday")
+
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """Care vocabulary followed by filler words; drawn with Zipf-like weights so term frequencies look natural."""
+    syllables = ["ba", "ko", "ri", "te", "mu", "sa", "lo", "ne", "pi", "du", "ga", "vo"]
+    filler = {"".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size * 2)}
+    return list(_VOCABULARY) + sorted(filler)[:size - len(_VOCABULARY)]
+
+
+def _sentence(rng: random.Random, vocabulary: List[str], weights: List[float]) -> str:
+    words = rng.choices(vocabulary, weights=weights, k=rng.randint(25, 60))
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(_PHRASES))
+    return " ".join(words).capitalize() + "."
+
+
+def populate(transcripts: int, per_session: int, seed: int = 7) -> float:
+    """Insert the synthetic corpus; returns seconds spent (including index maintenance)."""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    # Care words are spread through the ranks rather than all being the most common
+    rng.shuffle(vocabulary)
+    weights = [1 / (rank + 10) for rank in range(len(vocabulary))]
+    started = time.perf_counter()
+    start_ts = 1700000000000
+    with database.db_cursor() as cursor:
+        for i in range(0, transcripts, per_session):
+            session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            ts = start_ts + i * 60000
+            cursor.execute("INSERT INTO sessions (session_id, session_type, start_ts) VALUES (?, ?, ?)",
+                           (session_id, rng.choice(("freeform", "medication", "sundowning")), ts))
+            cursor.executemany(
+                "INSERT INTO transcripts (session_id, text, word_count, created_ts) VALUES (?, ?, ?, ?)",
+                [(session_id, text, len(text.split()), ts + n) for n, text in
+                 ((n, _sentence(rng, vocabulary, weights)) for n in range(min(per_session, transcripts - i)))]
+            )
+            cursor.execute("INSERT INTO summaries (session_id, summary_text, created_ts) VALUES (?, ?, ?)",
+                           (session_id, _sentence(rng, vocabulary, weights), ts))
+    return time.perf_counter() - started
+
+
+def _time(func: Callable[[], object], repeat: int) -> List[float]:
+    func()  # warm the page cache
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _like_scan(text: str) -> int:
+    with database.db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM transcripts WHERE text LIKE ?", (f"%{text}%",))
+        return cursor.fetchone()[0]
+
+
+def _p95(samples: List[float]) -> float:
+    return sorted(samples)[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transcripts", type=int, default=100000)
+    parser.add_argument("--per-session", type=int, default=4, help="transcript chunks per session")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--db", help="database file to use (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="search-bench-") as scratch:
+        database.DB_PATH = args.db or os.path.join(scratch, "bench.db")
+        database.init_database()
+        elapsed = populate(args.transcripts, args.per_session)
+        print(f"Inserted {args.transcripts} transcripts in {elapsed:.1f}s "
+              f"({args.transcripts / elapsed:.0f}/s including FTS triggers)")
+
+        print(f"{'query':<26} {'matches':>8} {'fts p50':>9} {'fts p95':>9} {'LIKE p50':>9}")
+        for query in QUERIES:
+            total = search.search(query, limit=20)["total"]
+            fts = _time(lambda: search.search(query, limit=20), args.repeat)
+            like = _time(lambda: _like_scan(query), max(3, args.repeat // 5))
+            print(f"{query:<26} {total:>8} {statistics.median(fts):>7.1f}ms {_p95(fts):>7.1f}ms "
+                  f"{statistics.median(like):>7.1f}ms")
+        database.close_all_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Declarative prompt chains.
+Each session type's chain is a JSON file under chains/ listing its stages,
+the prompt each stage formats, where each placeholder's value comes from
+(a chain input such as the transcript, or an earlier stage's output) and the
+JSON shape the stage returns. Stages form a DAG: a stage starts as soon as
+the stages it reads from have finished, so independent stages run
+concurrently. Adding a session type means adding a chain file and its
+prompts, not a Python module.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+import config
+import prompt_registry
+from llm_client import generate_from_template, stream_from_template, parse_or_repair
+from prompt_registry import PromptTemplateError
+from structured_output import StructuredOutput, StructuredOutputError
+
+logger = logging.getLogger(__name__)
+
+# Values supplied by the caller rather than produced by a stage
+CHAIN_INPUTS = ("transcript",)
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+class ChainDefinitionError(Exception):
+    """Raised when a chain file is malformed or its stages do not form a DAG."""
+
+
+class ChainStage:
+    """One LLM call in a chain."""
+
+    def __init__(self, name: str, prompt: str, inputs: Dict[str, str],
+                 output_schema: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.prompt = prompt
+        # placeholder -> chain input or stage name
+        self.inputs = dict(inputs)
+        self.output_schema = output_schema or {"type": "object"}
+        # Sent to Ollama as `format`; replies are checked against the required fields
+        self.output = StructuredOutput(self.output_schema, validate=lambda data: check_output(self, data),
+                                       name=f"stage {name}")
+
+    @property
+    def depends_on(self) -> List[str]:
+        return list(dict.fromkeys(source for source in self.inputs.values() if source not in CHAIN_INPUTS))
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "prompt": self.prompt,
+            "inputs": self.inputs,
+            "depends_on": self.depends_on,
+            "output_schema": self.output_schema,
+        }
+
+
+class ChainDefinition:
+    """A session type's stages, in dependency order."""
+
+    def __init__(self, name: str, stages: List[ChainStage], summary_stage: Optional[str] = None,
+                 description: str = ""):
+        self.name = name
+        self.description = description
+        self.summary_stage = summary_stage
+        self.stages = _topological_order(name, stages)
+        if summary_stage is not None and summary_stage not in self.stage_names:
+            raise ChainDefinitionError(f"{name}: summary_stage {summary_stage!r} is not a stage")
+
+    @property
+    def stage_names(self) -> List[str]:
+        return [stage.name for stage in self.stages]
+
+    def stage(self, name: str) -> ChainStage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChainDefinition":
+        try:
+            stages = [
+                ChainStage(s["name"], s["prompt"], s.get("inputs", {}), s.get("output_schema"))
+                for s in data["stages"]
+            ]
+            return cls(data["name"], stages, data.get("summary_stage"), data.get("description", ""))
+        except (KeyError, TypeError) as e:
+            raise ChainDefinitionError(f"malformed chain definition: missing {str(e)}")
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "summary_stage": self.summary_stage,
+            "stages": [stage.info() for stage in self.stages],
+        }
+
+
+def _topological_order(chain: str, stages: List[ChainStage]) -> List[ChainStage]:
+    """Order stages so every stage follows the ones it reads from; reject cycles."""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name or stage.name in CHAIN_INPUTS:
+            raise ChainDefinitionError(f"{chain}: duplicate stage name {stage.name!r}")
+        by_name[stage.name] = stage
+    for stage in stages:
+        unknown = [d for d in stage.depends_on if d not in by_name]
+        if unknown:
+            raise ChainDefinitionError(f"{chain}: stage {stage.name!r} reads unknown input {unknown[0]!r}")
+
+    ordered, visiting, placed = [], set(), set()
+
+    def visit(stage: ChainStage):
+        if stage.name in placed:
+            return
+        if stage.name in visiting:
+            raise ChainDefinitionError(f"{chain}: stages form a cycle through {stage.name!r}")
+        visiting.add(stage.name)
+        for dependency in stage.depends_on:
+            visit(by_name[dependency])
+        visiting.discard(stage.name)
+        placed.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def load_chain_definitions(directory: str) -> Dict[str, ChainDefinition]:
+    """Load every chains/*.json file and register each stage's placeholders with the prompt registry."""
+    chains = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                definition = ChainDefinition.from_dict(json.load(f))
+        except ValueError as e:
+            raise ChainDefinitionError(f"{os.path.basename(path)}: {str(e)}")
+        chains[definition.name] = definition
+        for stage in definition.stages:
+            prompt_registry.registry.expect(stage.prompt, set(stage.inputs))
+    return chains
+
+
+def check_output(stage: ChainStage, data: dict) -> dict:
+    """Enforce the stage's required fields; log fields of the wrong type."""
+    schema = stage.output_schema
+    missing = [field for field in schema.get("required", []) if field not in data]
+    if missing:
+        raise StructuredOutputError(f"Stage {stage.name} response is missing {', '.join(missing)}")
+    for field, spec in schema.get("properties", {}).items():
+        declared = spec.get("type")
+        if field not in data or declared is None:
+            continue
+        types = declared if isinstance(declared, list) else [declared]
+        expected = tuple(t for name in types for t in _as_tuple(_JSON_TYPES.get(name, object)))
+        if not isinstance(data[field], expected):
+            logger.warning(f"Stage {stage.name}: {field} is {type(data[field]).__name__}, expected {declared}")
+    return data
+
+
+def _as_tuple(value) -> tuple:
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _stage_template(stage: ChainStage) -> str:
+    try:
+        return prompt_registry.registry.template(stage.prompt)
+    except PromptTemplateError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+def _compact(data: dict) -> str:
+    """Serialize intermediate stage output for the next prompt without pretty-printing."""
+    return json.dumps(data, separators=(",", ":"))
+
+
+async def _parse_stage_output(stage: ChainStage, response: str, request: Optional[Request] = None) -> dict:
+    """Validated stage output (one repair call if needed); HTTP 500 if it still does not parse."""
+    try:
+        return await parse_or_repair(response, stage.output, request=request)
+    except StructuredOutputError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def run_stage(stage: ChainStage, fields: Dict[str, str], request: Optional[Request] = None,
+                    bypass_cache: bool = False) -> dict:
+    """Run one stage with its placeholder values already formatted."""
+    response = await generate_from_template(
+        _stage_template(stage), fields, request=request, bypass_cache=bypass_cache,
+        structured=stage.output)
+    return await _parse_stage_output(stage, response, request=request)
+
+
+async def run_chain(definition: ChainDefinition, inputs: Dict[str, str], stream: bool = False,
+                    bypass_cache: bool = False) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Run every stage, each as soon as its inputs are ready. Yields
+    ("stage", {...}) per finished stage with its timing and output, and with
+    stream=True ("token", {...}) per LLM token. The first failing stage
+    cancels the rest and its exception is raised.
+    """
+    events: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+    results: Dict[str, dict] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    chain_started = time.monotonic()
+
+    async def execute(stage: ChainStage) -> dict:
+        for dependency in stage.depends_on:
+            await tasks[dependency]
+        fields = {
+            placeholder: inputs[source] if source in CHAIN_INPUTS else _compact(results[source])
+            for placeholder, source in stage.inputs.items()
+        }
+        started = time.monotonic()
+        if stream:
+            chunks = []
+            async for token in stream_from_template(_stage_template(stage), fields, bypass_cache=bypass_cache,
+                                                    structured=stage.output):
+                chunks.append(token)
+                await events.put(("token", {"stage": stage.name, "text": token}))
+            data = await _parse_stage_output(stage, "".join(chunks))
+        else:
+            data = await run_stage(stage, fields, bypass_cache=bypass_cache)
+
+        results[stage.name] = data
+        await events.put(("stage", {
+            "stage": stage.name,
+            "started_ms": int((started - chain_started) * 1000),
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+            "data": data,
+        }))
+        return data
+
+    async def supervise():
+        try:
+            await asyncio.gather(*tasks.values())
+            await events.put(("done", None))
+        except BaseException as e:
+            for task in tasks.values():
+                task.cancel()
+            await events.put(("failed", e))
+
+    # Stages are already in dependency order, so every awaited task exists
+    for stage in definition.stages:
+        tasks[stage.name] = asyncio.create_task(execute(stage))
+    supervisor = asyncio.create_task(supervise())
+
+    try:
+        while True:
+            event, data = await events.get()
+            if event == "done":
+                return
+            if event == "failed":
+                raise data
+            yield event, data
+    finally:
+        if not supervisor.done():
+            for task in tasks.values():
+                task.cancel()
+            supervisor.cancel()
+
+
+# Chains available at /api/{chain}/...; loaded once at startup
+chains = load_chain_definitions(config.CARELINK_CHAINS_DIR)
@@ -0,0 +1,89 @@
+"""
+Chunked transcription of long recordings.
+PCM audio is split into overlapping fixed windows, the windows are
+transcribed in parallel and their texts are stitched back together with the
+words repeated in each overlap removed.
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+from audio_decode import WHISPER_SAMPLE_RATE, pcm_to_wav
+
+logger = logging.getLogger(__name__)
+
+# (start_sec, end_sec, pcm)
+Chunk = Tuple[float, float, bytes]
+
+_BYTES_PER_SAMPLE = 2
+
+
+def split_pcm(pcm: bytes, window_sec: float, overlap_sec: float,
+              sample_rate: int = WHISPER_SAMPLE_RATE) -> List[Chunk]:
+    """Split 16-bit mono PCM into windows that overlap by overlap_sec."""
+    if overlap_sec >= window_sec:
+        raise ValueError("chunk overlap must be shorter than the chunk window")
+
+    bytes_per_sec = sample_rate * _BYTES_PER_SAMPLE
+    window = int(window_sec * sample_rate) * _BYTES_PER_SAMPLE
+    step = int((window_sec - overlap_sec) * sample_rate) * _BYTES_PER_SAMPLE
+
+    chunks = []
+    offset = 0
+    while True:
+        piece = pcm[offset:offset + window]
+        chunks.append((offset / bytes_per_sec, (offset + len(piece)) / bytes_per_sec, piece))
+        if offset + window >= len(pcm):
+            return chunks
+        offset += step
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _overlap_length(previous: List[str], current: List[str], max_words: int) -> int:
+    """Longest run of words ending previous that also starts current."""
+    previous_norm = [_normalize(w) for w in previous[-max_words:]]
+    current_norm = [_normalize(w) for w in current[:max_words]]
+    for n in range(min(len(previous_norm), len(current_norm)), 0, -1):
+        if previous_norm[-n:] == current_norm[:n]:
+            return n
+    return 0
+
+
+def stitch(texts: List[str], max_overlap_words: int = 20) -> str:
+    """Join chunk transcripts in order, dropping words duplicated by the overlap."""
+    words: List[str] = []
+    for text in texts:
+        current = text.split()
+        if not current:
+            continue
+        overlap = _overlap_length(words, current, max_overlap_words)
+        words.extend(current[overlap:])
+    return " ".join(words)
+
+
+def transcribe_chunks(chunks: List[Chunk], transcribe_fn: Callable[[bytes], str],
+                      max_workers: int,
+                      on_chunk: Optional[Callable[[int, Chunk, str], None]] = None) -> List[str]:
+    """
+    Transcribe chunks concurrently with transcribe_fn (WAV bytes -> text).
+    on_chunk(index, chunk, text) is called from this thread as each chunk
+    finishes, in completion order. Returns the texts in chunk order.
+    """
+    texts: List[str] = [""] * len(chunks)
+    workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper-chunk") as pool:
+        futures = {
+            pool.submit(transcribe_fn, pcm_to_wav(chunk[2])): index
+            for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            texts[index] = (future.result() or "").strip()
+            if on_chunk:
+                on_chunk(index, chunks[index], texts[index])
+    return texts
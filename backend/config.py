@@ -0,0 +1,172 @@
+"""
+Runtime settings for the Carelink backend.
+Every value can be overridden with an environment variable of the same name.
+"""
+
+import json
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_str(name: str, default: str) -> str:
+    """Read a string setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting (1/0, true/false, yes/no) from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+
+
+# SQLite
+CARELINK_DB_PATH = _env_str(
+    "CARELINK_DB_PATH", os.path.join(PROJECT_ROOT, "db", "carelink.db"))
+CARELINK_SQLITE_JOURNAL_MODE = _env_str("CARELINK_SQLITE_JOURNAL_MODE", "WAL")
+CARELINK_SQLITE_SYNCHRONOUS = _env_str("CARELINK_SQLITE_SYNCHRONOUS", "NORMAL")
+# Page cache per connection, in KiB (passed to PRAGMA cache_size as a negative value)
+CARELINK_SQLITE_CACHE_KB = _env_int("CARELINK_SQLITE_CACHE_KB", 16384)
+# Memory-mapped I/O window in bytes (0 disables mmap)
+CARELINK_SQLITE_MMAP_BYTES = _env_int(
+    "CARELINK_SQLITE_MMAP_BYTES", 256 * 1024 * 1024)
+# How long a writer waits for the lock before raising "database is locked"
+CARELINK_SQLITE_BUSY_TIMEOUT_MS = _env_int(
+    "CARELINK_SQLITE_BUSY_TIMEOUT_MS", 5000)
+# Versioned schema migrations (NNNN_description.sql/.py), applied at startup
+CARELINK_MIGRATIONS_DIR = _env_str(
+    "CARELINK_MIGRATIONS_DIR", os.path.join(PROJECT_ROOT, "db", "migrations"))
+# Rows per transaction when a migration backfills a large table after startup
+CARELINK_MIGRATION_BATCH_SIZE = _env_int("CARELINK_MIGRATION_BATCH_SIZE", 2000)
+# Pause between backfill batches so request writes get the lock in between
+CARELINK_MIGRATION_BATCH_PAUSE_MS = _env_int("CARELINK_MIGRATION_BATCH_PAUSE_MS", 20)
+
+
+# Background transcription workers
+CARELINK_TRANSCRIBE_WORKERS = _env_int("CARELINK_TRANSCRIBE_WORKERS", 2)
+# Queued + running jobs allowed before uploads are rejected with 503
+CARELINK_TRANSCRIBE_QUEUE_SIZE = _env_int("CARELINK_TRANSCRIBE_QUEUE_SIZE", 32)
+# How long finished job results stay available for polling
+CARELINK_JOB_RETENTION_SEC = _env_int("CARELINK_JOB_RETENTION_SEC", 3600)
+
+
+def load_whisper_profile(path: str) -> dict:
+    """Read the build/thread profile written by provision_whisper.py, if any."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# whisper.cpp installation; resolved and validated once at startup
+CARELINK_WHISPER_DIR = _env_str(
+    "CARELINK_WHISPER_DIR", os.path.join(PROJECT_ROOT, "whisper.cpp"))
+# Fastest build and thread count found by `python provision_whisper.py`;
+# used as defaults below, environment variables still win
+CARELINK_WHISPER_PROFILE_PATH = _env_str(
+    "CARELINK_WHISPER_PROFILE_PATH", os.path.join(CARELINK_WHISPER_DIR, "carelink-profile.json"))
+WHISPER_PROFILE = load_whisper_profile(CARELINK_WHISPER_PROFILE_PATH)
+# Explicit binary paths; empty means auto-detect under CARELINK_WHISPER_DIR/build
+CARELINK_WHISPER_CLI_PATH = _env_str(
+    "CARELINK_WHISPER_CLI_PATH", WHISPER_PROFILE.get("cli_path", ""))
+CARELINK_WHISPER_SERVER_PATH = _env_str(
+    "CARELINK_WHISPER_SERVER_PATH", WHISPER_PROFILE.get("server_path", ""))
+CARELINK_WHISPER_MODEL_PATH = _env_str(
+    "CARELINK_WHISPER_MODEL_PATH",
+    os.path.join(CARELINK_WHISPER_DIR, "models", "ggml-base.en.bin"))
+# Small model for the quick preview pass of two-tier transcription (optional)
+CARELINK_WHISPER_PREVIEW_MODEL_PATH = _env_str(
+    "CARELINK_WHISPER_PREVIEW_MODEL_PATH",
+    os.path.join(CARELINK_WHISPER_DIR, "models", "ggml-tiny.en.bin"))
+# Return a preview transcript first, then replace it with the accurate model's
+CARELINK_TWO_TIER_TRANSCRIPTION = _env_bool("CARELINK_TWO_TIER_TRANSCRIPTION", True)
+# Directory scanned for selectable ggml models (incl. q5_0/q8_0 quantized builds)
+CARELINK_WHISPER_MODELS_DIR = _env_str(
+    "CARELINK_WHISPER_MODELS_DIR", os.path.dirname(CARELINK_WHISPER_MODEL_PATH))
+# Per-session-type model, e.g. "sundowning=base.en,meals=base.en-q5_0";
+# runtime choices made through PUT /api/whisper/models/selection take precedence
+CARELINK_WHISPER_SESSION_MODELS = _env_str("CARELINK_WHISPER_SESSION_MODELS", "")
+
+
+# Resident whisper.cpp engine ("server" keeps the model loaded, "cli" spawns whisper-cli per request)
+CARELINK_WHISPER_ENGINE = _env_str("CARELINK_WHISPER_ENGINE", "server")
+CARELINK_WHISPER_SERVER_PORT = _env_int("CARELINK_WHISPER_SERVER_PORT", 8178)
+CARELINK_WHISPER_THREADS = _env_int(
+    "CARELINK_WHISPER_THREADS", WHISPER_PROFILE.get("threads", 4))
+CARELINK_WHISPER_STARTUP_TIMEOUT_SEC = _env_int(
+    "CARELINK_WHISPER_STARTUP_TIMEOUT_SEC", 60)
+# Resident servers on consecutive ports; whisper-server runs one inference at a
+# time, so this bounds how many chunks of a long recording transcribe at once
+CARELINK_WHISPER_SERVER_INSTANCES = _env_int("CARELINK_WHISPER_SERVER_INSTANCES", 2)
+
+
+# Chunked transcription of long recordings
+CARELINK_CHUNK_WINDOW_SEC = _env_int("CARELINK_CHUNK_WINDOW_SEC", 30)
+CARELINK_CHUNK_OVERLAP_SEC = _env_int("CARELINK_CHUNK_OVERLAP_SEC", 2)
+CARELINK_CHUNK_WORKERS = _env_int(
+    "CARELINK_CHUNK_WORKERS", CARELINK_WHISPER_SERVER_INSTANCES)
+
+
+# Ollama LLM client
+CARELINK_OLLAMA_URL = _env_str("CARELINK_OLLAMA_URL", "http://localhost:11434")
+CARELINK_OLLAMA_MODEL = _env_str("CARELINK_OLLAMA_MODEL", "deepseek-v3.1:671b-cloud")
+CARELINK_OLLAMA_TIMEOUT_SEC = _env_int("CARELINK_OLLAMA_TIMEOUT_SEC", 180)
+# Pooled keep-alive connections to the Ollama host
+CARELINK_OLLAMA_MAX_CONNECTIONS = _env_int("CARELINK_OLLAMA_MAX_CONNECTIONS", 10)
+# In-flight generate calls allowed per Ollama host
+CARELINK_OLLAMA_MAX_CONCURRENCY = _env_int("CARELINK_OLLAMA_MAX_CONCURRENCY", 4)
+CARELINK_OLLAMA_RETRIES = _env_int("CARELINK_OLLAMA_RETRIES", 2)
+CARELINK_OLLAMA_BACKOFF_SEC = float(_env_str("CARELINK_OLLAMA_BACKOFF_SEC", "0.5"))
+
+
+# LLM response cache
+CARELINK_LLM_CACHE_ENABLED = _env_bool("CARELINK_LLM_CACHE_ENABLED", True)
+CARELINK_LLM_CACHE_TTL_SEC = _env_int("CARELINK_LLM_CACHE_TTL_SEC", 7 * 24 * 3600)
+CARELINK_LLM_CACHE_MAX_ENTRIES = _env_int("CARELINK_LLM_CACHE_MAX_ENTRIES", 5000)
+
+
+# Transcript cache (audio content hash -> transcript)
+CARELINK_TRANSCRIPT_CACHE_ENABLED = _env_bool("CARELINK_TRANSCRIPT_CACHE_ENABLED", True)
+CARELINK_TRANSCRIPT_CACHE_MAX_ENTRIES = _env_int("CARELINK_TRANSCRIPT_CACHE_MAX_ENTRIES", 20000)
+
+
+# Recordings
+# Keep the original upload on disk after transcription (decoding happens in memory)
+CARELINK_ARCHIVE_RECORDINGS = _env_bool("CARELINK_ARCHIVE_RECORDINGS", True)
+
+
+# Live (WebSocket) transcription
+# Window length finalized and stored as one audio_chunks row; overlap reuses CARELINK_CHUNK_OVERLAP_SEC
+CARELINK_LIVE_WINDOW_SEC = _env_int("CARELINK_LIVE_WINDOW_SEC", 15)
+# How often the open window is re-transcribed for partial results
+CARELINK_LIVE_PARTIAL_SEC = _env_int("CARELINK_LIVE_PARTIAL_SEC", 3)
+
+
+# Prompt templates
+CARELINK_PROMPTS_DIR = _env_str("CARELINK_PROMPTS_DIR", os.path.join(BACKEND_DIR, "prompts"))
+# Minimum seconds between mtime checks of a template file (0 checks on every use)
+CARELINK_PROMPT_RELOAD_CHECK_SEC = float(_env_str("CARELINK_PROMPT_RELOAD_CHECK_SEC", "2"))
+# Declarative prompt-chain definitions, one JSON file per session type
+CARELINK_CHAINS_DIR = _env_str("CARELINK_CHAINS_DIR", os.path.join(BACKEND_DIR, "chains"))
+
+
+# Batch summarization
+# Sessions a batch job summarizes at once; by default one Ollama slot is left for interactive requests
+CARELINK_BATCH_CONCURRENCY = _env_int(
+    "CARELINK_BATCH_CONCURRENCY", max(1, CARELINK_OLLAMA_MAX_CONCURRENCY - 1))
@@ -0,0 +1,13 @@
+import pytest
+import database
+
+
+@pytest.fixture()
+def temp_db(tmp_path):
+    """Point the connection pool at a scratch database for the duration of a test."""
+    original_path = database.DB_PATH
+    database.DB_PATH = str(tmp_path / "carelink_test.db")
+    database.init_database()
+    yield database.DB_PATH
+    database.close_all_connections()
+    database.DB_PATH = original_path
@@ -2,19 +2,22 @@ import sqlite3
 import uuid
 import time
 import json
-from typing import List, Optional, Dict, Any
+import base64
+import binascii
+from typing import List, Optional, Dict, Any, Tuple
 from database import db_cursor, db_connection
+import trends
 from models import SessionDB, AudioChunk, Transcript, Summary, SessionDetail, SessionListItem
 
 
-def create_session(session_type: str, start_ts: int) -> str:
+def create_session(session_type: str, start_ts: int, patient_id: Optional[str] = None) -> str:
     """Create a new session and return the session_id."""
     session_id = str(uuid.uuid4())
 
     with db_cursor() as cursor:
         cursor.execute(
-            "INSERT INTO sessions (session_id, session_type, start_ts) VALUES (?, ?, ?)",
-            (session_id, session_type, start_ts)
+            "INSERT INTO sessions (session_id, session_type, start_ts, patient_id) VALUES (?, ?, ?, ?)",
+            (session_id, session_type, start_ts, patient_id)
         )
 
     return session_id
@@ -76,20 +79,49 @@ def insert_transcript(session_id: str, text: str, chunk_id: Optional[int] = None
         return cursor.lastrowid
 
 
+def update_transcript_text(transcript_id: int, text: str) -> bool:
+    """Replace a transcript's text in place (e.g. a preview upgraded by the final pass)."""
+    word_count = len(text.split()) if text else 0
+
+    with db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE transcripts SET text = ?, word_count = ?, created_ts = ? WHERE transcript_id = ?",
+            (text, word_count, int(time.time() * 1000), transcript_id)
+        )
+        return cursor.rowcount > 0
+
+
 def insert_summary(session_id: str, summary_text: str, repetition_json: Optional[List[Dict[str, Any]]] = None,
                    agitation_score: Optional[float] = None, mood_label: Optional[str] = None,
-                   suggestions: Optional[str] = None) -> int:
-    """Insert a summary and return summary_id."""
+                   suggestions: Optional[str] = None, replace: bool = False) -> int:
+    """Insert a summary and return summary_id. With replace=True an existing summary is overwritten."""
     created_ts = int(time.time() * 1000)
     repetition_json_str = json.dumps(
         repetition_json) if repetition_json else None
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
 
     with db_cursor() as cursor:
         cursor.execute(
-            "INSERT INTO summaries (session_id, summary_text, repetition_json, agitation_score, mood_label, suggestions, created_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            f"{verb} INTO summaries (session_id, summary_text, repetition_json, agitation_score, mood_label, suggestions, created_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
             (session_id, summary_text, repetition_json_str,
              agitation_score, mood_label, suggestions, created_ts)
         )
+        summary_id = cursor.lastrowid
+        # Keep the week's trend rollup in step with the summary, in the same transaction
+        trends.record_summary(cursor, session_id)
+        return summary_id
+
+
+def insert_chain_stage_result(session_id: str, chain: str, stage: str, data: Dict[str, Any],
+                              elapsed_ms: Optional[int] = None) -> int:
+    """Store the output of one prompt-chain stage and return result_id."""
+    created_ts = int(time.time() * 1000)
+
+    with db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO chain_stage_results (session_id, chain, stage, data_json, elapsed_ms, created_ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, chain, stage, json.dumps(data), elapsed_ms, created_ts)
+        )
         return cursor.lastrowid
 
 
@@ -170,40 +202,85 @@ def get_session_detail(session_id: str) -> Optional[SessionDetail]:
         )
 
 
-def get_sessions_list(limit: int = 100, offset: int = 0) -> List[SessionListItem]:
-    """Get list of sessions with summary snippets."""
-    with db_connection() as conn:
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT 
-                s.session_id, 
-                s.session_type, 
-                s.start_ts,
-                SUBSTR(sum.summary_text, 1, 100) as summary_snippet
-            FROM sessions s
-            LEFT JOIN summaries sum ON s.session_id = sum.session_id
-            ORDER BY s.start_ts DESC
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
-
-        return [
-            SessionListItem(
-                session_id=row["session_id"],
-                session_type=row["session_type"],
-                start_ts=row["start_ts"],
-                summary_snippet=row["summary_snippet"]
-            )
-            for row in cursor.fetchall()
-        ]
+def encode_cursor(start_ts: int, session_id: str) -> str:
+    """Opaque page cursor for the last session on a page."""
+    return base64.urlsafe_b64encode(json.dumps([start_ts, session_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Inverse of encode_cursor; raises ValueError for anything else."""
+    try:
+        start_ts, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(start_ts, int) or not isinstance(session_id, str):
+        raise ValueError("Invalid cursor")
+    return start_ts, session_id
+
+
+def get_sessions_list(limit: int = 100, cursor: Optional[str] = None, session_type: Optional[str] = None,
+                      patient_id: Optional[str] = None, start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None) -> Tuple[List[SessionListItem], Optional[str]]:
+    """
+    Newest sessions first, with their stored summary snippets. Pages are
+    keyed on (start_ts, session_id) so every page costs the same; pass the
+    returned cursor to get the next one (None when there are no more).
+    start_ts/end_ts bound the session start time (end exclusive).
+    """
+    clauses, params = [], []
+    if session_type is not None:
+        clauses.append("session_type = ?")
+        params.append(session_type)
+    if patient_id is not None:
+        clauses.append("patient_id = ?")
+        params.append(patient_id)
+    if start_ts is not None:
+        clauses.append("start_ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        clauses.append("start_ts < ?")
+        params.append(end_ts)
+    if cursor is not None:
+        clauses.append("(start_ts, session_id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with db_cursor() as db:
+        # One extra row tells us whether there is a next page
+        db.execute(
+            f"""SELECT session_id, session_type, start_ts, patient_id, summary_snippet
+                FROM sessions {where}
+                ORDER BY start_ts DESC, session_id DESC
+                LIMIT ?""",
+            (*params, limit + 1)
+        )
+        rows = db.fetchall()
+
+    items = [
+        SessionListItem(
+            session_id=row["session_id"],
+            session_type=row["session_type"],
+            start_ts=row["start_ts"],
+            patient_id=row["patient_id"],
+            summary_snippet=row["summary_snippet"]
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(items[-1].start_ts, items[-1].session_id) if len(rows) > limit else None
+    return items, next_cursor
 
 
 def delete_session(session_id: str) -> bool:
     """Delete a session (cascades to related tables)."""
     with db_cursor() as cursor:
+        cursor.execute("SELECT start_ts FROM sessions WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone()
         cursor.execute(
             "DELETE FROM sessions WHERE session_id = ?", (session_id,))
-        return cursor.rowcount > 0
+        deleted = cursor.rowcount > 0
+        if row is not None:
+            trends.refresh_week(cursor, trends.week_start(row["start_ts"]))
+        return deleted
 
 
 def get_session_transcripts(session_id: str) -> List[Transcript]:
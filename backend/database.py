@@ -1,15 +1,90 @@
 import sqlite3
+import threading
 from contextlib import contextmanager
 import os
 
+import config
+import migrations
+
 # Database file path
-DB_PATH = os.path.join(os.path.dirname(
-    os.path.dirname(__file__)), "db", "carelink.db")
+DB_PATH = config.CARELINK_DB_PATH
+
+# One long-lived connection per thread, configured once when it is opened.
+# sqlite3 connections must not be shared between threads mid-transaction,
+# so each thread (event loop, threadpool worker, job worker) gets its own.
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = set()
+# Bumped by close_all_connections; a thread-local connection from an older generation was closed under it
+_generation = 0
+
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Apply per-connection pragmas. Runs once per pooled connection."""
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {config.CARELINK_SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA journal_mode = {config.CARELINK_SQLITE_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {config.CARELINK_SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{config.CARELINK_SQLITE_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {config.CARELINK_SQLITE_MMAP_BYTES}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's pooled connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH and _local.generation == _generation:
+        return conn
+
+    # DB_PATH changed (tests point it at a scratch file) or close_all_connections
+    # closed it from another thread - drop the stale one
+    if conn is not None:
+        _discard(conn)
+
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    _configure_connection(conn)
+    _local.conn = conn
+    _local.path = DB_PATH
+    with _pool_lock:
+        _local.generation = _generation
+        _pool.add(conn)
+    return conn
+
+
+def _discard(conn: sqlite3.Connection):
+    """Close a pooled connection and forget it."""
+    with _pool_lock:
+        _pool.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+    if getattr(_local, "conn", None) is conn:
+        _local.conn = None
+
+
+def close_all_connections():
+    """
+    Close every pooled connection. Called on application shutdown. Threads
+    holding one of them open a fresh connection on their next get_connection().
+    """
+    global _generation
+    with _pool_lock:
+        connections = list(_pool)
+        _pool.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
 
 
 def init_database():
-    """Initialize the database with schema if it doesn't exist."""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    """Create the database from schema.sql if it doesn't exist, then apply pending migrations."""
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
 
     # Check if database exists, if not create it with schema
     if not os.path.exists(DB_PATH):
@@ -23,33 +98,37 @@ def init_database():
             schema = f.read()
 
         conn.executescript(schema)
-        conn.commit()
+        # schema.sql is the current schema, so every migration is already in it
+        migrations.stamp_all(conn)
         conn.close()
 
+    # Bring databases created from an older schema up to date
+    with db_connection() as conn:
+        migrations.migrate(conn)
+
 
 @contextmanager
 def db_cursor():
     """Context manager for database operations with proper cleanup."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         yield cursor
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
-        conn.close()
 
 
 @contextmanager
 def db_connection():
     """Context manager for database connection when you need the connection object."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    conn = get_connection()
     try:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
+    except BaseException:
+        conn.rollback()
+        raise
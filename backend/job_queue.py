@@ -0,0 +1,174 @@
+"""
+Bounded background job queue.
+Runs blocking work (ffmpeg, whisper.cpp) on a worker pool so request handlers
+can return immediately and clients poll for status.
+"""
+
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a queue already holds its maximum number of pending jobs."""
+
+
+class Job:
+    """State for a single background job, safe to read from any thread."""
+
+    def __init__(self, job_id: str, kind: str):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_ts = time.time()
+        self.started_ts: Optional[float] = None
+        self.finished_ts: Optional[float] = None
+        # Bumped on every change so watchers can tell when to re-read
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def update(self, stage: Optional[str] = None, progress: Optional[float] = None):
+        """Report progress from inside a worker."""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            self.revision += 1
+
+    def publish(self, result: Dict[str, Any]):
+        """Expose an interim result (e.g. a preview) before the job finishes."""
+        with self._lock:
+            self.result = result
+            self.revision += 1
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "result": self.result,
+                "error": self.error,
+                "created_ts": int(self.created_ts * 1000),
+                "started_ts": int(self.started_ts * 1000) if self.started_ts else None,
+                "finished_ts": int(self.finished_ts * 1000) if self.finished_ts else None,
+                "revision": self.revision,
+            }
+
+
+class JobQueue:
+    """
+    Fixed-size worker pool with a cap on queued + running jobs.
+
+    Workers receive the Job as their first argument and return a JSON-able
+    dict that becomes job.result.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, retention_sec: int = 3600):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.retention_sec = retention_sec
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the worker pool. Safe to call more than once."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"{self.name}-worker"
+                )
+                logger.info(f"Started {self.name} queue with {self.max_workers} workers")
+
+    def shutdown(self):
+        """Stop accepting work and drop anything not yet started."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def submit(self, func: Callable[..., Dict[str, Any]], *args, kind: Optional[str] = None, **kwargs) -> Job:
+        """Queue func(job, *args, **kwargs) and return its Job immediately."""
+        self.start()
+        with self._lock:
+            self._prune_locked()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise QueueFullError(
+                    f"{self.name} queue is full ({pending} jobs pending)")
+
+            job = Job(uuid.uuid4().hex, kind or self.name)
+            self._jobs[job.job_id] = job
+            executor = self._executor
+
+        executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, func: Callable[..., Dict[str, Any]], args, kwargs):
+        with job._lock:
+            job.status = RUNNING
+            job.started_ts = time.time()
+            job.revision += 1
+        try:
+            result = func(job, *args, **kwargs)
+            with job._lock:
+                job.result = result
+                job.progress = 1.0
+                job.stage = COMPLETED
+                job.status = COMPLETED
+                job.revision += 1
+        except Exception as e:
+            logger.error(f"{self.name} job {job.job_id} failed: {str(e)}")
+            logger.error(f"Job error traceback: {traceback.format_exc()}")
+            detail = getattr(e, "detail", None) or str(e)
+            with job._lock:
+                job.error = str(detail)
+                job.stage = FAILED
+                job.status = FAILED
+                job.revision += 1
+        finally:
+            job.finished_ts = time.time()
+
+    def _prune_locked(self):
+        """Forget finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention_sec
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_ts and job.finished_ts < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
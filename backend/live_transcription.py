@@ -0,0 +1,155 @@
+"""
+Sliding-window transcription of audio that is still being recorded.
+PCM is fed in as it arrives; the open window is re-transcribed every few
+seconds for partial results, and each full window is finalized, stored and
+reported exactly once, in order. Windows overlap so the final text can be
+stitched without cutting words at the boundaries.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from audio_decode import WHISPER_SAMPLE_RATE, pcm_to_wav
+from chunked_transcription import stitch
+
+logger = logging.getLogger(__name__)
+
+_BYTES_PER_SAMPLE = 2
+
+
+class LiveTranscriber:
+    """Turns a live PCM stream into `partial` and `final` segment messages."""
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]],
+                 transcribe_fn: Callable[[bytes], str],
+                 store_chunk: Callable[[int, float, float, str], None],
+                 window_sec: float, overlap_sec: float, partial_sec: float,
+                 sample_rate: int = WHISPER_SAMPLE_RATE):
+        """
+        send: coroutine delivering a message dict to the client.
+        transcribe_fn: blocking WAV bytes -> text; run in a worker thread.
+        store_chunk: blocking (index, start_sec, end_sec, text) persistence hook.
+        """
+        if overlap_sec >= window_sec:
+            raise ValueError("live window overlap must be shorter than the window")
+        self.send = send
+        self.transcribe_fn = transcribe_fn
+        self.store_chunk = store_chunk
+        self.sample_rate = sample_rate
+        self._bytes_per_sec = sample_rate * _BYTES_PER_SAMPLE
+        self._window_bytes = int(window_sec * sample_rate) * _BYTES_PER_SAMPLE
+        self._overlap_bytes = int(overlap_sec * sample_rate) * _BYTES_PER_SAMPLE
+        self._partial_bytes = int(partial_sec * sample_rate) * _BYTES_PER_SAMPLE
+
+        self.texts: List[str] = []
+        self.received_bytes = 0
+        self._buffer = bytearray()
+        self._window_start = 0.0
+        self._since_partial = 0
+        self._chunk_index = 0
+        self._carry = b""
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+        self._finals: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue()
+        self._final_worker = asyncio.create_task(self._run_finals())
+        self._partial_task: Optional[asyncio.Task] = None
+
+    async def _emit(self, message: dict):
+        if self._closed:
+            return
+        try:
+            async with self._send_lock:
+                await self.send(message)
+        except Exception as e:
+            # Client went away; keep transcribing so the session is still stored
+            logger.info(f"Live transcription client unreachable: {str(e)}")
+            self._closed = True
+
+    async def _transcribe(self, pcm: bytes) -> str:
+        text = await asyncio.to_thread(self.transcribe_fn, pcm_to_wav(pcm, self.sample_rate))
+        return (text or "").strip()
+
+    def _enqueue_final(self, pcm: bytes):
+        start_sec = self._window_start
+        end_sec = start_sec + len(pcm) / self._bytes_per_sec
+        self._finals.put_nowait((self._chunk_index, start_sec, end_sec, pcm))
+        self._chunk_index += 1
+
+    async def _run_finals(self):
+        """Finalize windows one at a time so segments are stored and sent in order."""
+        while True:
+            item = await self._finals.get()
+            if item is None:
+                return
+            index, start_sec, end_sec, pcm = item
+            text = await self._transcribe(pcm)
+            await asyncio.to_thread(self.store_chunk, index, start_sec, end_sec, text)
+            self.texts.append(text)
+            await self._emit({"type": "final", "chunk_index": index,
+                              "start_sec": round(start_sec, 2), "end_sec": round(end_sec, 2),
+                              "text": text})
+
+    async def _run_partial(self, index: int, start_sec: float, pcm: bytes):
+        try:
+            text = await self._transcribe(pcm)
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {str(e)}")
+            return
+        # The window may have been finalized while this partial was running
+        if index == self._chunk_index and text:
+            await self._emit({"type": "partial", "chunk_index": index,
+                              "start_sec": round(start_sec, 2),
+                              "end_sec": round(start_sec + len(pcm) / self._bytes_per_sec, 2),
+                              "text": text})
+
+    async def feed(self, pcm: bytes):
+        """Add 16-bit mono PCM to the stream."""
+        # Keep sample alignment when frames split a sample
+        pcm = self._carry + pcm
+        if len(pcm) % _BYTES_PER_SAMPLE:
+            self._carry, pcm = pcm[-1:], pcm[:-1]
+        else:
+            self._carry = b""
+
+        self.received_bytes += len(pcm)
+        self._buffer.extend(pcm)
+        self._since_partial += len(pcm)
+
+        while len(self._buffer) >= self._window_bytes:
+            self._enqueue_final(bytes(self._buffer[:self._window_bytes]))
+            advance = self._window_bytes - self._overlap_bytes
+            del self._buffer[:advance]
+            self._window_start += advance / self._bytes_per_sec
+            self._since_partial = 0
+
+        # At most one partial in flight; skip a beat rather than queue stale work
+        partial_idle = self._partial_task is None or self._partial_task.done()
+        if self._since_partial >= self._partial_bytes and partial_idle:
+            self._since_partial = 0
+            self._partial_task = asyncio.create_task(
+                self._run_partial(self._chunk_index, self._window_start, bytes(self._buffer)))
+
+    async def finish(self) -> str:
+        """Finalize the remaining audio and return the stitched transcript."""
+        # After a finalized window the buffer starts with already-transcribed overlap
+        already_done = self._overlap_bytes if self._chunk_index else 0
+        if len(self._buffer) > already_done:
+            self._enqueue_final(bytes(self._buffer))
+        self._buffer.clear()
+
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        self._finals.put_nowait(None)
+        await self._final_worker
+        return stitch(self.texts)
+
+    async def abort(self):
+        """Stop background work without finalizing."""
+        if self._partial_task is not None:
+            self._partial_task.cancel()
+        self._final_worker.cancel()
+
+    @property
+    def duration_sec(self) -> float:
+        return self.received_bytes / self._bytes_per_sec
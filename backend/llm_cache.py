@@ -0,0 +1,67 @@
+"""
+Content-addressed cache of LLM completions stored in SQLite.
+Entries are keyed by model name, a hash of the prompt template and a hash
+of the values formatted into it, so re-summarizing the same transcript
+with the same template never pays for a second Ollama call.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import config
+from sqlite_cache import SQLiteLRUCache
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def template_hash(template: str) -> str:
+    """Stable hash of a prompt template."""
+    return _sha256(template)
+
+
+def input_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of the values formatted into a template."""
+    return _sha256(json.dumps(inputs, sort_keys=True, separators=(",", ":")))
+
+
+class LLMCache(SQLiteLRUCache):
+    """SQLite-backed completion cache with TTL and LRU eviction."""
+
+    table = "llm_cache"
+
+    def __init__(self, ttl_sec: int, max_entries: int, enabled: bool = True,
+                 evict_every: int = 50):
+        super().__init__(max_entries, enabled=enabled, evict_every=evict_every, ttl_sec=ttl_sec)
+        self.bypassed = 0
+
+    def make_key(self, model: str, template: str, inputs: Dict[str, Any]) -> tuple:
+        """Return (cache_key, template_hash, input_hash) for a prompt."""
+        t_hash = template_hash(template)
+        i_hash = input_hash(inputs)
+        return _sha256(f"{model}\0{t_hash}\0{i_hash}"), t_hash, i_hash
+
+    def record_bypass(self):
+        self._count("bypassed")
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return a cached completion, or None on miss or expiry."""
+        return self._lookup(cache_key, "response")
+
+    def put(self, cache_key: str, model: str, t_hash: str, i_hash: str, response: str):
+        """Store a completion, evicting old entries every few writes."""
+        self._store({"cache_key": cache_key, "model": model, "template_hash": t_hash,
+                     "input_hash": i_hash, "response": response})
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bypassed": self.bypassed}
+
+
+# Process-wide cache shared by every LLM call site
+cache = LLMCache(
+    ttl_sec=config.CARELINK_LLM_CACHE_TTL_SEC,
+    max_entries=config.CARELINK_LLM_CACHE_MAX_ENTRIES,
+    enabled=config.CARELINK_LLM_CACHE_ENABLED,
+)
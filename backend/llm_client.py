@@ -0,0 +1,338 @@
+"""
+Shared async client for the Ollama API.
+One pooled, keep-alive httpx client used by every summarization route and
+prompt chain, with a per-host concurrency cap, retry with backoff and
+cancellation when the HTTP caller goes away.
+"""
+
+import asyncio
+import json
+import logging
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException, Request, status
+
+import config
+from llm_cache import cache
+from structured_output import StructuredOutput, StructuredOutputError
+
+logger = logging.getLogger(__name__)
+
+# Non-standard but widely used status for "client closed request"
+CLIENT_CLOSED_REQUEST = 499
+
+# Overload / transient server errors worth another attempt
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+
+class _RetryableStatus(Exception):
+    """Internal marker for HTTP statuses worth retrying."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+async def cancel_on_disconnect(request: Request, coro, poll_interval: float = 0.5):
+    """Await coro, cancelling it if the HTTP client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}; cancelling LLM call")
+                task.cancel()
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST,
+                    detail="Client disconnected"
+                )
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class OllamaClient:
+    """Async Ollama client with connection pooling and bounded concurrency."""
+
+    def __init__(self, base_url: str, model: str, timeout: float = 180.0,
+                 max_connections: int = 10, max_concurrency: int = 4,
+                 max_retries: int = 2, backoff: float = 0.5,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # httpx clients and semaphores are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._semaphores = {}
+            self._loop = loop
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[host]
+
+    def _check_response(self, response: httpx.Response, attempt: int):
+        """Retry overload / transient server errors while attempts remain, fail fast on the rest."""
+        if response.status_code in RETRYABLE_STATUSES and attempt < self.max_retries:
+            raise _RetryableStatus(response.status_code)
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Ollama API error: {response.status_code}"
+            )
+
+    async def _backoff_or_raise(self, error: Exception, attempt: int, can_retry: bool = True):
+        """Sleep before the next attempt, or raise the caller-facing error once retries are used up."""
+        if not can_retry or attempt >= self.max_retries:
+            if isinstance(error, _RetryableStatus):
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f"Ollama API error: {error.status_code}"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Cannot connect to Ollama API. Make sure Ollama is running."
+            )
+        delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+        logger.warning(f"Ollama call failed ({str(error)}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def generate(self, prompt: str, request: Optional[Request] = None,
+                       model: Optional[str] = None, **options: Any) -> str:
+        """
+        Run a non-streaming /api/generate call and return the response text.
+        Pass the incoming Request to cancel the call if the client disconnects.
+        """
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": False,
+            **options,
+        }
+        if request is None:
+            return await self._post_generate(payload)
+        return await cancel_on_disconnect(request, self._post_generate(payload))
+
+    async def _post_generate(self, payload: Dict[str, Any]) -> str:
+        client = self._get_client()
+        semaphore = self._host_semaphore(self.base_url)
+
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await client.post("/api/generate", json=payload)
+                self._check_response(response, attempt)
+                return response.json().get("response", "")
+
+            except (httpx.ConnectError, httpx.RemoteProtocolError, _RetryableStatus) as e:
+                await self._backoff_or_raise(e, attempt)
+                attempt += 1
+
+            except httpx.TimeoutException:
+                raise HTTPException(
+                    status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                    detail="Ollama API request timed out"
+                )
+
+    async def stream_generate(self, prompt: str, model: Optional[str] = None,
+                              **options: Any) -> AsyncIterator[str]:
+        """
+        Run a streaming /api/generate call, yielding response tokens as Ollama
+        produces them. Connection failures and transient statuses are retried
+        like generate(), but only before the first token has been yielded.
+        """
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": True,
+            **options,
+        }
+        client = self._get_client()
+        semaphore = self._host_semaphore(self.base_url)
+
+        attempt = 0
+        yielded = False
+        while True:
+            try:
+                async with semaphore:
+                    async with client.stream("POST", "/api/generate", json=payload) as response:
+                        self._check_response(response, attempt)
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise HTTPException(
+                                    status_code=status.HTTP_502_BAD_GATEWAY,
+                                    detail=f"Ollama API error: {chunk['error']}"
+                                )
+                            if chunk.get("response"):
+                                yielded = True
+                                yield chunk["response"]
+                            if chunk.get("done"):
+                                return
+                return
+
+            except (httpx.ConnectError, httpx.RemoteProtocolError, _RetryableStatus) as e:
+                # Tokens already sent cannot be taken back, so a failure mid-stream is final
+                await self._backoff_or_raise(e, attempt, can_retry=not yielded)
+                attempt += 1
+
+            except httpx.TimeoutException:
+                raise HTTPException(
+                    status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                    detail="Ollama API request timed out"
+                )
+
+
+# Process-wide client shared by all routes
+ollama = OllamaClient(
+    base_url=config.CARELINK_OLLAMA_URL,
+    model=config.CARELINK_OLLAMA_MODEL,
+    timeout=config.CARELINK_OLLAMA_TIMEOUT_SEC,
+    max_connections=config.CARELINK_OLLAMA_MAX_CONNECTIONS,
+    max_concurrency=config.CARELINK_OLLAMA_MAX_CONCURRENCY,
+    max_retries=config.CARELINK_OLLAMA_RETRIES,
+    backoff=config.CARELINK_OLLAMA_BACKOFF_SEC,
+)
+
+
+def _cache_key(template: str, fields: Dict[str, Any], structured: Optional[StructuredOutput]) -> tuple:
+    # The schema constrains the output, so it is part of what the completion depends on
+    model_key = ollama.model if structured is None else f"{ollama.model}\0{structured.schema_hash}"
+    return cache.make_key(model_key, template, fields)
+
+
+def _cacheable(response: str, structured: Optional[StructuredOutput]) -> bool:
+    """Only keep completions that parse; a broken one would be replayed forever."""
+    return bool(response) and (structured is None or structured.is_valid(response))
+
+
+async def generate_from_template(template: str, fields: Dict[str, Any],
+                                 request: Optional[Request] = None,
+                                 bypass_cache: bool = False,
+                                 structured: Optional[StructuredOutput] = None) -> str:
+    """
+    Format template with fields and generate a completion, serving repeats
+    of the same model/template/input from the LLM cache. With structured,
+    Ollama is constrained to its JSON schema.
+    """
+    prompt = template.format(**fields)
+    options = {"format": structured.schema} if structured is not None else {}
+    if not cache.enabled:
+        return await ollama.generate(prompt, request=request, **options)
+
+    cache_key, t_hash, i_hash = _cache_key(template, fields, structured)
+    if bypass_cache:
+        cache.record_bypass()
+    else:
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    response = await ollama.generate(prompt, request=request, **options)
+    if _cacheable(response, structured):
+        await asyncio.to_thread(cache.put, cache_key, ollama.model, t_hash, i_hash, response)
+    return response
+
+
+async def stream_from_template(template: str, fields: Dict[str, Any],
+                               bypass_cache: bool = False,
+                               structured: Optional[StructuredOutput] = None) -> AsyncIterator[str]:
+    """Streaming counterpart of generate_from_template; a cache hit is yielded as one chunk."""
+    prompt = template.format(**fields)
+    options = {"format": structured.schema} if structured is not None else {}
+    if not cache.enabled:
+        async for token in ollama.stream_generate(prompt, **options):
+            yield token
+        return
+
+    cache_key, t_hash, i_hash = _cache_key(template, fields, structured)
+    if bypass_cache:
+        cache.record_bypass()
+    else:
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    async for token in ollama.stream_generate(prompt, **options):
+        chunks.append(token)
+        yield token
+
+    response = "".join(chunks)
+    if _cacheable(response, structured):
+        await asyncio.to_thread(cache.put, cache_key, ollama.model, t_hash, i_hash, response)
+
+
+REPAIR_PROMPT = """The following response was supposed to be a single JSON object matching this JSON schema, but it is invalid ({error}).
+
+Schema:
+{schema}
+
+Response:
+{response}
+
+Return only the corrected JSON object."""
+
+
+async def parse_or_repair(response: str, structured: StructuredOutput,
+                          request: Optional[Request] = None) -> dict:
+    """
+    Parse a completion; if it does not validate, ask the model once to fix
+    it (schema-constrained) instead of failing the whole call.
+    Raises StructuredOutputError if the repaired output is still invalid.
+    """
+    try:
+        return structured.parse(response)
+    except StructuredOutputError as e:
+        logger.warning(f"Invalid {structured.name} completion, attempting one repair: {str(e)}")
+        error = e
+
+    repair_prompt = REPAIR_PROMPT.format(
+        error=str(error), schema=json.dumps(structured.schema), response=response)
+    repaired = await ollama.generate(repair_prompt, request=request, format=structured.schema)
+    return structured.parse(repaired)
+
+
+async def generate_structured(template: str, fields: Dict[str, Any], structured: StructuredOutput,
+                              request: Optional[Request] = None,
+                              bypass_cache: bool = False) -> dict:
+    """Schema-constrained completion parsed into a validated object, with one repair retry."""
+    response = await generate_from_template(
+        template, fields, request=request, bypass_cache=bypass_cache, structured=structured)
+    return await parse_or_repair(response, structured, request=request)
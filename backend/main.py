@@ -1,9 +1,21 @@
+import batch_summarize
 import database
-from routes import session, transcribe, summarize, medication_chain, freeform_chain, sundowning_chain, audio
+import llm_client
+import llm_cache
+import migrations
+import prompt_registry
+import search
+import transcription_cache
+import trends
+import whisper_engine
+import whisper_models
+import whisper_utils
+from routes import session, transcribe, summarize, chains, audio, live, batch, trends as trends_routes, search as search_routes
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import sys
 import logging
@@ -29,9 +41,32 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup."""
+    """Initialize database, workers and the whisper engine on startup; release them on shutdown."""
     database.init_database()
+    # Batched backfills from recent migrations continue in the background while requests are served
+    migrations.backfills.start(database.get_connection)
+    # One-off backfill of weekly rollups for summaries written before trend_cache was maintained
+    await asyncio.to_thread(trends.rebuild, True)
+    # Index transcripts/summaries written before the FTS5 tables existed
+    await asyncio.to_thread(search.ensure_index)
+    # Parse and validate every prompt template once; files are re-read only when edited
+    prompt_registry.registry.load_all()
+    audio.transcription_queue.start()
+    # Summary batches interrupted by a restart continue from their checkpoint
+    batch_summarize.runner.resume_unfinished()
+    # Locate and validate whisper.cpp once; requests only read the cached result
+    await asyncio.to_thread(whisper_utils.resolve_whisper_setup)
+    # Installed models and the stored runtime selection (default/per session type)
+    await asyncio.to_thread(whisper_models.registry.refresh)
+    # Load and warm up the whisper model once instead of on every request
+    await asyncio.to_thread(whisper_engine.start_engine, whisper_models.registry.select()["path"])
     yield
+    await batch_summarize.runner.shutdown()
+    await llm_client.ollama.aclose()
+    whisper_engine.stop_engines()
+    audio.transcription_queue.shutdown()
+    await asyncio.to_thread(migrations.backfills.stop)
+    database.close_all_connections()
 
 # Create FastAPI app
 app = FastAPI(
@@ -75,11 +110,13 @@ app.include_router(session.router)
 app.include_router(transcribe.router)
 app.include_router(summarize.router)
 app.include_router(audio.router)
+app.include_router(live.router)
+app.include_router(batch.router)
+app.include_router(trends_routes.router)
+app.include_router(search_routes.router)
 
-# Include prompt chaining routers
-app.include_router(medication_chain.router)
-app.include_router(freeform_chain.router)
-app.include_router(sundowning_chain.router)
+# Prompt chains for every definition under chains/
+app.include_router(chains.router)
 
 
 @app.get("/")
@@ -104,20 +141,45 @@ async def health_check():
 
 @app.get("/health/whisper")
 async def whisper_health_check():
-    """Health check endpoint for whisper.cpp."""
-    try:
-        from whisper_utils import ensure_whisper_setup
-        binary_path, model_path = ensure_whisper_setup()
-
-        return {
-            "status": "healthy",
-            "whisper": "ready",
-            "binary_path": binary_path,
-            "model_path": model_path
-        }
-    except Exception as e:
+    """Health check endpoint for whisper.cpp (reports the setup resolved at startup)."""
+    setup = whisper_utils.whisper_setup_status()
+    if setup["state"] != whisper_utils.READY:
         raise HTTPException(
-            status_code=503, detail=f"Whisper setup failed: {str(e)}")
+            status_code=503, detail=f"Whisper setup failed: {setup['error'] or setup['state']}")
+
+    return {
+        "status": "healthy",
+        "whisper": "ready",
+        "binary_path": setup["binary_path"],
+        "model_path": setup["model_path"],
+        "server_binary_path": setup["server_binary_path"],
+        "preview_model_path": setup["preview_model_path"],
+        "engine": whisper_engine.engine.status(),
+        "preview_engine": whisper_engine.preview_engine.status(),
+        "transcript_cache": await asyncio.to_thread(transcription_cache.cache.stats)
+    }
+
+
+@app.get("/health/llm-cache")
+async def llm_cache_health_check():
+    """LLM response cache size and hit/miss counters."""
+    return llm_cache.cache.stats()
+
+
+@app.get("/health/migrations")
+async def migrations_health_check():
+    """Schema version, applied migrations and any backfill still in progress."""
+    with database.db_connection() as conn:
+        return migrations.status(conn)
+
+
+@app.get("/health/prompts")
+async def prompts_health_check():
+    """Loaded prompt templates with their versions, plus any that failed validation."""
+    status = prompt_registry.registry.status()
+    if status["errors"]:
+        raise HTTPException(status_code=503, detail=status)
+    return status
 
 
 if __name__ == "__main__":
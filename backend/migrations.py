@@ -0,0 +1,305 @@
+"""
+Versioned schema migrations.
+Each file in db/migrations is named NNNN_description.sql or .py and is
+applied once, in version order, inside its own transaction together with
+its schema_version row, so a failed migration leaves nothing behind.
+
+A .py migration defines upgrade(conn) and/or
+backfill(conn, position, batch_size) -> next position, or None when done.
+upgrade runs at startup like a .sql file. backfill is for rewriting large
+tables: it runs after startup, one short transaction per batch, with its
+position saved in schema_version so it resumes after a restart. Nothing may
+rely on a backfill having finished, only on the schema its upgrade created.
+
+A new database is created from db/schema.sql, which always holds the
+complete current schema, and every migration is recorded as already applied.
+"""
+
+import glob
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_FILE_NAME = re.compile(r"^(\d{4})_([a-z0-9_]+)\.(sql|py)$")
+
+VERSION_TABLE = """CREATE TABLE IF NOT EXISTS schema_version (
+  version           INTEGER PRIMARY KEY,
+  name              TEXT NOT NULL,
+  checksum          TEXT NOT NULL,
+  applied_ts        INTEGER NOT NULL,
+  duration_ms       INTEGER NOT NULL,
+  backfill_position INTEGER,
+  completed_ts      INTEGER
+)"""
+
+
+class MigrationError(Exception):
+    """Raised for a malformed migrations directory or a migration that fails to apply."""
+
+
+class Migration:
+    """One migration file."""
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, "rb") as f:
+            content = f.read()
+        self.checksum = hashlib.sha256(content).hexdigest()[:16]
+        self._module = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+    @property
+    def is_sql(self) -> bool:
+        return self.path.endswith(".sql")
+
+    def module(self):
+        """The loaded .py migration (imported once)."""
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f"carelink_migration_{self.label}", self.path)
+            module = importlib.util.module_from_spec(spec)
+            try:
+                spec.loader.exec_module(module)
+            except Exception as e:
+                raise MigrationError(f"{self.label}: failed to load: {str(e)}")
+            if not hasattr(module, "upgrade") and not hasattr(module, "backfill"):
+                raise MigrationError(f"{self.label}: defines neither upgrade() nor backfill()")
+            self._module = module
+        return self._module
+
+    @property
+    def has_backfill(self) -> bool:
+        return not self.is_sql and hasattr(self.module(), "backfill")
+
+
+def discover(directory: Optional[str] = None) -> List[Migration]:
+    """Migration files in version order; rejects stray names and duplicate versions."""
+    directory = directory or config.CARELINK_MIGRATIONS_DIR
+    found = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        name = os.path.basename(path)
+        if name.startswith((".", "_")) or os.path.isdir(path):
+            continue
+        match = _FILE_NAME.match(name)
+        if not match:
+            raise MigrationError(f"{name}: migration files must be named NNNN_description.sql or .py")
+        version = int(match.group(1))
+        if version in found:
+            raise MigrationError(f"{name}: version {version} is already used by {found[version].path}")
+        found[version] = Migration(version, match.group(2), path)
+    return [found[version] for version in sorted(found)]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a script into complete statements (trigger bodies stay whole)."""
+    statements, current = [], ""
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    leftover = "\n".join(line for line in current.splitlines() if not line.strip().startswith("--")).strip()
+    if leftover:
+        raise MigrationError(f"incomplete statement at end of script: {leftover[:80]}")
+    return statements
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def applied(conn: sqlite3.Connection) -> dict:
+    """version -> schema_version row."""
+    conn.execute(VERSION_TABLE)
+    conn.commit()
+    return {row[0]: row for row in conn.execute("SELECT * FROM schema_version")}
+
+
+def stamp_all(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None):
+    """Record every migration as applied, for a database just created from schema.sql."""
+    conn.execute(VERSION_TABLE)
+    now = _now_ms()
+    conn.executemany(
+        """INSERT OR IGNORE INTO schema_version (version, name, checksum, applied_ts, duration_ms, completed_ts)
+           VALUES (?, ?, ?, ?, 0, ?)""",
+        [(m.version, m.name, m.checksum, now, now) for m in (discover() if migrations is None else migrations)]
+    )
+    conn.commit()
+
+
+def _apply(conn: sqlite3.Connection, migration: Migration) -> Optional[int]:
+    """Run one migration and record it, all in one transaction; returns ms taken (None if already applied)."""
+    started = time.perf_counter()
+    conn.commit()
+    # IMMEDIATE takes the write lock up front, so a second process starting at the same time waits here
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (migration.version,)).fetchone():
+            conn.rollback()
+            return None
+        if migration.is_sql:
+            with open(migration.path, "r") as f:
+                for statement in split_statements(f.read()):
+                    conn.execute(statement)
+        elif hasattr(migration.module(), "upgrade"):
+            migration.module().upgrade(conn)
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        conn.execute(
+            """INSERT INTO schema_version (version, name, checksum, applied_ts, duration_ms, completed_ts)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (migration.version, migration.name, migration.checksum, _now_ms(), elapsed_ms,
+             None if migration.has_backfill else _now_ms())
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        if isinstance(e, MigrationError):
+            raise
+        raise MigrationError(f"{migration.label} failed: {str(e)}")
+    return elapsed_ms
+
+
+def migrate(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None) -> List[str]:
+    """Apply every pending migration in version order; returns the labels applied."""
+    migrations = discover() if migrations is None else migrations
+    done = applied(conn)
+    for migration in migrations:
+        row = done.get(migration.version)
+        if row is not None and row["checksum"] != migration.checksum:
+            logger.warning(f"Migration {migration.label} changed after it was applied; it will not be re-run")
+
+    started = time.perf_counter()
+    labels = []
+    for migration in migrations:
+        if migration.version in done:
+            continue
+        elapsed_ms = _apply(conn, migration)
+        if elapsed_ms is not None:
+            logger.info(f"Applied migration {migration.label} in {elapsed_ms} ms")
+            labels.append(migration.label)
+    if labels:
+        logger.info(f"Schema at version {migrations[-1].version}: {len(labels)} migrations applied in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms")
+    return labels
+
+
+def pending_backfills(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """Applied migrations whose backfill has not finished."""
+    migrations = discover() if migrations is None else migrations
+    unfinished = {row[0] for row in conn.execute(
+        "SELECT version FROM schema_version WHERE completed_ts IS NULL")}
+    return [m for m in migrations if m.version in unfinished and m.has_backfill]
+
+
+def run_backfill(conn: sqlite3.Connection, migration: Migration, batch_size: Optional[int] = None,
+                 pause_sec: Optional[float] = None, should_stop: Callable[[], bool] = lambda: False) -> bool:
+    """
+    Run one migration's backfill batch by batch from its saved position.
+    Each batch commits with its new position, and the write lock is released
+    between batches so requests are not blocked. Returns True once finished.
+    """
+    batch_size = batch_size or config.CARELINK_MIGRATION_BATCH_SIZE
+    pause_sec = config.CARELINK_MIGRATION_BATCH_PAUSE_MS / 1000 if pause_sec is None else pause_sec
+    backfill = migration.module().backfill
+    started = time.perf_counter()
+    batches = 0
+    while not should_stop():
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT backfill_position, completed_ts FROM schema_version WHERE version = ?",
+                               (migration.version,)).fetchone()
+            if row["completed_ts"] is not None:
+                conn.rollback()
+                return True
+            position = backfill(conn, row["backfill_position"] or 0, batch_size)
+            if position is None:
+                conn.execute(
+                    "UPDATE schema_version SET completed_ts = ?, duration_ms = duration_ms + ? WHERE version = ?",
+                    (_now_ms(), int((time.perf_counter() - started) * 1000), migration.version))
+            else:
+                conn.execute("UPDATE schema_version SET backfill_position = ? WHERE version = ?",
+                             (position, migration.version))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise MigrationError(f"{migration.label} backfill failed: {str(e)}")
+        batches += 1
+        if position is None:
+            logger.info(f"Backfill {migration.label} finished: {batches} batches in "
+                        f"{time.perf_counter() - started:.1f}s")
+            return True
+        if batches % 50 == 0:
+            logger.info(f"Backfill {migration.label}: {batches} batches, at position {position}")
+        time.sleep(pause_sec)
+    logger.info(f"Backfill {migration.label} paused after {batches} batches; it resumes on next start")
+    return False
+
+
+class BackfillRunner:
+    """Runs pending backfills on a background thread after startup."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, connect: Callable[[], sqlite3.Connection]):
+        """Start working through pending backfills with a connection from connect()."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(connect,), name="migration-backfill", daemon=True)
+        self._thread.start()
+
+    def _run(self, connect: Callable[[], sqlite3.Connection]):
+        conn = connect()
+        try:
+            for migration in pending_backfills(conn):
+                if not run_backfill(conn, migration, should_stop=self._stop.is_set):
+                    return
+        except MigrationError as e:
+            logger.error(str(e))
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the current batch."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def status(conn: sqlite3.Connection) -> dict:
+    """Current version, applied migrations and unfinished backfills."""
+    rows = applied(conn)
+    return {
+        "version": max(rows) if rows else 0,
+        "migrations": [
+            {"version": row["version"], "name": row["name"], "applied_ts": row["applied_ts"],
+             "duration_ms": row["duration_ms"], "completed": row["completed_ts"] is not None}
+            for row in (rows[version] for version in sorted(rows))
+        ],
+        "pending_backfills": [
+            {"version": row["version"], "name": row["name"], "position": row["backfill_position"]}
+            for row in (rows[version] for version in sorted(rows)) if row["completed_ts"] is None
+        ],
+        "backfill_running": backfills.running,
+    }
+
+
+backfills = BackfillRunner()
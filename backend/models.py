@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 
 
 # Request Models
@@ -8,11 +8,19 @@ from typing import Optional, List, Dict, Any
 class StartSessionRequest(BaseModel):
     session_type: str
     timestamp: int = Field(..., description="Timestamp in milliseconds")
+    patient_id: Optional[str] = None
 
 
 class TranscribeRequest(BaseModel):
     session_id: str
     audio_path: str
+    model: Optional[str] = Field(None, description="Installed whisper model, e.g. base.en-q5_0")
+
+
+class WhisperModelSelection(BaseModel):
+    default: Optional[str] = Field(None, description="Model used when nothing more specific applies")
+    session_types: Dict[str, Optional[str]] = Field(
+        default_factory=dict, description="session_type -> model; null clears the mapping")
 
 
 class SummarizeRequest(BaseModel):
@@ -30,6 +38,16 @@ class StoreSessionRequest(BaseModel):
     timestamp: int = Field(..., description="End timestamp in milliseconds")
 
 
+class BatchSummarizeRequest(BaseModel):
+    missing_summary: bool = Field(True, description="Only sessions without a summaries row")
+    start_ts: Optional[int] = Field(None, description="Sessions starting at or after this epoch ms")
+    end_ts: Optional[int] = Field(None, description="Sessions starting before this epoch ms")
+    session_type: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of sessions in the batch")
+    concurrency: Optional[int] = Field(None, ge=1, description="Concurrent LLM calls (capped by Ollama's limit)")
+    bypass_cache: bool = False
+
+
 # Prompt Chaining Request/Response Models
 
 
@@ -55,6 +73,15 @@ class ChainSummarizeRequest(BaseModel):
     analyzed_data: Dict[str, Any]
 
 
+class ChainRunRequest(BaseModel):
+    session_id: str
+    transcript: str
+
+
+class ChainStageRequest(BaseModel):
+    fields: Dict[str, Any] = Field(..., description="Placeholder values; objects are sent as JSON")
+
+
 class SummarizeResponse(BaseModel):
     summary: str
     tone: str
@@ -64,6 +91,22 @@ class SummarizeResponse(BaseModel):
     agitation_score: float
     mood_label: str
 
+# LLM Output Models (sent to Ollama as the `format` JSON schema)
+
+
+class RepetitionItem(BaseModel):
+    phrase: str
+    count: int = 1
+
+
+class SessionSummaryOutput(BaseModel):
+    summary: str
+    repetition_json: List[Union[RepetitionItem, str]] = Field(default_factory=list)
+    agitation_score: float = 0.0
+    mood_label: str = "unknown"
+    suggestions: Union[str, List[str]] = ""
+
+
 # Response Models
 
 
@@ -116,11 +159,13 @@ class SessionListItem(BaseModel):
     session_id: str
     session_type: str
     start_ts: int
+    patient_id: Optional[str] = None
     summary_snippet: Optional[str] = None
 
 
 class SessionListResponse(BaseModel):
     sessions: List[SessionListItem]
+    next_cursor: Optional[str] = Field(None, description="Pass as ?cursor= for the next page; null on the last page")
 
 # Database Models (for internal use)
 
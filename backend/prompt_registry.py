@@ -0,0 +1,212 @@
+"""
+Prompt templates held in memory.
+Every prompts/*.json file is loaded and validated once at startup; after
+that a file is only re-read when its mtime changes, so requests never open
+or parse JSON. Each template carries a content version, the same hash the
+LLM cache keys completions on.
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import string
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import config
+from llm_cache import template_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "default"
+
+# Template names come from request fields (session_type), so keep them to file-safe names
+_TEMPLATE_NAME = re.compile(r"^[a-z0-9_-]+$")
+
+# Placeholders each chain stage formats into its template
+STAGE_PLACEHOLDERS = {
+    "extract": {"transcript"},
+    "analyze": {"extracted_data"},
+    "summary": {"extracted_data", "analyzed_data"},
+}
+# Single-shot session templates (conversation.json, default.json, ...)
+SESSION_PLACEHOLDERS = {"transcript"}
+
+
+class PromptTemplateError(Exception):
+    """Raised for a missing template or one whose placeholders do not match its use."""
+
+
+def expected_placeholders(name: str) -> Set[str]:
+    """Placeholders a template must use, derived from its name (medication_analyze -> analyze)."""
+    stage = name.rsplit("_", 1)[-1] if "_" in name else None
+    return STAGE_PLACEHOLDERS.get(stage, SESSION_PLACEHOLDERS)
+
+
+def template_placeholders(template: str) -> Set[str]:
+    """Field names referenced by a str.format template."""
+    try:
+        return {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+    except ValueError as e:
+        raise PromptTemplateError(f"malformed template: {str(e)}")
+
+
+class PromptTemplate:
+    """One loaded template file."""
+
+    def __init__(self, name: str, path: str, template: str, mtime: float):
+        self.name = name
+        self.path = path
+        self.template = template
+        self.mtime = mtime
+        self.version = template_hash(template)[:12]
+        self.placeholders = template_placeholders(template)
+        self.checked_at = time.monotonic()
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "placeholders": sorted(self.placeholders),
+            "mtime": self.mtime,
+        }
+
+
+def load_template_file(path: str, expected: Optional[Set[str]] = None) -> PromptTemplate:
+    """Read and validate one template file against its expected placeholders."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    mtime = os.path.getmtime(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            template = json.load(f)["prompt_template"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise PromptTemplateError(f"{name}: cannot read prompt_template ({str(e)})")
+
+    loaded = PromptTemplate(name, path, template, mtime)
+    expected = expected if expected is not None else expected_placeholders(name)
+    if loaded.placeholders != expected:
+        raise PromptTemplateError(
+            f"{name}: placeholders {sorted(loaded.placeholders)} do not match {sorted(expected)}")
+    try:
+        template.format(**{field: "" for field in expected})
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise PromptTemplateError(f"{name}: template does not format ({str(e)})")
+    return loaded
+
+
+class PromptRegistry:
+    """In-memory prompt templates with mtime-based hot reload."""
+
+    def __init__(self, prompts_dir: str, check_interval: float = 2.0):
+        self.prompts_dir = prompts_dir
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._errors: Dict[str, str] = {}
+        self._expected: Dict[str, Set[str]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def expect(self, name: str, placeholders: Set[str]):
+        """Declare the placeholders a template must use (e.g. from a chain definition)."""
+        with self._lock:
+            self._expected[name] = set(placeholders)
+
+    def _load(self, path: str) -> PromptTemplate:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            expected = self._expected.get(name)
+        return load_template_file(path, expected)
+
+    def load_all(self, strict: bool = False) -> List[str]:
+        """
+        Load every template in prompts_dir. Returns the validation errors;
+        with strict=True the first problem raises instead.
+        """
+        templates, errors = {}, {}
+        for path in sorted(glob.glob(os.path.join(self.prompts_dir, "*.json"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                templates[name] = self._load(path)
+            except (PromptTemplateError, OSError) as e:
+                if strict:
+                    raise PromptTemplateError(str(e))
+                errors[name] = str(e)
+                logger.error(f"Prompt template rejected: {str(e)}")
+
+        with self._lock:
+            self._templates = templates
+            self._errors = errors
+            self._loaded = True
+        logger.info(f"Loaded {len(templates)} prompt templates from {self.prompts_dir}")
+        return list(errors.values())
+
+    def _reload_if_changed(self, loaded: PromptTemplate) -> PromptTemplate:
+        now = time.monotonic()
+        if now - loaded.checked_at < self.check_interval:
+            return loaded
+        loaded.checked_at = now
+        try:
+            if os.path.getmtime(loaded.path) == loaded.mtime:
+                return loaded
+            fresh = self._load(loaded.path)
+        except (PromptTemplateError, OSError) as e:
+            # Keep serving the last good version until the file is fixed
+            with self._lock:
+                self._errors[loaded.name] = str(e)
+            logger.error(f"Prompt template reload failed, keeping version {loaded.version}: {str(e)}")
+            return loaded
+
+        with self._lock:
+            self._templates[loaded.name] = fresh
+            self._errors.pop(loaded.name, None)
+            self.reloads += 1
+        logger.info(f"Reloaded prompt template {loaded.name}: {loaded.version} -> {fresh.version}")
+        return fresh
+
+    def get(self, name: str) -> PromptTemplate:
+        """Template by name (file name without .json), picking up edits to its file."""
+        if not self._loaded:
+            self.load_all()
+        with self._lock:
+            loaded = self._templates.get(name)
+        if loaded is None:
+            # A file added after startup
+            path = os.path.join(self.prompts_dir, f"{name}.json")
+            if not _TEMPLATE_NAME.match(name) or not os.path.isfile(path):
+                raise PromptTemplateError(f"Prompt template not found: {name}")
+            loaded = self._load(path)
+            with self._lock:
+                self._templates[name] = loaded
+            return loaded
+        return self._reload_if_changed(loaded)
+
+    def template(self, name: str) -> str:
+        return self.get(name).template
+
+    def for_session_type(self, session_type: str) -> PromptTemplate:
+        """Session summary template, falling back to the default one."""
+        try:
+            return self.get(session_type.lower())
+        except PromptTemplateError:
+            return self.get(DEFAULT_TEMPLATE)
+
+    def versions(self) -> Dict[str, str]:
+        """Template name -> content version currently in use."""
+        with self._lock:
+            return {name: t.version for name, t in sorted(self._templates.items())}
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "prompts_dir": self.prompts_dir,
+                "templates": {name: t.info() for name, t in sorted(self._templates.items())},
+                "errors": dict(self._errors),
+                "reloads": self.reloads,
+            }
+
+
+# Process-wide registry used by /api/summarize and the prompt chains
+registry = PromptRegistry(config.CARELINK_PROMPTS_DIR, config.CARELINK_PROMPT_RELOAD_CHECK_SEC)
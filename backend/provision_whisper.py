@@ -0,0 +1,235 @@
+"""
+Provision whisper.cpp for this machine.
+
+Detects CPU features (AVX2 / AVX-512 / FMA / NEON), builds one whisper.cpp
+variant per usable instruction set (optionally with BLAS), benchmarks every
+variant and thread count on clips from backend/recordings, and writes the
+fastest build and thread count to the profile file read by config.py.
+
+Usage:
+    python provision_whisper.py [--blas] [--clips 3] [--threads 2,4,8] [--skip-build]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import audio_decode
+import config
+from whisper_utils import build_whisper_cpp, find_built_binary, run_whisper_cli
+
+logger = logging.getLogger(__name__)
+
+# Instruction-set flags that change which ggml kernels are compiled in
+FEATURE_FLAGS = ("avx", "avx2", "fma", "f16c", "avx512f", "neon")
+
+_AVX2_FLAGS = ("-DGGML_NATIVE=OFF", "-DGGML_AVX=ON", "-DGGML_AVX2=ON",
+               "-DGGML_FMA=ON", "-DGGML_F16C=ON")
+
+
+def parse_cpu_features(cpuinfo: str) -> Set[str]:
+    """Extract the instruction sets we care about from /proc/cpuinfo text."""
+    features = set()
+    for line in cpuinfo.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() in ("flags", "features"):
+            flags = set(value.lower().split())
+            features |= flags & set(FEATURE_FLAGS)
+            # ARM reports Advanced SIMD as asimd
+            if "asimd" in flags:
+                features.add("neon")
+    return features
+
+
+def detect_cpu_features() -> Set[str]:
+    """Instruction sets available on this machine."""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/cpuinfo", "r") as f:
+                return parse_cpu_features(f.read())
+        except OSError:
+            return set()
+    if sys.platform == "darwin":
+        if platform.machine() == "arm64":
+            return {"neon"}
+        result = subprocess.run(
+            ["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+            capture_output=True, text=True)
+        flags = result.stdout.lower().replace("avx1.0", "avx")
+        return parse_cpu_features(f"flags: {flags}")
+    return set()
+
+
+def build_variants(features: Set[str], blas: bool = False,
+                   blas_vendor: str = "OpenBLAS") -> List[Tuple[str, Tuple[str, ...]]]:
+    """(name, cmake flags) for every build worth benchmarking on this CPU."""
+    variants = [("native", ("-DGGML_NATIVE=ON",))]
+    if {"avx2", "fma", "f16c"} <= features:
+        variants.append(("avx2", _AVX2_FLAGS))
+        if "avx512f" in features:
+            variants.append(("avx512", _AVX2_FLAGS + ("-DGGML_AVX512=ON",)))
+    if blas:
+        variants += [
+            (f"{name}-blas", flags + ("-DGGML_BLAS=ON", f"-DGGML_BLAS_VENDOR={blas_vendor}"))
+            for name, flags in list(variants)
+        ]
+    return variants
+
+
+def default_thread_counts() -> List[int]:
+    """Powers of two up to the core count, plus the core count itself."""
+    cores = os.cpu_count() or 1
+    counts = {cores}
+    n = 1
+    while n < cores:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def prepare_clips(recordings_dir: str, out_dir: str, max_clips: int,
+                  max_seconds: int) -> List[Tuple[str, float]]:
+    """Normalize up to max_clips recordings to 16 kHz mono WAV; returns (path, seconds)."""
+    clips = []
+    sources = sorted(glob.glob(os.path.join(recordings_dir, "*")), key=os.path.getsize, reverse=True)
+    for source in sources:
+        if len(clips) >= max_clips:
+            break
+        with open(source, "rb") as f:
+            audio_bytes = f.read()
+        pcm = audio_decode.wav_pcm(audio_bytes)
+        if pcm is None:
+            try:
+                pcm = audio_decode.decode_to_pcm(audio_bytes)
+            except (audio_decode.AudioDecodeError, OSError, subprocess.TimeoutExpired):
+                continue
+        pcm = pcm[:max_seconds * audio_decode.WHISPER_SAMPLE_RATE * 2]
+        seconds = len(pcm) / (audio_decode.WHISPER_SAMPLE_RATE * 2)
+        if seconds < 1:
+            continue
+        clip_path = os.path.join(out_dir, f"clip_{len(clips)}.wav")
+        with open(clip_path, "wb") as f:
+            f.write(audio_decode.pcm_to_wav(pcm))
+        clips.append((clip_path, seconds))
+    return clips
+
+
+def benchmark(cli_path: str, model_path: str, clips: List[Tuple[str, float]],
+              thread_counts: List[int],
+              run: Callable[..., tuple] = run_whisper_cli) -> List[Dict]:
+    """Real-time factor (processing seconds / audio seconds) per thread count."""
+    # One untimed run so the model is in the page cache for every measurement
+    run(cli_path, model_path, clips[0][0], "en", threads=thread_counts[-1])
+
+    audio_seconds = sum(seconds for _, seconds in clips)
+    results = []
+    for threads in thread_counts:
+        started = time.monotonic()
+        for clip_path, _ in clips:
+            result, _ = run(cli_path, model_path, clip_path, "en", threads=threads)
+            if result.returncode != 0:
+                raise RuntimeError(f"{cli_path} failed with exit code {result.returncode}")
+        elapsed = time.monotonic() - started
+        results.append({
+            "threads": threads,
+            "seconds": round(elapsed, 3),
+            "real_time_factor": round(elapsed / audio_seconds, 4),
+        })
+    return results
+
+
+def pick_fastest(results: List[Dict]) -> Optional[Dict]:
+    """Lowest real-time factor; ties go to fewer threads."""
+    usable = [r for r in results if "real_time_factor" in r]
+    if not usable:
+        return None
+    return min(usable, key=lambda r: (r["real_time_factor"], r["threads"]))
+
+
+def write_profile(path: str, best: Dict, features: Set[str], results: List[Dict],
+                  model_path: str, clip_count: int):
+    profile = {
+        "variant": best["variant"],
+        "build_dir": best["build_dir"],
+        "cli_path": best["cli_path"],
+        "server_path": best.get("server_path") or "",
+        "threads": best["threads"],
+        "real_time_factor": best["real_time_factor"],
+        "cpu_features": sorted(features),
+        "model_path": model_path,
+        "clips": clip_count,
+        "created_at": datetime.now().isoformat(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    return profile
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--blas", action="store_true", help="also build BLAS-enabled variants")
+    parser.add_argument("--blas-vendor", default="OpenBLAS")
+    parser.add_argument("--clips", type=int, default=3, help="recordings to benchmark on")
+    parser.add_argument("--max-seconds", type=int, default=30, help="trim each clip to this length")
+    parser.add_argument("--threads", help="comma-separated thread counts (default: powers of two)")
+    parser.add_argument("--recordings", default=os.path.join(config.BACKEND_DIR, "recordings"))
+    parser.add_argument("--skip-build", action="store_true", help="benchmark existing build-* dirs only")
+    parser.add_argument("--output", default=config.CARELINK_WHISPER_PROFILE_PATH)
+    args = parser.parse_args(argv)
+
+    features = detect_cpu_features()
+    variants = build_variants(features, args.blas, args.blas_vendor)
+    thread_counts = ([int(t) for t in args.threads.split(",")] if args.threads
+                     else default_thread_counts())
+    model_path = config.CARELINK_WHISPER_MODEL_PATH
+    print(f"CPU features: {', '.join(sorted(features)) or 'none detected'}")
+    print(f"Variants: {', '.join(name for name, _ in variants)}; threads: {thread_counts}")
+
+    with tempfile.TemporaryDirectory(prefix="whisper-bench-") as clip_dir:
+        clips = prepare_clips(args.recordings, clip_dir, args.clips, args.max_seconds)
+        if not clips:
+            print(f"No usable recordings found in {args.recordings}")
+            return 1
+
+        results = []
+        for name, flags in variants:
+            build_dir = os.path.join(config.CARELINK_WHISPER_DIR, f"build-{name}")
+            try:
+                if not args.skip_build:
+                    build_whisper_cpp(build_dir, flags)
+                cli_path = find_built_binary(["whisper-cli", "main"], build_dir)
+                if not cli_path:
+                    raise RuntimeError(f"no whisper-cli in {build_dir}")
+                for row in benchmark(cli_path, model_path, clips, thread_counts):
+                    row.update(variant=name, build_dir=build_dir, cli_path=cli_path,
+                               server_path=find_built_binary(["whisper-server", "server"], build_dir))
+                    results.append(row)
+                    print(f"  {name:<14} threads={row['threads']:<3} RTF={row['real_time_factor']:.3f}")
+            except (subprocess.CalledProcessError, RuntimeError, OSError) as e:
+                print(f"  {name:<14} skipped: {str(e)}")
+                results.append({"variant": name, "error": str(e)})
+
+    best = pick_fastest(results)
+    if not best:
+        print("No variant could be built and benchmarked")
+        return 1
+
+    write_profile(args.output, best, features, results, model_path, len(clips))
+    print(f"Fastest: {best['variant']} with {best['threads']} threads "
+          f"(RTF {best['real_time_factor']:.3f}); profile written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
 import tempfile
-import shutil
 from datetime import datetime
 import uuid
 import json
+import asyncio
 import logging
 import traceback
+import functools
+import threading
 from typing import Optional
 
 # Import our existing functions
@@ -16,8 +18,18 @@ import os
 backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, backend_dir)
 
-from transcribe import transcribe_audio
+from transcribe import transcribe_audio_bytes, transcribe_preview_bytes
+from whisper_models import registry as whisper_models, UnknownModelError
+from job_queue import Job, JobQueue, QueueFullError
+from llm_client import generate_structured, CLIENT_CLOSED_REQUEST
+from streaming import stream_completion, sse_event, SSE_HEADERS
+import config
 import database
+import transcription_cache
+import audio_decode
+import chunked_transcription
+import crud
+import trends
 
 router = APIRouter(prefix="/api", tags=["audio"])
 
@@ -27,120 +39,366 @@ os.makedirs(RECORDINGS_DIR, exist_ok=True)
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
-@router.post("/record-audio")
-async def record_audio(
-    audio: UploadFile = File(...),
-    patient_id: str = Form("default_patient"),
-    session_type: str = Form("freeform")
-):
+# Shared pool that runs conversion + transcription off the event loop
+transcription_queue = JobQueue(
+    "transcription",
+    max_workers=config.CARELINK_TRANSCRIBE_WORKERS,
+    max_pending=config.CARELINK_TRANSCRIBE_QUEUE_SIZE,
+    retention_sec=config.CARELINK_JOB_RETENTION_SEC
+)
+
+
+def _decode_for_whisper(audio_bytes: bytes, content_type: str):
+    """Return (wav_bytes, pcm); pcm is None when the audio cannot be chunked."""
+    if audio_decode.needs_decode(content_type):
+        pcm = audio_decode.decode_to_pcm(audio_bytes)
+        return audio_decode.pcm_to_wav(pcm), pcm
+    return audio_bytes, audio_decode.wav_pcm(audio_bytes)
+
+
+def _transcribe_in_chunks(job: Job, session_id: str, file_path: Optional[str], pcm: bytes,
+                          model_path: Optional[str] = None) -> str:
     """
-    Upload audio file, transcribe it, and return transcript with metadata.
-    This replaces the local recording functionality for web-based uploads.
+    Transcribe a long recording as overlapping windows in parallel, storing
+    each chunk and its transcript as soon as it finishes.
+    """
+    chunks = chunked_transcription.split_pcm(
+        pcm, config.CARELINK_CHUNK_WINDOW_SEC, config.CARELINK_CHUNK_OVERLAP_SEC)
+    logger.info(f"Transcribing {session_id} as {len(chunks)} chunks "
+                f"({config.CARELINK_CHUNK_WORKERS} workers)")
+    # Chunks reference their span of the recording as a media fragment
+    source = file_path or session_id
+    done = []
+
+    def store_chunk(index: int, chunk, text: str):
+        start_sec, end_sec, _ = chunk
+        chunk_id = crud.insert_audio_chunk(
+            session_id, f"{source}#t={start_sec:.2f},{end_sec:.2f}",
+            duration_sec=int(round(end_sec - start_sec)))
+        crud.insert_transcript(session_id, text, chunk_id=chunk_id, language="en")
+        done.append(index)
+        job.update(stage="transcribing", progress=0.3 + 0.6 * len(done) / len(chunks))
+
+    texts = chunked_transcription.transcribe_chunks(
+        chunks, functools.partial(transcribe_audio_bytes, model_path=model_path),
+        config.CARELINK_CHUNK_WORKERS, on_chunk=store_chunk)
+    return chunked_transcription.stitch(texts)
+
+
+class _PreviewPass:
+    """
+    Small-model transcript of the first chunk window, run on its own thread
+    while the accurate pass works. A preview that arrives after close() is
+    neither stored nor published.
     """
-    try:
-        # Validate audio file (more permissive check)
-        print(f"Received file: {audio.filename}, Content-Type: {audio.content_type}, Size: {audio.size}")
-
-        # Allow common audio types and some flexibility for webm/wav files
-        valid_types = ['audio/', 'video/webm', 'application/octet-stream']
-        if not any(audio.content_type.startswith(t) for t in valid_types):
-            raise HTTPException(status_code=400, detail=f"File must be an audio file, received: {audio.content_type}")
-
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        session_id = f"session_{timestamp}_{uuid.uuid4().hex[:8]}"
-        filename = f"{session_id}.wav"
-        file_path = os.path.join(RECORDINGS_DIR, filename)
 
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
-
-        # Convert WebM to WAV if needed (whisper.cpp only supports flac, mp3, ogg, wav)
-        wav_file_path = file_path
-        if audio.content_type.startswith('video/webm') or audio.content_type.startswith('audio/webm'):
-            logger.info(f"Converting WebM to WAV format for file: {file_path}")
-            wav_file_path = file_path.replace('.wav', '_converted.wav')
-            try:
-                import subprocess
-                result = subprocess.run([
-                    'ffmpeg', '-i', file_path, '-acodec', 'pcm_s16le',
-                    '-ar', '16000', '-ac', '1', wav_file_path, '-y'
-                ], capture_output=True, text=True, timeout=30)
-
-                if result.returncode != 0:
-                    logger.error(f"FFmpeg conversion failed: {result.stderr}")
-                    raise Exception(f"Audio conversion failed: {result.stderr}")
-
-                logger.info(f"Successfully converted {file_path} to {wav_file_path}")
-                # Remove the original WebM file to save space
-                os.remove(file_path)
-            except Exception as conversion_error:
-                logger.error(f"Audio conversion failed: {str(conversion_error)}")
-                raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(conversion_error)}")
-
-        # Transcribe the audio
-        logger.info(f"Starting transcription for file: {wav_file_path}")
+    def __init__(self, job: Job, session_id: str, wav_bytes: bytes, build_result):
+        self._job = job
+        self._session_id = session_id
+        self._wav_bytes = wav_bytes
+        self._build_result = build_result
+        self._lock = threading.Lock()
+        self._closed = False
+        self.transcript_id: Optional[int] = None
+        threading.Thread(target=self._run, name=f"preview-{session_id}", daemon=True).start()
+
+    def _run(self):
         try:
-            transcript = transcribe_audio(wav_file_path)
+            preview = transcribe_preview_bytes(self._wav_bytes)
+        except Exception as e:
+            logger.warning(f"Preview transcription failed for {self._session_id}: {str(e)}")
+            return
+        if preview is None:
+            return
+        preview = preview.strip()
+        with self._lock:
+            if self._closed:
+                return
+            self.transcript_id = crud.insert_transcript(self._session_id, preview, language="en")
+            self._job.publish(self._build_result(preview, "preview", self.transcript_id))
+        logger.info(f"Preview transcript ready for {self._session_id}")
+
+    def close(self) -> Optional[int]:
+        """Drop any preview still running; returns the stored preview row, if there is one."""
+        with self._lock:
+            self._closed = True
+            return self.transcript_id
+
+
+def _process_recording(job: Job, audio_bytes: bytes, content_type: str, session_id: str,
+                       file_path: Optional[str], patient_id: str, session_type: str,
+                       model_path: Optional[str] = None) -> dict:
+    """
+    Worker body for /record-audio: decode, transcribe and store.
+    Audio is decoded and transcribed in memory; file_path, when given, only
+    archives the original upload. With two-tier transcription the small model
+    previews the first chunk window alongside the accurate pass; its row is
+    published (and stored) if it arrives first, then replaced by the accurate
+    model's transcript. Recordings longer than one chunk window are
+    transcribed in parallel chunks. model_path picks the whisper model
+    (default: the configured one). Runs on the transcription pool, never on
+    the event loop.
+    """
+    session_created = False
+    preview = None
+    try:
+        if file_path:
+            job.update(stage="saving", progress=0.05)
+            with open(file_path, "wb") as buffer:
+                buffer.write(audio_bytes)
+
+        # Session row first so chunk rows can be written as they complete
+        with database.db_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO sessions (session_id, session_type, start_ts, notes, patient_id)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (session_id, session_type, int(datetime.now().timestamp() * 1000),
+                 f"Patient: {patient_id}", patient_id)
+            )
+        session_created = True
+
+        def build_result(text: str, transcript_status: str, transcript_id: int) -> dict:
+            # Result JSON (matching existing format)
+            return {
+                "transcript": text,
+                "transcript_status": transcript_status,
+                "transcript_id": transcript_id,
+                "metadata": {
+                    "session_id": session_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "patient_id": patient_id,
+                    "session_type": session_type,
+                    "audio_file": os.path.basename(file_path) if file_path else None
+                }
+            }
+
+        # Duplicate uploads skip decoding and whisper entirely
+        audio_sha256 = transcription_cache.audio_hash(audio_bytes)
+        whisper_model = transcription_cache.model_name(model_path or config.CARELINK_WHISPER_MODEL_PATH)
+        transcript = transcription_cache.cache.get(audio_sha256, whisper_model, "en")
+
+        chunked = False
+        transcript_id = None
+        if transcript is None:
+            # whisper.cpp only reads wav; pipe anything else through ffmpeg to 16 kHz PCM
+            if audio_decode.needs_decode(content_type):
+                job.update(stage="converting", progress=0.1)
+                logger.info(f"Decoding {content_type} upload for {session_id} in memory")
+            wav_bytes, pcm = _decode_for_whisper(audio_bytes, content_type)
+
+            window_bytes = config.CARELINK_CHUNK_WINDOW_SEC * audio_decode.WHISPER_SAMPLE_RATE * 2
+            long_recording = pcm is not None and len(pcm) > window_bytes
+
+            # Two-tier: a small-model transcript of the opening window goes on screen
+            # while the accurate pass runs, and is upgraded when that finishes
+            if config.CARELINK_TWO_TIER_TRANSCRIPTION:
+                preview_wav = audio_decode.pcm_to_wav(pcm[:window_bytes]) if long_recording else wav_bytes
+                preview = _PreviewPass(job, session_id, preview_wav, build_result)
+
+            # Transcribe the audio
+            job.update(stage="transcribing", progress=0.3)
+            if long_recording:
+                chunked = True
+                transcript = _transcribe_in_chunks(job, session_id, file_path, pcm, model_path)
+            else:
+                logger.info(f"Starting transcription for {session_id} ({len(wav_bytes)} bytes)")
+                transcript = transcribe_audio_bytes(wav_bytes, model_path=model_path)
+            if preview is not None:
+                transcript_id = preview.close()
+            transcription_cache.cache.put(audio_sha256, whisper_model, "en", transcript)
             logger.info(f"Transcription completed. Length: {len(transcript) if transcript else 0}, Content: {transcript[:100] if transcript else 'EMPTY'}")
-        except Exception as transcription_error:
-            logger.error(f"Transcription failed: {str(transcription_error)}")
-            logger.error(f"Transcription error traceback: {traceback.format_exc()}")
-            raise
 
         # Clean up transcript
         transcript = transcript.strip()
 
-        # Build result JSON (matching existing format)
-        result = {
-            "transcript": transcript,
-            "metadata": {
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat(),
-                "patient_id": patient_id,
-                "session_type": session_type,
-                "audio_file": os.path.basename(wav_file_path)
-            }
-        }
-
         # Store in database
-        with database.db_cursor() as cursor:
-            # Create session record (matching actual schema)
-            cursor.execute(
-                """INSERT INTO sessions (session_id, session_type, start_ts, notes)
-                   VALUES (?, ?, ?, ?)""",
-                (session_id, session_type, int(datetime.now().timestamp() * 1000), f"Patient: {patient_id}")
-            )
+        job.update(stage="storing", progress=0.9)
+        # Store audio chunk only when the recording was archived in one piece
+        if file_path and not chunked:
+            crud.insert_audio_chunk(session_id, file_path)
+
+        # Store the full transcript (chunk_id NULL; per-chunk rows carry their chunk_id),
+        # replacing the preview row when there was one
+        if transcript_id is not None:
+            crud.update_transcript_text(transcript_id, transcript)
+        else:
+            transcript_id = crud.insert_transcript(session_id, transcript, language="en")
+
+        return build_result(transcript, "final", transcript_id)
+
+    except Exception:
+        if preview is not None:
+            preview.close()
+        # Clean up file and partial rows if something went wrong
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        if session_created:
+            with database.db_cursor() as cursor:
+                cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        raise
 
-            # Store audio chunk (check actual table structure)
-            cursor.execute(
-                """INSERT INTO audio_chunks (session_id, file_path, created_ts)
-                   VALUES (?, ?, ?)""",
-                (session_id, file_path, int(datetime.now().timestamp() * 1000))
-            )
 
-            # Store transcript
-            cursor.execute(
-                """INSERT INTO transcripts (session_id, text, created_ts)
-                   VALUES (?, ?, ?)""",
-                (session_id, transcript, int(datetime.now().timestamp() * 1000))
-            )
+@router.post("/record-audio", status_code=202)
+async def record_audio(
+    audio: UploadFile = File(...),
+    patient_id: str = Form("default_patient"),
+    session_type: str = Form("freeform"),
+    model: Optional[str] = Form(None)
+):
+    """
+    Upload audio file and queue it for transcription.
+    Returns a job id immediately; poll /api/record-audio/{job_id} for the transcript.
+    `model` names an installed whisper model (see /api/whisper/models); without it
+    the model selected for the session type, or the default, is used.
+    """
+    # Validate audio file (more permissive check)
+    logger.info(f"Received file: {audio.filename}, Content-Type: {audio.content_type}, Size: {audio.size}")
 
-        return JSONResponse(content=result)
+    # Allow common audio types and some flexibility for webm/wav files
+    valid_types = ['audio/', 'video/webm', 'application/octet-stream']
+    if not any(audio.content_type.startswith(t) for t in valid_types):
+        raise HTTPException(status_code=400, detail=f"File must be an audio file, received: {audio.content_type}")
 
-    except Exception as e:
-        # Clean up file if something went wrong
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+    try:
+        whisper_model = whisper_models.select(model, session_type)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Generate unique session id with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    session_id = f"session_{timestamp}_{uuid.uuid4().hex[:8]}"
+
+    # Archive under the upload's real container extension (webm stays .webm)
+    file_path = None
+    if config.CARELINK_ARCHIVE_RECORDINGS:
+        filename = f"{session_id}{audio_decode.extension_for(audio.content_type)}"
+        file_path = os.path.join(RECORDINGS_DIR, filename)
+
+    audio_bytes = await audio.read()
+
+    try:
+        job = transcription_queue.submit(
+            _process_recording, audio_bytes, audio.content_type, session_id,
+            file_path, patient_id, session_type, whisper_model["path"], kind="record-audio"
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Transcription queue is busy, retry shortly: {str(e)}")
+
+    return JSONResponse(status_code=202, content={
+        "job_id": job.job_id,
+        "status": job.status,
+        "metadata": {
+            "session_id": session_id,
+            "patient_id": patient_id,
+            "session_type": session_type,
+            "whisper_model": whisper_model["name"]
+        }
+    })
+
+
+@router.get("/record-audio/{job_id}")
+async def get_record_audio_job(job_id: str):
+    """Report progress of a queued recording; includes the transcript once completed."""
+    job = transcription_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job.to_dict())
+
+
+async def _job_events(job: Job, poll_interval: float = 0.1):
+    """Push job changes as SSE: `progress`, `preview` once, then `final` or `error`."""
+    seen_revision = -1
+    preview_sent = False
+    while True:
+        state = job.to_dict()
+        if state["revision"] != seen_revision:
+            seen_revision = state["revision"]
+            result = state["result"]
+            if state["status"] == "completed":
+                yield sse_event("final", result)
+                return
+            if state["status"] == "failed":
+                yield sse_event("error", {"detail": state["error"]})
+                return
+            if result and result.get("transcript_status") == "preview" and not preview_sent:
+                preview_sent = True
+                yield sse_event("preview", result)
+            yield sse_event("progress", {"stage": state["stage"], "progress": state["progress"]})
+        await asyncio.sleep(poll_interval)
+
+
+@router.get("/record-audio/{job_id}/events")
+async def record_audio_job_events(job_id: str):
+    """
+    Server-Sent Events for a queued recording: a `preview` transcript as soon
+    as the small model has one, then the `final` transcript that replaced it.
+    """
+    job = transcription_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(_job_events(job), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _analysis_from_response(parsed_response: dict, session_type: str) -> dict:
+    """Map a validated summary object onto the analysis shape returned by /process-session."""
+    return {
+        "summary": parsed_response["summary"].strip(),
+        "mood_label": parsed_response["mood_label"],
+        "agitation_score": parsed_response["agitation_score"],
+        "repetition_json": parsed_response["repetition_json"],
+        "tags": [session_type, "transcribed", "ai_analyzed"]
+    }
+
+
+def _fallback_analysis(ai_error: Exception, session_type: str) -> dict:
+    """Basic analysis stored when the AI call fails."""
+    return {
+        "summary": f"Transcription completed but AI analysis failed: {str(ai_error)}",
+        "tags": [session_type, "transcribed", "ai_failed"],
+        "mood_label": "unknown",
+        "agitation_score": 0,
+        "suggestions": ["AI analysis unavailable - review transcript manually"]
+    }
+
+
+def _store_analysis(session_id: str, analysis_result: dict):
+    """Store analysis results in database (INSERT OR REPLACE to handle duplicates)."""
+    logger.info(f"Attempting to store analysis for session_id: {session_id}")
+    summary_to_store = analysis_result.get("summary", "")
+    logger.info(f"DEBUG - About to store summary in DB, first 200 chars: {repr(summary_to_store[:200])}")
+
+    with database.db_cursor() as cursor:
+        try:
+            cursor.execute(
+                """INSERT OR REPLACE INTO summaries (session_id, summary_text, repetition_json, mood_label,
+                   agitation_score, suggestions, created_ts)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    session_id,
+                    summary_to_store,
+                    json.dumps(analysis_result["repetition_json"]) if analysis_result.get("repetition_json") else None,
+                    analysis_result.get("mood_label", ""),
+                    analysis_result.get("agitation_score", 0),
+                    json.dumps(analysis_result.get("suggestions", [])),
+                    int(datetime.now().timestamp() * 1000)
+                )
+            )
+            trends.record_summary(cursor, session_id)
+            logger.info(f"Successfully stored analysis for session_id: {session_id}")
+        except Exception as db_error:
+            logger.error(f"Database error storing analysis: {str(db_error)}")
+            logger.error(f"Database error traceback: {traceback.format_exc()}")
+            raise
 
-        raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
 
 @router.post("/process-session")
-async def process_session(request_data: dict):
+async def process_session(request_data: dict, raw_request: Request, stream: bool = False,
+                          bypass_cache: bool = False):
     """
     Take transcript data and run it through the AI analysis pipeline.
     This connects transcription to the AI summarization chains.
+    With ?stream=true, LLM tokens are sent as Server-Sent Events followed by
+    a `result` event carrying the stored analysis.
+    ?bypass_cache=true forces a fresh LLM call instead of a cached completion.
     """
     try:
         logger.info(f"Processing session with data: {request_data}")
@@ -157,85 +415,50 @@ async def process_session(request_data: dict):
             raise HTTPException(status_code=400, detail="Missing transcript or session_id")
 
         # Call summarization logic directly (no HTTP self-call)
-        from routes.summarize import load_prompt_template, call_ollama_api, parse_gemma_response
+        from routes.summarize import load_prompt_template, SUMMARY_OUTPUT
+
+        # Load appropriate prompt template; the transcript is formatted into it
+        prompt_template = load_prompt_template(session_type)
+        prompt_fields = {"transcript": transcript}
+
+        if stream:
+            def finalize(parsed: dict) -> dict:
+                analysis_result = _analysis_from_response(parsed, session_type)
+                _store_analysis(session_id, analysis_result)
+                return {"session_id": session_id, "analysis": analysis_result, "status": "completed"}
+
+            def store_fallback(ai_error: Exception) -> dict:
+                # Same as the non-streaming path: the session still gets an analysis row
+                analysis_result = _fallback_analysis(ai_error, session_type)
+                _store_analysis(session_id, analysis_result)
+                return {"session_id": session_id, "analysis": analysis_result, "status": "completed"}
+
+            return StreamingResponse(
+                stream_completion(prompt_template, prompt_fields, finalize, bypass_cache=bypass_cache,
+                                  structured=SUMMARY_OUTPUT, on_error=store_fallback),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
 
         try:
             logger.info(f"Calling AI summarization for session {session_id}")
 
-            # Load appropriate prompt template
-            prompt_template = load_prompt_template(session_type)
-
-            # Format prompt with transcript
-            formatted_prompt = prompt_template.format(transcript=transcript)
-
-            # Call Ollama API directly
-            gemma_response = call_ollama_api(formatted_prompt)
-
-            # Parse response
-            parsed_response = parse_gemma_response(gemma_response)
-            logger.info(f"DEBUG - parsed_response type: {type(parsed_response)}")
-            logger.info(f"DEBUG - parsed_response keys: {parsed_response.keys() if isinstance(parsed_response, dict) else 'NOT A DICT'}")
-
-            # Clean up summary text - remove any remaining markdown artifacts
-            raw_summary = parsed_response.get("summary", "")
-            logger.info(f"DEBUG - raw_summary type: {type(raw_summary)}, first 200 chars: {repr(raw_summary[:200])}")
-
-            # Remove markdown code fence artifacts like ```json or ```
-            clean_summary = raw_summary
-            if clean_summary.startswith('```'):
-                # Remove everything from the first ``` to the first newline
-                lines = clean_summary.split('\n', 1)
-                if len(lines) > 1:
-                    clean_summary = lines[1]
-            # Remove any remaining ``` at the end
-            clean_summary = clean_summary.replace('```', '').strip()
-            logger.info(f"DEBUG - clean_summary after cleanup, first 200 chars: {repr(clean_summary[:200])}")
-
-            analysis_result = {
-                "summary": clean_summary,
-                "mood_label": parsed_response.get("mood_label", "unknown"),
-                "agitation_score": parsed_response.get("agitation_score", 0),
-                "repetition_json": parsed_response.get("repetition_json", []),
-                "tags": [session_type, "transcribed", "ai_analyzed"]
-            }
+            # Schema-constrained call (repeats are served from the LLM cache), one repair on bad JSON
+            parsed_response = await generate_structured(
+                prompt_template, prompt_fields, SUMMARY_OUTPUT, request=raw_request,
+                bypass_cache=bypass_cache)
+            analysis_result = _analysis_from_response(parsed_response, session_type)
             logger.info(f"AI summarization successful for session {session_id}")
 
         except Exception as ai_error:
+            # Caller went away - don't store a fallback nobody asked for
+            if getattr(ai_error, "status_code", None) == CLIENT_CLOSED_REQUEST:
+                raise
             logger.error(f"AI summarization error: {str(ai_error)}")
             # Fallback to basic analysis if AI fails
-            analysis_result = {
-                "summary": f"Transcription completed but AI analysis failed: {str(ai_error)}",
-                "tags": [session_type, "transcribed", "ai_failed"],
-                "mood_label": "unknown",
-                "agitation_score": 0,
-                "suggestions": ["AI analysis unavailable - review transcript manually"]
-            }
-
-        # Store analysis results in database (use INSERT OR REPLACE to handle duplicates)
-        logger.info(f"Attempting to store analysis for session_id: {session_id}")
-        summary_to_store = analysis_result.get("summary", "")
-        logger.info(f"DEBUG - About to store summary in DB, first 200 chars: {repr(summary_to_store[:200])}")
+            analysis_result = _fallback_analysis(ai_error, session_type)
 
-        with database.db_cursor() as cursor:
-            try:
-                cursor.execute(
-                    """INSERT OR REPLACE INTO summaries (session_id, summary_text, mood_label,
-                       agitation_score, suggestions, created_ts)
-                       VALUES (?, ?, ?, ?, ?, ?)""",
-                    (
-                        session_id,
-                        summary_to_store,
-                        analysis_result.get("mood_label", ""),
-                        analysis_result.get("agitation_score", 0),
-                        json.dumps(analysis_result.get("suggestions", [])),
-                        int(datetime.now().timestamp() * 1000)
-                    )
-                )
-                logger.info(f"Successfully stored analysis for session_id: {session_id}")
-            except Exception as db_error:
-                logger.error(f"Database error storing analysis: {str(db_error)}")
-                logger.error(f"Database error traceback: {traceback.format_exc()}")
-                raise
+        _store_analysis(session_id, analysis_result)
 
         return JSONResponse(content={
             "session_id": session_id,
@@ -243,11 +466,14 @@ async def process_session(request_data: dict):
             "status": "completed"
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unhandled exception in process_session: {str(e)}")
         logger.error(f"Exception traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"AI processing failed: {str(e)}")
 
+
 @router.get("/session/{session_id}")
 async def get_session(session_id: str):
     """Get complete session data including transcript and analysis."""
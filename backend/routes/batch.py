@@ -0,0 +1,73 @@
+# /batch/summarize: summarize many stored sessions in one background job
+
+from models import BatchSummarizeRequest
+from batch_summarize import runner
+from fastapi import APIRouter, HTTPException, status
+import asyncio
+
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+
+def _get_status(batch_id: str) -> dict:
+    batch = runner.status(batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    return batch
+
+
+@router.post("/batch/summarize", status_code=status.HTTP_202_ACCEPTED)
+async def create_summary_batch(request: BatchSummarizeRequest):
+    """
+    Summarize every session matching the filter (by default: sessions with a
+    transcript but no summary) in the background with bounded concurrency.
+    Poll GET /api/batch/summarize/{batch_id} for progress and throughput.
+    """
+    if request.start_ts is not None and request.end_ts is not None and request.start_ts >= request.end_ts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_ts must be before end_ts"
+        )
+    filters = request.model_dump(exclude={"concurrency", "bypass_cache"})
+    batch_id = await asyncio.to_thread(runner.create, filters, request.concurrency, request.bypass_cache)
+    runner.start(batch_id)
+    return await asyncio.to_thread(runner.status, batch_id)
+
+
+@router.get("/batch/summarize")
+async def list_summary_batches(limit: int = 20):
+    """Most recent batches with their progress."""
+    return {"batches": await asyncio.to_thread(runner.list_batches, limit)}
+
+
+@router.get("/batch/summarize/{batch_id}")
+async def get_summary_batch(batch_id: str):
+    """Progress, per-status counts, throughput (sessions/min) and ETA of a batch."""
+    return await asyncio.to_thread(_get_status, batch_id)
+
+
+@router.post("/batch/summarize/{batch_id}/cancel")
+async def cancel_summary_batch(batch_id: str):
+    """Stop a running batch; summaries already written are kept."""
+    _get_status(batch_id)
+    if not runner.cancel(batch_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch has already finished"
+        )
+    return _get_status(batch_id)
+
+
+@router.post("/batch/summarize/{batch_id}/retry")
+async def retry_summary_batch(batch_id: str):
+    """Re-run the sessions of a batch that failed."""
+    _get_status(batch_id)
+    if not runner.retry_failed(batch_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch is still running"
+        )
+    return _get_status(batch_id)
@@ -0,0 +1,240 @@
+# /api/{chain}/run, /api/{chain}/stages/{stage} and the extract/analyze/summarize
+# shortcuts, for every chain defined under chains/
+
+import sys
+import os
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from models import (ExtractRequest, ExtractResponse, AnalyzeRequest, AnalyzeResponse,
+                    ChainSummarizeRequest, ChainRunRequest, ChainStageRequest, SummarizeResponse)
+import crud
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from streaming import sse_event, SSE_HEADERS
+from chain_engine import ChainDefinition, ChainStage, run_chain, run_stage
+import chain_engine
+import asyncio
+import json
+import logging
+import time
+
+
+router = APIRouter(prefix="/api", tags=["chains"])
+
+logger = logging.getLogger(__name__)
+
+
+def _get_chain(chain: str) -> ChainDefinition:
+    definition = chain_engine.chains.get(chain)
+    if definition is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown chain: {chain}"
+        )
+    return definition
+
+
+def _get_stage(definition: ChainDefinition, stage: str) -> ChainStage:
+    try:
+        return definition.stage(stage)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Chain {definition.name} has no stage {stage}"
+        )
+
+
+def _summary_response(summary_data: dict) -> SummarizeResponse:
+    return SummarizeResponse(
+        summary=summary_data.get("summary", ""),
+        tone=summary_data.get("tone", ""),
+        repeated_questions=summary_data.get("repeated_questions", []),
+        key_moments=summary_data.get("key_moments", []),
+        tags=summary_data.get("tags", []),
+        agitation_score=summary_data.get("agitation_score", 0.0),
+        mood_label=summary_data.get("mood_label", "")
+    )
+
+
+def _store_summary(session_id: str, summary_data: dict, replace: bool = False):
+    crud.insert_summary(
+        session_id=session_id,
+        summary_text=summary_data.get("summary", ""),
+        repetition_json=summary_data.get("repeated_questions", []),
+        agitation_score=summary_data.get("agitation_score", 0.0),
+        mood_label=summary_data.get("tone", "unknown"),
+        suggestions=summary_data.get("suggestions"),
+        replace=replace
+    )
+
+
+def _require_session(session_id: str):
+    if not crud.get_session(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+
+
+@router.get("/chains")
+async def list_chains():
+    """Chain definitions: stages, dependencies, prompts and output schemas."""
+    return {"chains": [definition.info() for definition in chain_engine.chains.values()]}
+
+
+async def _run_pipeline(definition: ChainDefinition, request: ChainRunRequest, stream: bool,
+                        bypass_cache: bool):
+    """Run every stage server-side, streaming each result as soon as it is ready."""
+    chain = definition.name
+    # Stage rows are written in the background while other LLM calls run
+    pending_writes = []
+    timings = {}
+    started = time.monotonic()
+
+    try:
+        async for event, data in run_chain(definition, {"transcript": request.transcript},
+                                           stream=stream, bypass_cache=bypass_cache):
+            if event != "stage":
+                yield sse_event(event, data)
+                continue
+
+            stage, stage_data = data["stage"], data["data"]
+            timings[stage] = data["elapsed_ms"]
+            pending_writes.append(asyncio.create_task(asyncio.to_thread(
+                crud.insert_chain_stage_result, request.session_id, chain, stage, stage_data,
+                data["elapsed_ms"])))
+
+            if stage == definition.summary_stage:
+                pending_writes.append(asyncio.create_task(asyncio.to_thread(
+                    _store_summary, request.session_id, stage_data, True)))
+                data = {**data, "data": _summary_response(stage_data).model_dump()}
+            yield sse_event("stage", data)
+
+        await asyncio.gather(*pending_writes)
+        total_ms = int((time.monotonic() - started) * 1000)
+        logger.info(f"{chain} chain for {request.session_id} finished in {total_ms} ms: {timings}")
+        yield sse_event("done", {"session_id": request.session_id, "chain": chain,
+                                 "total_ms": total_ms, "timings": timings})
+
+    except HTTPException as e:
+        logger.error(f"{chain} pipeline failed for session {request.session_id}: {e.detail}")
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logger.error(f"{chain} pipeline failed for session {request.session_id}: {str(e)}")
+        yield sse_event("error", {"status_code": 500, "detail": f"Pipeline failed: {str(e)}"})
+
+
+@router.post("/{chain}/run")
+async def run_chain_pipeline(chain: str, request: ChainRunRequest, stream: bool = False,
+                             bypass_cache: bool = False):
+    """
+    Run all of a chain's stages for a session in a single call; stages whose
+    inputs are ready run concurrently. Streams one `stage` event per finished
+    stage (with started_ms/elapsed_ms), then `done` with per-stage timings
+    (or `error`). With ?stream=true, LLM output is also forwarded as `token`
+    events; ?bypass_cache=true skips cached completions.
+    """
+    definition = _get_chain(chain)
+    _require_session(request.session_id)
+
+    return StreamingResponse(
+        _run_pipeline(definition, request, stream, bypass_cache),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+async def _run_single_stage(definition: ChainDefinition, stage_name: str, values: dict,
+                            raw_request: Request, bypass_cache: bool) -> dict:
+    """Run one stage from caller-supplied placeholder values (dicts are pretty-printed JSON)."""
+    stage = _get_stage(definition, stage_name)
+    missing = [placeholder for placeholder in stage.inputs if placeholder not in values]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Stage {stage_name} needs {', '.join(missing)}"
+        )
+    fields = {
+        placeholder: value if isinstance(value, str) else json.dumps(value, indent=2)
+        for placeholder, value in values.items() if placeholder in stage.inputs
+    }
+    return await run_stage(stage, fields, request=raw_request, bypass_cache=bypass_cache)
+
+
+@router.post("/{chain}/stages/{stage}")
+async def run_chain_stage(chain: str, stage: str, request: ChainStageRequest, raw_request: Request,
+                          bypass_cache: bool = False):
+    """Run a single stage of any chain with explicit placeholder values."""
+    definition = _get_chain(chain)
+    try:
+        data = await _run_single_stage(definition, stage, request.fields, raw_request, bypass_cache)
+        return {"stage": stage, "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Stage {stage} failed: {str(e)}"
+        )
+
+
+@router.post("/{chain}/extract", response_model=ExtractResponse)
+async def extract_chain_data(chain: str, request: ExtractRequest, raw_request: Request,
+                             bypass_cache: bool = False):
+    """Extract structured data from a session transcript."""
+    definition = _get_chain(chain)
+    try:
+        data = await _run_single_stage(definition, "extract", {"transcript": request.transcript},
+                                       raw_request, bypass_cache)
+        return ExtractResponse(data=data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Extraction failed: {str(e)}"
+        )
+
+
+@router.post("/{chain}/analyze", response_model=AnalyzeResponse)
+async def analyze_chain_data(chain: str, request: AnalyzeRequest, raw_request: Request,
+                             bypass_cache: bool = False):
+    """Analyze data produced by the extract stage."""
+    definition = _get_chain(chain)
+    try:
+        data = await _run_single_stage(definition, "analyze", {"extracted_data": request.extracted_data},
+                                       raw_request, bypass_cache)
+        return AnalyzeResponse(data=data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Analysis failed: {str(e)}"
+        )
+
+
+@router.post("/{chain}/summarize", response_model=SummarizeResponse)
+async def summarize_chain_session(chain: str, request: ChainSummarizeRequest, raw_request: Request,
+                                  bypass_cache: bool = False):
+    """Generate the final summary from extracted and analyzed data and store it."""
+    definition = _get_chain(chain)
+    try:
+        _require_session(request.session_id)
+        summary_data = await _run_single_stage(
+            definition, definition.summary_stage or "summarize",
+            {"extracted_data": request.extracted_data, "analyzed_data": request.analyzed_data},
+            raw_request, bypass_cache)
+
+        # Store summary in database
+        _store_summary(request.session_id, summary_data)
+        return _summary_response(summary_data)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Summarization failed: {str(e)}"
+        )
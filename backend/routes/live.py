@@ -0,0 +1,235 @@
+# /api/live-transcribe - WebSocket streaming transcription while recording
+
+import sys
+import os
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from transcribe import transcribe_audio_bytes
+from live_transcription import LiveTranscriber
+from whisper_models import registry as whisper_models, UnknownModelError
+import audio_decode
+import config
+import crud
+import database
+from datetime import datetime
+import asyncio
+import functools
+import json
+import logging
+import uuid
+import wave
+from typing import Optional
+
+
+router = APIRouter(prefix="/api", tags=["live"])
+
+logger = logging.getLogger(__name__)
+
+RECORDINGS_DIR = "recordings"
+
+# Supported values for the `encoding` query parameter
+PCM_ENCODING = "pcm_s16le"
+WEBM_ENCODING = "webm"
+
+
+def _create_session(session_id: str, session_type: str, patient_id: str):
+    with database.db_cursor() as cursor:
+        cursor.execute(
+            """INSERT INTO sessions (session_id, session_type, start_ts, notes, patient_id)
+               VALUES (?, ?, ?, ?, ?)""",
+            (session_id, session_type, int(datetime.now().timestamp() * 1000),
+             f"Patient: {patient_id}", patient_id)
+        )
+
+
+def _store_chunk(session_id: str, source: str, index: int, start_sec: float,
+                 end_sec: float, text: str):
+    """Store one finalized window as an audio_chunks row plus its transcript."""
+    chunk_id = crud.insert_audio_chunk(
+        session_id, f"{source}#t={start_sec:.2f},{end_sec:.2f}",
+        duration_sec=int(round(end_sec - start_sec)))
+    crud.insert_transcript(session_id, text, chunk_id=chunk_id, language="en")
+
+
+def _discard_session(session_id: str, archive_path: Optional[str]):
+    """Delete a session with its rows and its archived audio."""
+    with database.db_cursor() as cursor:
+        cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    if archive_path and os.path.exists(archive_path):
+        os.remove(archive_path)
+
+
+def _finish_session(session_id: str, transcript: str, patient_id: str, has_audio: bool,
+                    archive_path: Optional[str] = None):
+    """Store the stitched transcript and close the session; drop sessions with no audio."""
+    if not has_audio:
+        _discard_session(session_id, archive_path)
+        return
+    crud.insert_transcript(session_id, transcript, language="en")
+    crud.update_session_end(session_id, int(datetime.now().timestamp() * 1000),
+                            notes=f"Patient: {patient_id}")
+
+
+@router.websocket("/live-transcribe")
+async def live_transcribe(websocket: WebSocket, patient_id: str = "default_patient",
+                          session_type: str = "freeform", encoding: str = PCM_ENCODING,
+                          model: Optional[str] = None):
+    """
+    Stream audio while the caregiver is still talking.
+
+    Send binary frames of 16 kHz mono 16-bit PCM (encoding=pcm_s16le) or a
+    MediaRecorder WebM/Opus stream (encoding=webm), then a text frame
+    {"type": "stop"}. `model` optionally names an installed whisper model;
+    otherwise the session type's selection applies. The server replies with:
+      {"type": "session"} once, carrying the new session_id
+      {"type": "partial"} with the current best guess for the open window
+      {"type": "final"} once per finalized window (stored as audio_chunks + transcripts)
+      {"type": "done"} with the stitched transcript, ready for summarization
+      {"type": "error"} if the stream cannot be processed
+    """
+    await websocket.accept()
+    if encoding not in (PCM_ENCODING, WEBM_ENCODING):
+        await websocket.send_json({"type": "error", "detail": f"Unsupported encoding: {encoding}"})
+        await websocket.close(code=1003)
+        return
+    try:
+        whisper_model = whisper_models.select(model, session_type)
+    except UnknownModelError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    session_id = f"session_{timestamp}_{uuid.uuid4().hex[:8]}"
+    await asyncio.to_thread(_create_session, session_id, session_type, patient_id)
+
+    # Optional archive of the decoded audio, appended as frames arrive
+    archive = None
+    archive_path = None
+    if config.CARELINK_ARCHIVE_RECORDINGS:
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        archive_path = os.path.join(RECORDINGS_DIR, f"{session_id}.wav")
+        archive = wave.open(archive_path, "wb")
+        archive.setnchannels(1)
+        archive.setsampwidth(2)
+        archive.setframerate(audio_decode.WHISPER_SAMPLE_RATE)
+
+    def close_archive():
+        nonlocal archive
+        if archive is not None:
+            archive.close()
+            archive = None
+
+    source = archive_path or session_id
+    transcriber = LiveTranscriber(
+        send=websocket.send_json,
+        transcribe_fn=functools.partial(transcribe_audio_bytes, model_path=whisper_model["path"]),
+        store_chunk=lambda index, start_sec, end_sec, text: _store_chunk(
+            session_id, source, index, start_sec, end_sec, text),
+        window_sec=config.CARELINK_LIVE_WINDOW_SEC,
+        overlap_sec=config.CARELINK_CHUNK_OVERLAP_SEC,
+        partial_sec=config.CARELINK_LIVE_PARTIAL_SEC,
+    )
+
+    async def feed(pcm: bytes):
+        if archive is not None:
+            archive.writeframes(pcm)
+        await transcriber.feed(pcm)
+
+    decoder = None
+    pump = None
+    if encoding == WEBM_ENCODING:
+        decoder = audio_decode.StreamingDecoder()
+
+        async def pump_decoded():
+            while True:
+                pcm = await asyncio.to_thread(decoder.read)
+                if not pcm:
+                    return
+                await feed(pcm)
+
+        pump = asyncio.create_task(pump_decoded())
+
+    await websocket.send_json({
+        "type": "session",
+        "session_id": session_id,
+        "sample_rate": audio_decode.WHISPER_SAMPLE_RATE,
+        "encoding": encoding
+    })
+
+    connected = True
+    try:
+        while True:
+            try:
+                message = await websocket.receive()
+            except WebSocketDisconnect:
+                connected = False
+                break
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+
+            if message.get("bytes"):
+                if decoder is not None:
+                    await asyncio.to_thread(decoder.write, message["bytes"])
+                else:
+                    await feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    continue
+                if control.get("type") == "stop":
+                    break
+
+        # Drain whatever ffmpeg still holds before finalizing the last window
+        if decoder is not None:
+            decoder.close_input()
+            await pump
+
+        transcript = await transcriber.finish()
+        close_archive()
+        await asyncio.to_thread(_finish_session, session_id, transcript, patient_id,
+                                transcriber.received_bytes > 0, archive_path)
+        logger.info(f"Live session {session_id} finished: {transcriber.duration_sec:.1f}s of audio, "
+                    f"{len(transcriber.texts)} chunks")
+
+        if connected:
+            await websocket.send_json({
+                "type": "done",
+                "session_id": session_id,
+                "transcript": transcript,
+                "metadata": {
+                    "session_id": session_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "patient_id": patient_id,
+                    "session_type": session_type,
+                    "audio_file": os.path.basename(archive_path) if archive_path else None,
+                    "duration_sec": round(transcriber.duration_sec, 2)
+                }
+            })
+            await websocket.close()
+
+    except Exception as e:
+        logger.error(f"Live transcription failed for {session_id}: {str(e)}")
+        await transcriber.abort()
+        if pump is not None and not pump.done():
+            pump.cancel()
+        # A half-finished session would look complete in the session list; drop it and its audio
+        close_archive()
+        try:
+            await asyncio.to_thread(_discard_session, session_id, archive_path)
+        except Exception as cleanup_error:
+            logger.error(f"Could not discard failed live session {session_id}: {str(cleanup_error)}")
+        if connected:
+            await websocket.send_json({"type": "error", "detail": f"Live transcription failed: {str(e)}"})
+            await websocket.close(code=1011)
+
+    finally:
+        if pump is not None and not pump.done():
+            pump.cancel()
+        if decoder is not None:
+            decoder.close()
+        close_archive()
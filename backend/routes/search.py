@@ -0,0 +1,35 @@
+# /search: full-text search over transcripts and summaries
+
+import search
+from search import SearchQueryError
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Optional
+import asyncio
+
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+
+@router.get("/search")
+async def search_sessions(q: str = Query(..., min_length=1),
+                          scope: str = Query("all", pattern="^(all|transcripts|summaries)$"),
+                          session_type: Optional[str] = None,
+                          limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0),
+                          raw: bool = False):
+    """
+    Ranked full-text search ("where she asked about her husband"). Every
+    word must match (stemmed, case-insensitive); a trailing * matches a
+    prefix. Each matching session is returned once, with a snippet (matches
+    wrapped in <mark>) from its best row; results are paginated with
+    limit/offset and `total` counts matching sessions. ?raw=true
+    accepts FTS5 query syntax (OR, NEAR, "exact phrase").
+    """
+    scopes = None if scope == "all" else [scope]
+    try:
+        return await asyncio.to_thread(
+            search.search, q, scopes, session_type, limit, offset, raw)
+    except SearchQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
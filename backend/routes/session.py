@@ -6,8 +6,8 @@ from models import (
     SessionListItem
 )
 import crud
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
 
 
 router = APIRouter(prefix="/api", tags=["sessions"])
@@ -18,7 +18,7 @@ async def start_session(request: StartSessionRequest):
     """Start a new session and return session_id."""
     try:
         session_id = crud.create_session(
-            request.session_type, request.timestamp)
+            request.session_type, request.timestamp, request.patient_id)
         return StartSessionResponse(session_id=session_id)
     except Exception as e:
         raise HTTPException(
@@ -92,11 +92,28 @@ async def get_session(session_id: str):
 
 
 @router.get("/sessions", response_model=SessionListResponse)
-async def get_sessions(limit: int = 100, offset: int = 0):
-    """Get list of sessions with summary snippets."""
+async def get_sessions(limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None,
+                       session_type: Optional[str] = None, patient_id: Optional[str] = None,
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       offset: Optional[int] = None):
+    """
+    Get sessions with summary snippets, newest first. Follow next_cursor to
+    page; filter by session_type, patient_id and a start_ts/end_ts range (ms).
+    """
+    if offset is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset is no longer supported; page with cursor (next_cursor from the previous page)"
+        )
     try:
-        sessions = crud.get_sessions_list(limit, offset)
-        return SessionListResponse(sessions=sessions)
+        sessions, next_cursor = crud.get_sessions_list(
+            limit, cursor, session_type, patient_id, start_ts, end_ts)
+        return SessionListResponse(sessions=sessions, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,149 +1,89 @@
 # /summarize
 
-from models import SummarizeRequest, SummarizeResponse
+from models import SummarizeRequest, SummarizeResponse, SessionSummaryOutput
 import crud
-from fastapi import APIRouter, HTTPException, status
-import requests
-import json
-import os
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from llm_client import generate_structured
+from structured_output import StructuredOutput, StructuredOutputError
+from streaming import stream_completion, SSE_HEADERS
+from prompt_registry import PromptTemplateError
+import prompt_registry
 
 
 router = APIRouter(prefix="/api", tags=["summarization"])
 
 
 def load_prompt_template(session_type: str) -> str:
-    """Load prompt template for the given session type."""
-    # Get the backend directory path
-    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    template_path = os.path.join(
-        backend_dir, "prompts", f"{session_type.lower()}.json")
-
-    # Fall back to default if specific template doesn't exist
-    if not os.path.exists(template_path):
-        template_path = os.path.join(backend_dir, "prompts", "default.json")
-
+    """Prompt template for the given session type (held in memory by the prompt registry)."""
     try:
-        with open(template_path, 'r') as f:
-            template_data = json.load(f)
-            return template_data["prompt_template"]
-    except (FileNotFoundError, KeyError):
+        return prompt_registry.registry.for_session_type(session_type).template
+    except PromptTemplateError:
         # Ultimate fallback prompt
         return """You are analyzing a care session with a dementia patient. Provide a structured summary.
 
 Transcript: {transcript}
 
 Respond in JSON format:
-{
+{{
   "summary": "Brief summary",
-  "repetition_json": [{"phrase": "example", "count": 2}],
+  "repetition_json": [{{"phrase": "example", "count": 2}}],
   "agitation_score": 2.5,
   "mood_label": "calm",
   "suggestions": "Care recommendations"
-}"""
-
-
-def call_ollama_api(prompt: str) -> dict:
-    """Call Ollama API for text generation."""
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "deepseek-v3.1:671b-cloud",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=180
-        )
+}}"""
 
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"Ollama API error: {response.status_code}"
-            )
 
-        result = response.json()
-        return result.get("response", "")
-
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Cannot connect to Ollama API. Make sure Ollama is running."
-        )
-    except requests.exceptions.Timeout:
-        raise HTTPException(
-            status_code=status.HTTP_408_REQUEST_TIMEOUT,
-            detail="Ollama API request timed out"
-        )
+# Schema sent to Ollama as `format` and used to validate what comes back
+SUMMARY_OUTPUT = StructuredOutput.from_model(SessionSummaryOutput)
 
 
 def parse_gemma_response(response_text: str) -> dict:
-    """Parse Gemma's JSON response and extract structured data."""
-    import logging
-    logger = logging.getLogger(__name__)
-
-    # Strip markdown code fences if present
-    text = response_text.strip()
-    logger.info(f"Raw response (first 200 chars): {repr(text[:200])}")
-
-    if text.startswith('```'):
-        # Remove opening fence (```json or ```)
-        lines = text.split('\n')
-        lines = lines[1:]  # Skip first line with ```
-        # Remove closing fence
-        if lines and lines[-1].strip() == '```':
-            lines = lines[:-1]
-        text = '\n'.join(lines)
-        logger.info(f"After fence removal (first 200 chars): {repr(text[:200])}")
-
-    # Try to find JSON in the response
-    start_idx = text.find('{')
-    end_idx = text.rfind('}') + 1
-
-    if start_idx == -1 or end_idx == 0:
-        logger.error("No JSON found in response")
-        logger.error(f"Failed to parse text: {repr(response_text[:500])}")
-        return {
-            "summary": "Unable to parse AI response - no JSON found",
-            "repetition_json": [],
-            "agitation_score": 0.0,
-            "mood_label": "unknown",
-            "suggestions": "Unable to parse detailed analysis"
-        }
-
-    json_str = text[start_idx:end_idx]
-    logger.info(f"Extracted JSON (first 200 chars): {repr(json_str[:200])}")
-
-    try:
-        parsed = json.loads(json_str)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode failed: {str(e)}")
-        logger.error(f"Failed to parse text: {repr(response_text[:500])}")
-        return {
-            "summary": "Unable to parse AI response - invalid JSON",
-            "repetition_json": [],
-            "agitation_score": 0.0,
-            "mood_label": "unknown",
-            "suggestions": "Unable to parse detailed analysis"
-        }
-
-    # Extract summary field, fill in missing fields with defaults
-    if "summary" not in parsed:
-        logger.warning("Missing 'summary' field in parsed response")
-
-    result = {
-        "summary": parsed.get("summary", "No summary provided"),
-        "repetition_json": parsed.get("repetition_json", []),
-        "agitation_score": parsed.get("agitation_score", 0.0),
-        "mood_label": parsed.get("mood_label", "unknown"),
-        "suggestions": parsed.get("suggestions", "")
-    }
-
-    return result
+    """Parse a summary completion (fences and surrounding prose tolerated); raises StructuredOutputError."""
+    return SUMMARY_OUTPUT.parse(response_text)
+
+
+def store_parsed_summary(session_id: str, parsed_response: dict, replace: bool = False) -> SummarizeResponse:
+    """Store a parsed summary and build the API response from it."""
+    suggestions = parsed_response.get("suggestions")
+    if isinstance(suggestions, list):
+        suggestions = "\n".join(str(item) for item in suggestions)
+    crud.insert_summary(
+        session_id=session_id,
+        summary_text=parsed_response["summary"],
+        repetition_json=parsed_response["repetition_json"],
+        agitation_score=parsed_response["agitation_score"],
+        mood_label=parsed_response["mood_label"],
+        suggestions=suggestions,
+        replace=replace
+    )
+
+    # The single-prompt templates return repetition_json rather than the
+    # chain fields; map them onto the shared response model.
+    repeated_questions = [
+        item.get("phrase", "") if isinstance(item, dict) else str(item)
+        for item in parsed_response["repetition_json"] or []
+    ]
+    return SummarizeResponse(
+        summary=parsed_response["summary"],
+        tone=parsed_response["mood_label"],
+        repeated_questions=repeated_questions,
+        key_moments=parsed_response.get("key_moments", []),
+        tags=parsed_response.get("tags", []),
+        agitation_score=parsed_response["agitation_score"],
+        mood_label=parsed_response["mood_label"]
+    )
 
 
 @router.post("/summarize", response_model=SummarizeResponse)
-async def summarize_session(request: SummarizeRequest):
-    """Generate summary using Gemma via Ollama and store in database."""
+async def summarize_session(request: SummarizeRequest, raw_request: Request, stream: bool = False,
+                            bypass_cache: bool = False):
+    """
+    Generate summary using Gemma via Ollama and store in database.
+    With ?stream=true the completion is sent as Server-Sent Events: `token`
+    events as text is generated, then one `result` event once it is stored.
+    ?bypass_cache=true forces a fresh LLM call instead of a cached completion.
+    """
     try:
         # Verify session exists
         session = crud.get_session(request.session_id)
@@ -156,32 +96,33 @@ async def summarize_session(request: SummarizeRequest):
         # Load appropriate prompt template
         prompt_template = load_prompt_template(request.session_type)
 
-        # Format prompt with transcript
-        formatted_prompt = prompt_template.format(
-            transcript=request.transcript)
+        # Values formatted into the prompt (also part of the LLM cache key)
+        prompt_fields = {"transcript": request.transcript}
 
-        # Call Ollama API
-        gemma_response = call_ollama_api(formatted_prompt)
+        if stream:
+            def finalize(parsed: dict) -> dict:
+                return store_parsed_summary(request.session_id, parsed).model_dump()
 
-        # Parse response
-        parsed_response = parse_gemma_response(gemma_response)
+            return StreamingResponse(
+                stream_completion(prompt_template, prompt_fields, finalize, bypass_cache=bypass_cache,
+                                  structured=SUMMARY_OUTPUT),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
 
-        # Store summary in database
-        crud.insert_summary(
-            session_id=request.session_id,
-            summary_text=parsed_response["summary"],
-            repetition_json=parsed_response["repetition_json"],
-            agitation_score=parsed_response["agitation_score"],
-            mood_label=parsed_response["mood_label"],
-            suggestions=parsed_response.get("suggestions")
-        )
+        # Schema-constrained call (repeats are served from the LLM cache), one repair on bad JSON
+        try:
+            parsed_response = await generate_structured(
+                prompt_template, prompt_fields, SUMMARY_OUTPUT, request=raw_request,
+                bypass_cache=bypass_cache)
+        except StructuredOutputError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"LLM returned an invalid summary: {str(e)}"
+            )
 
-        return SummarizeResponse(
-            summary=parsed_response["summary"],
-            repetition_json=parsed_response["repetition_json"],
-            agitation_score=parsed_response["agitation_score"],
-            mood_label=parsed_response["mood_label"]
-        )
+        # Store summary in database
+        return store_parsed_summary(request.session_id, parsed_response)
 
     except HTTPException:
         raise
@@ -1,14 +1,42 @@
 # /transcribe
 
-from models import TranscribeRequest, TranscribeResponse
+from models import TranscribeRequest, TranscribeResponse, WhisperModelSelection
 import crud
 from fastapi import APIRouter, HTTPException, status
-from whisper_utils import transcribe_audio_file
+from typing import Optional
+from whisper_utils import transcribe_audio_file, get_model_path
+from whisper_models import registry as whisper_models, UnknownModelError, DEFAULT_SCOPE
+import whisper_engine
+import transcription_cache
+import asyncio
+import os
 
 
 router = APIRouter(prefix="/api", tags=["transcription"])
 
 
+def _transcribe_and_record(audio_path: str, language: str, model_path: Optional[str]) -> str:
+    def record(seconds: float, peak_rss_bytes: Optional[int]):
+        whisper_models.record_transcription(model_path or get_model_path(), audio_path, seconds, peak_rss_bytes)
+
+    return transcribe_audio_file(audio_path, language, model_path, on_run=record)
+
+
+def _transcribe_with_cache(audio_path: str, language: str = "en",
+                           model_path: Optional[str] = None) -> str:
+    """Return the stored transcript for identical audio, or run whisper and remember it."""
+    if not transcription_cache.cache.enabled or not os.path.isfile(audio_path):
+        return _transcribe_and_record(audio_path, language, model_path)
+
+    audio_sha256 = transcription_cache.file_hash(audio_path)
+    whisper_model = transcription_cache.model_name(model_path or get_model_path())
+    transcript_text = transcription_cache.cache.get(audio_sha256, whisper_model, language)
+    if transcript_text is None:
+        transcript_text = _transcribe_and_record(audio_path, language, model_path)
+        transcription_cache.cache.put(audio_sha256, whisper_model, language, transcript_text)
+    return transcript_text
+
+
 @router.post("/transcribe", response_model=TranscribeResponse)
 async def transcribe_audio(request: TranscribeRequest):
     """Transcribe audio file using whisper.cpp and store in database."""
@@ -21,8 +49,14 @@ async def transcribe_audio(request: TranscribeRequest):
                 detail="Session not found"
             )
 
-        # Transcribe audio using whisper.cpp
-        transcript_text = transcribe_audio_file(request.audio_path)
+        try:
+            whisper_model = whisper_models.select(request.model, session.session_type)
+        except UnknownModelError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        # Transcribe audio using whisper.cpp (off the event loop; duplicates hit the cache)
+        transcript_text = await asyncio.to_thread(
+            _transcribe_with_cache, request.audio_path, "en", whisper_model["path"])
 
         # Store audio chunk record
         chunk_id = crud.insert_audio_chunk(
@@ -45,3 +79,49 @@ async def transcribe_audio(request: TranscribeRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Transcription failed: {str(e)}"
         )
+
+
+def _models_response() -> dict:
+    return {
+        "models": whisper_models.list_models(),
+        "selection": whisper_models.selection(),
+        "engine_model": whisper_engine.engine.model_path,
+    }
+
+
+@router.get("/whisper/models")
+async def list_whisper_models():
+    """Installed whisper models with measured real-time factor and peak memory."""
+    return await asyncio.to_thread(_models_response)
+
+
+@router.post("/whisper/models/refresh")
+async def refresh_whisper_models():
+    """Re-scan the models directory after adding or removing ggml files."""
+    await asyncio.to_thread(whisper_models.refresh)
+    return await asyncio.to_thread(_models_response)
+
+
+@router.put("/whisper/models/selection")
+async def update_whisper_model_selection(request: WhisperModelSelection):
+    """
+    Choose models at runtime: the default and/or per session type.
+    Changing the default reloads the resident engine onto the new model.
+    """
+    updates = dict(request.session_types)
+    if "default" in request.model_fields_set:
+        updates[DEFAULT_SCOPE] = request.default
+    # Validate every name before storing any of them
+    try:
+        for name in updates.values():
+            if name is not None:
+                whisper_models.get(name)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    for scope, name in updates.items():
+        await asyncio.to_thread(whisper_models.set_selection, scope, name)
+
+    if DEFAULT_SCOPE in updates:
+        await asyncio.to_thread(whisper_engine.reload_engine, whisper_models.select()["path"])
+    return await asyncio.to_thread(_models_response)
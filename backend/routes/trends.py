@@ -0,0 +1,31 @@
+# /trends: weekly rollups served from trend_cache
+
+import trends
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Optional
+import asyncio
+
+
+router = APIRouter(prefix="/api", tags=["trends"])
+
+
+@router.get("/trends")
+async def get_weekly_trends(start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                            weeks: int = Query(12, ge=1, le=520)):
+    """
+    Weekly rollups (summary count, average agitation, medication sessions,
+    most repeated phrases), most recent first. Reads only the precomputed
+    trend_cache, never the summaries themselves.
+    """
+    if start_ts is not None and end_ts is not None and start_ts >= end_ts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_ts must be before end_ts"
+        )
+    return {"weeks": await asyncio.to_thread(trends.get_trends, start_ts, end_ts, weeks)}
+
+
+@router.post("/trends/rebuild")
+async def rebuild_trends():
+    """Recompute every week from the stored summaries (after a restore or manual edits)."""
+    return {"weeks_rebuilt": await asyncio.to_thread(trends.rebuild)}
@@ -0,0 +1,190 @@
+"""
+Full-text search over transcripts and summaries.
+transcripts_fts and summaries_fts are external-content FTS5 indexes (porter
+stemming, so "asked" matches "asking") maintained by triggers on the base
+tables; queries are ranked with bm25 and return highlighted snippets.
+"""
+
+import heapq
+import logging
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+from database import db_cursor
+
+logger = logging.getLogger(__name__)
+
+# scope -> (fts table, base table, base rowid column)
+SOURCES = {
+    "transcripts": ("transcripts_fts", "transcripts", "transcript_id"),
+    "summaries": ("summaries_fts", "summaries", "summary_id"),
+}
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_TOKENS = 16
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchQueryError(ValueError):
+    """Raised when a query has no searchable terms or is invalid FTS5 syntax."""
+
+
+def build_match_query(text: str) -> str:
+    """
+    Plain words -> an FTS5 query matching documents that contain all of them
+    ("her husband" -> "her" "husband"), so punctuation can never be parsed as
+    FTS5 operators. A trailing * keeps prefix matching on the last word.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        raise SearchQueryError("Search query has no words")
+    terms = [f'"{word}"' for word in words]
+    if text.rstrip().endswith("*"):
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _matches(scope: str, session_type: Optional[str]) -> Tuple[str, str]:
+    """FROM/WHERE (with MATCH and optional session type) selecting one source's matching rows."""
+    fts, table, id_column = SOURCES[scope]
+    sql = f"FROM {fts} JOIN {table} b ON b.{id_column} = {fts}.rowid"
+    where = f"WHERE {fts} MATCH ?"
+    if session_type is not None:
+        sql += " JOIN sessions s ON s.session_id = b.session_id"
+        where += " AND s.session_type = ?"
+    return sql, where
+
+
+def _top_sessions(cursor: sqlite3.Cursor, scope: str, match: str, session_type: Optional[str],
+                  count: int) -> List[Tuple[float, str, int, str]]:
+    """
+    The best `count` matching sessions in one source as (score, scope, rowid,
+    session_id). A session with several matching rows (chunk rows plus the
+    full transcript) counts once, scored and represented by its best row;
+    bm25 is lower-is-better.
+    """
+    fts, table, id_column = SOURCES[scope]
+    # Matches are sorted by bm25 in the index alone; sessions are then looked up
+    # for a batch of rows at a time, best first, so a session's first row is its
+    # best one and no more rows are joined once `count` sessions are found
+    rows = cursor.connection.execute(
+        f"SELECT rowid, bm25({fts}) AS score FROM {fts} WHERE {fts} MATCH ? ORDER BY score, rowid", (match,))
+    lookup = f"SELECT b.{id_column}, b.session_id FROM {table} b"
+    params = []
+    if session_type is not None:
+        # CROSS JOIN keeps the rowid lookup first rather than scanning the session type
+        lookup += " CROSS JOIN sessions s ON s.session_id = b.session_id WHERE s.session_type = ? AND"
+        params.append(session_type)
+    else:
+        lookup += " WHERE"
+
+    best = {}
+    while len(best) < count:
+        batch = rows.fetchmany(count * 4)
+        if not batch:
+            break
+        cursor.execute(f"{lookup} b.{id_column} IN ({', '.join('?' * len(batch))})",
+                       (*params, *(rowid for rowid, _ in batch)))
+        sessions = dict(cursor.fetchall())
+        for rowid, score in batch:
+            session_id = sessions.get(rowid)
+            if session_id is not None and session_id not in best:
+                best[session_id] = (score, scope, rowid, session_id)
+                if len(best) == count:
+                    break
+    rows.close()
+    return list(best.values())
+
+
+def _count_sessions(cursor: sqlite3.Cursor, scopes: List[str], match: str,
+                    session_type: Optional[str]) -> int:
+    """Distinct sessions matching in any of the sources (no scoring)."""
+    selects, params = [], []
+    for scope in scopes:
+        sql, where = _matches(scope, session_type)
+        selects.append(f"SELECT b.session_id {sql} {where}")
+        params += [match, *([session_type] if session_type is not None else [])]
+    cursor.execute(f"SELECT COUNT(DISTINCT session_id) FROM ({' UNION ALL '.join(selects)})", params)
+    return cursor.fetchone()[0]
+
+
+def _page_rows(cursor: sqlite3.Cursor, scope: str, match: str, ids: List[int]) -> dict:
+    """Snippet and session details for the rows on the requested page only."""
+    fts, table, id_column = SOURCES[scope]
+    cursor.execute(
+        f"""SELECT {fts}.rowid, b.session_id, s.session_type, s.start_ts,
+            snippet({fts}, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet
+            FROM {fts}
+            JOIN {table} b ON b.{id_column} = {fts}.rowid
+            JOIN sessions s ON s.session_id = b.session_id
+            WHERE {fts} MATCH ? AND {fts}.rowid IN ({', '.join('?' * len(ids))})""",
+        (HIGHLIGHT_START, HIGHLIGHT_END, match, *ids)
+    )
+    return {row[0]: row for row in cursor.fetchall()}
+
+
+def search(query: str, scopes: Optional[List[str]] = None, session_type: Optional[str] = None,
+           limit: int = 20, offset: int = 0, raw: bool = False) -> dict:
+    """
+    Ranked matching sessions across the requested sources (best first), each
+    with a highlighted snippet from its best-matching row. raw=True passes FTS5
+    syntax (OR, NEAR, "phrases") through. Snippets are only generated for the
+    returned page.
+    """
+    match = query.strip() if raw else build_match_query(query)
+    if not match:
+        raise SearchQueryError("Search query is empty")
+    scopes = scopes or list(SOURCES)
+
+    try:
+        with db_cursor() as cursor:
+            # Each source ranks and cuts its own sessions; a session can match in
+            # several sources, so the merge keeps its best hit before paging
+            best = {}
+            for scope in scopes:
+                for hit in _top_sessions(cursor, scope, match, session_type, offset + limit):
+                    if hit[3] not in best or hit < best[hit[3]]:
+                        best[hit[3]] = hit
+            page = heapq.nsmallest(offset + limit, best.values())[offset:]
+            total = _count_sessions(cursor, scopes, match, session_type)
+
+            details = {}
+            for scope in scopes:
+                ids = [rowid for _, source, rowid, _ in page if source == scope]
+                if ids:
+                    details[scope] = _page_rows(cursor, scope, match, ids)
+    except sqlite3.OperationalError as e:
+        # Bad FTS5 syntax in a raw query
+        raise SearchQueryError(f"Invalid search query: {str(e)}")
+
+    results = []
+    for score, scope, rowid, _ in page:
+        row = details[scope][rowid]
+        results.append({
+            "source": scope,
+            "id": rowid,
+            "session_id": row["session_id"],
+            "session_type": row["session_type"],
+            "start_ts": row["start_ts"],
+            "snippet": row["snippet"],
+            # bm25 is lower-is-better; expose higher-is-better
+            "score": round(-score, 4),
+        })
+    return {"query": match, "total": total, "limit": limit, "offset": offset, "results": results}
+
+
+def ensure_index() -> List[str]:
+    """Rebuild any index that is out of step with its table (e.g. rows written before FTS existed)."""
+    rebuilt = []
+    with db_cursor() as cursor:
+        for scope, (fts, table, _) in SOURCES.items():
+            cursor.execute(f"SELECT (SELECT COUNT(*) FROM {fts}_docsize), (SELECT COUNT(*) FROM {table})")
+            indexed, rows = cursor.fetchone()
+            if indexed != rows:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                logger.info(f"Rebuilt {fts}: {rows} rows ({indexed} were indexed)")
+                rebuilt.append(scope)
+    return rebuilt
@@ -0,0 +1,123 @@
+"""
+Base class for the caches kept in SQLite tables.
+Each table has a cache_key primary key plus created_ts, last_access_ts and
+hit_count columns; the base class does lookups, hit/miss counting, writes
+with periodic LRU eviction (and TTL expiry when one is set) and stats.
+Subclasses build their keys and rows.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from database import db_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteLRUCache:
+    """SQLite-backed cache with optional TTL and LRU eviction every evict_every writes."""
+
+    # Table holding the entries; set by subclasses
+    table = ""
+
+    def __init__(self, max_entries: int, enabled: bool = True, evict_every: int = 50,
+                 ttl_sec: Optional[int] = None):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.evict_every = evict_every
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _expired(self, created_ts: int, now: int) -> bool:
+        return self.ttl_sec is not None and now - created_ts > self.ttl_sec * 1000
+
+    def _lookup(self, cache_key: str, column: str) -> Optional[Any]:
+        """Return column of a live entry and mark it used, or None on miss or expiry."""
+        now = int(time.time() * 1000)
+        with db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {column}, created_ts FROM {self.table} WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+
+            if row and self._expired(row["created_ts"], now):
+                cursor.execute(f"DELETE FROM {self.table} WHERE cache_key = ?", (cache_key,))
+                row = None
+
+            if not row:
+                self._count("misses")
+                return None
+
+            cursor.execute(
+                f"UPDATE {self.table} SET last_access_ts = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, cache_key)
+            )
+
+        self._count("hits")
+        return row[column]
+
+    def _store(self, entry: Dict[str, Any]):
+        """Insert or replace an entry (its cache_key and value columns), evicting every few writes."""
+        now = int(time.time() * 1000)
+        columns = list(entry) + ["created_ts", "last_access_ts", "hit_count"]
+        with db_cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                (*entry.values(), now, now, 0)
+            )
+
+        with self._lock:
+            self._puts_since_evict += 1
+            due = self._puts_since_evict >= self.evict_every
+            if due:
+                self._puts_since_evict = 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones above max_entries."""
+        removed = 0
+        with db_cursor() as cursor:
+            if self.ttl_sec is not None:
+                cutoff = int(time.time() * 1000) - self.ttl_sec * 1000
+                cursor.execute(f"DELETE FROM {self.table} WHERE created_ts < ?", (cutoff,))
+                removed += cursor.rowcount
+            cursor.execute(
+                f"""DELETE FROM {self.table} WHERE cache_key IN (
+                        SELECT cache_key FROM {self.table}
+                        ORDER BY last_access_ts DESC
+                        LIMIT -1 OFFSET ?
+                    )""",
+                (self.max_entries,)
+            )
+            removed += cursor.rowcount
+        if removed:
+            logger.info(f"Evicted {removed} {self.table} entries")
+        return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters since startup plus current size."""
+        with db_cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table}")
+            entries = cursor.fetchone()[0]
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+        if self.ttl_sec is not None:
+            stats["ttl_sec"] = self.ttl_sec
+        return stats
@@ -0,0 +1,68 @@
+"""
+Helpers for streaming responses to the frontend as Server-Sent Events.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from llm_client import stream_from_template, parse_or_repair
+from structured_output import StructuredOutput
+
+logger = logging.getLogger(__name__)
+
+# Disable proxy buffering so events reach the browser as they are produced
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one SSE message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_completion(template: str, fields: Dict[str, Any],
+                            finalize: Callable[[Any], Dict[str, Any]],
+                            bypass_cache: bool = False,
+                            structured: Optional[StructuredOutput] = None,
+                            on_error: Optional[Callable[[Exception], Dict[str, Any]]] = None):
+    """
+    Forward LLM tokens as `token` events while the completion is generated,
+    then hand the full text to finalize (store, run off the event loop) and
+    send its return value as a single `result` event. With structured, the
+    output is schema-constrained and finalize receives the parsed object
+    (after one repair call if the completion did not validate). If the
+    completion fails and on_error is given, its return value (e.g. a stored
+    fallback) is sent as the `result` event instead of an `error` event.
+    """
+    chunks = []
+    try:
+        async for token in stream_from_template(template, fields, bypass_cache=bypass_cache,
+                                                structured=structured):
+            chunks.append(token)
+            yield sse_event("token", {"text": token})
+
+        completion = "".join(chunks)
+        if structured is not None:
+            completion = await parse_or_repair(completion, structured)
+        result = await asyncio.to_thread(finalize, completion)
+        yield sse_event("result", result)
+
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            error = {"status_code": e.status_code, "detail": e.detail}
+        else:
+            error = {"status_code": 500, "detail": str(e)}
+        logger.error(f"Streaming completion failed: {error['detail']}")
+        if on_error is not None:
+            try:
+                yield sse_event("result", await asyncio.to_thread(on_error, e))
+                return
+            except Exception as fallback_error:
+                logger.error(f"Streaming fallback failed: {str(fallback_error)}")
+        yield sse_event("error", error)
@@ -0,0 +1,141 @@
+"""
+Schema-constrained LLM output.
+A StructuredOutput pairs the JSON schema sent to Ollama as `format` (so the
+model can only emit matching JSON) with a tolerant parser for what comes
+back: code fences, prose around the object, trailing commas and output cut
+off mid-object are all recovered without another LLM call.
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+_FENCED = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a completion does not contain JSON matching the expected shape."""
+
+
+def _repair(fragment: str) -> Optional[Any]:
+    """
+    Single pass over text starting at "{": stop where the object closes,
+    drop trailing commas, and close strings/brackets left open by a
+    truncated completion.
+    """
+    out, stack = [], []
+    in_string = escaped = False
+    for ch in fragment:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                return None
+            # Trailing comma before a closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            continue
+        out.append(ch)
+
+    if in_string:
+        out.append('"')
+    text = "".join(out).rstrip()
+    # Truncated after a key or a comma: drop the dangling part
+    text = re.sub(r'(,\s*"[^"]*"\s*:?\s*|,\s*|:\s*)$', "", text)
+    text += "".join(reversed(stack))
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def extract_json(text: str) -> Optional[dict]:
+    """First JSON object in an LLM completion, or None if there is none to recover."""
+    text = text.strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except ValueError:
+        pass
+
+    decoder = json.JSONDecoder()
+    candidates = [m.group(1) for m in _FENCED.finditer(text)] + [text]
+    for candidate in candidates:
+        start = candidate.find("{")
+        if start == -1:
+            continue
+        # raw_decode stops at the end of the object, ignoring anything after it
+        position = start
+        while position != -1:
+            try:
+                value, _ = decoder.raw_decode(candidate, position)
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+            position = candidate.find("{", position + 1)
+        repaired = _repair(candidate[start:])
+        if isinstance(repaired, dict):
+            return repaired
+    return None
+
+
+class StructuredOutput:
+    """JSON schema for Ollama's `format` plus the validation applied to the reply."""
+
+    def __init__(self, schema: Dict[str, Any], validate: Optional[Callable[[dict], dict]] = None,
+                 name: str = "output"):
+        self.schema = schema
+        self.name = name
+        self._validate = validate
+        self.schema_hash = hashlib.sha256(
+            json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_model(cls, model: Type[BaseModel]) -> "StructuredOutput":
+        """Schema and validation taken from a Pydantic model."""
+        return cls(model.model_json_schema(), lambda data: model.model_validate(data).model_dump(),
+                   name=model.__name__)
+
+    def parse(self, text: str) -> dict:
+        """Parsed and validated object; raises StructuredOutputError."""
+        data = extract_json(text or "")
+        if data is None:
+            raise StructuredOutputError(f"No JSON object found in {self.name} response")
+        if self._validate is None:
+            return data
+        try:
+            return self._validate(data)
+        except ValidationError as e:
+            raise StructuredOutputError(
+                f"{self.name} response does not match its schema: {e.error_count()} error(s): "
+                + "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()))
+
+    def is_valid(self, text: str) -> bool:
+        try:
+            self.parse(text)
+            return True
+        except StructuredOutputError:
+            return False
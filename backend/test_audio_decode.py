@@ -0,0 +1,45 @@
+import subprocess
+import wave
+import io
+from unittest.mock import patch
+
+import pytest
+
+import audio_decode
+
+
+def test_extension_for_content_types():
+    assert audio_decode.extension_for("audio/webm;codecs=opus") == ".webm"
+    assert audio_decode.extension_for("video/webm") == ".webm"
+    assert audio_decode.extension_for("audio/wav") == ".wav"
+    assert audio_decode.extension_for("application/octet-stream") == ".bin"
+
+
+def test_wav_passes_through_without_ffmpeg():
+    with patch("audio_decode.subprocess.run") as mock_run:
+        assert audio_decode.to_whisper_wav(b"RIFFdata", "audio/wav") == b"RIFFdata"
+    mock_run.assert_not_called()
+
+
+def test_decode_pipes_bytes_through_ffmpeg():
+    pcm = b"\x01\x00" * 160
+    completed = subprocess.CompletedProcess(args=[], returncode=0, stdout=pcm, stderr=b"")
+    with patch("audio_decode.subprocess.run", return_value=completed) as mock_run:
+        wav_bytes = audio_decode.to_whisper_wav(b"webm-bytes", "audio/webm")
+
+    args, kwargs = mock_run.call_args
+    assert args[0][args[0].index("-i") + 1] == "pipe:0"
+    assert args[0][-1] == "pipe:1"
+    assert kwargs["input"] == b"webm-bytes"
+
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        assert wav.getframerate() == 16000
+        assert wav.getnchannels() == 1
+        assert wav.readframes(wav.getnframes()) == pcm
+
+
+def test_decode_failure_raises():
+    completed = subprocess.CompletedProcess(args=[], returncode=1, stdout=b"", stderr=b"Invalid data")
+    with patch("audio_decode.subprocess.run", return_value=completed):
+        with pytest.raises(audio_decode.AudioDecodeError, match="Invalid data"):
+            audio_decode.decode_to_pcm(b"garbage")
@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import patch
+
+import crud
+from batch_summarize import BatchRunner, DONE, FAILED, PENDING, _session_input, select_sessions
+
+
+def _session(start_ts: int, transcript: str = "Where is my coat?", session_type: str = "freeform") -> str:
+    session_id = crud.create_session(session_type, start_ts)
+    if transcript:
+        crud.insert_transcript(session_id, transcript)
+    return session_id
+
+
+def test_select_sessions_filters(temp_db):
+    """Only sessions with a transcript; optionally unsummarized, in a start_ts range or of one type."""
+    old = _session(1000)
+    summarized = _session(2000)
+    crud.insert_summary(summarized, "done already")
+    _session(3000, transcript="")
+    meds = _session(4000, session_type="medication")
+
+    assert select_sessions() == [old, meds]
+    assert select_sessions(missing_summary=False) == [old, summarized, meds]
+    assert select_sessions(missing_summary=False, start_ts=2000, end_ts=4000) == [summarized]
+    assert select_sessions(session_type="medication") == [meds]
+    assert select_sessions(limit=1) == [old]
+
+
+def test_session_input_uses_full_transcript_of_chunked_session(temp_db):
+    """Chunk rows are not sent alongside the stitched full row; without one they are stitched."""
+    chunked = crud.create_session("freeform", 1000)
+    for text in ("where is my husband", "he went to the garden"):
+        crud.insert_transcript(chunked, text, chunk_id=crud.insert_audio_chunk(chunked, "rec.wav#t=0,30"))
+    crud.insert_transcript(chunked, "where is my husband he went to the garden")
+    assert _session_input(chunked) == ("freeform", "where is my husband he went to the garden")
+
+    unfinished = crud.create_session("freeform", 2000)
+    for text in ("where is my husband he", "my husband he went out"):
+        crud.insert_transcript(unfinished, text, chunk_id=crud.insert_audio_chunk(unfinished, "rec.wav#t=0,30"))
+    assert _session_input(unfinished)[1] == "where is my husband he went out"
+
+
+def test_batch_runs_with_bounded_concurrency(temp_db):
+    """Sessions run at most `concurrency` at a time; failures are checkpointed, not fatal."""
+    sessions = [_session(1000 + i, transcript=f"transcript {i}") for i in range(6)]
+    in_flight, peak = [0], [0]
+
+    async def fake_generate(template, fields, structured, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        if fields["transcript"] == "transcript 3":
+            raise ValueError("model unavailable")
+        return {"summary": fields["transcript"], "repetition_json": [], "agitation_score": 1.0,
+                "mood_label": "calm", "suggestions": ["rest"]}
+
+    runner = BatchRunner(default_concurrency=2, max_concurrency=4)
+    batch_id = runner.create({"missing_summary": True})
+    with patch("batch_summarize.generate_structured", fake_generate):
+        asyncio.run(runner.run(batch_id))
+
+    status = runner.status(batch_id)
+    assert peak[0] == 2
+    assert status["status"] == "completed" and status["total"] == 6
+    assert status["counts"] == {PENDING: 0, DONE: 5, FAILED: 1}
+    assert status["recent_failures"] == [{"session_id": sessions[3], "error": "model unavailable"}]
+    assert status["throughput"]["sessions_per_min"] > 0 and status["throughput"]["eta_sec"] is None
+    assert crud.get_session_detail(sessions[0]).summary.summary_text == "transcript 0"
+
+
+def test_batch_resumes_from_checkpoint(temp_db):
+    """A batch left running resumes with only its pending sessions."""
+    sessions = [_session(1000 + i) for i in range(3)]
+    runner = BatchRunner(default_concurrency=1, max_concurrency=1)
+    batch_id = runner.create({"missing_summary": True})
+    runner._mark_running(batch_id)
+    runner._checkpoint(batch_id, sessions[0], DONE, None, 10)
+    summarized = []
+
+    async def fake_generate(template, fields, structured, **kwargs):
+        return {"summary": "ok", "repetition_json": [], "agitation_score": 0.0,
+                "mood_label": "calm", "suggestions": ""}
+
+    async def resume():
+        with patch("batch_summarize.generate_structured", fake_generate), \
+                patch("batch_summarize.store_parsed_summary", lambda sid, parsed, replace: summarized.append(sid)):
+            assert runner.resume_unfinished() == [batch_id]
+            await runner._tasks[batch_id]
+
+    asyncio.run(resume())
+    assert summarized == sessions[1:]
+    assert runner.status(batch_id)["counts"][DONE] == 3
+    assert runner.cancel(batch_id) is False
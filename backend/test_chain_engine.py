@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+import chain_engine
+from chain_engine import ChainDefinition, ChainDefinitionError, run_chain
+from prompt_registry import PromptRegistry
+
+
+def _definition(stages, summary_stage=None) -> ChainDefinition:
+    return ChainDefinition.from_dict({"name": "test", "stages": stages, "summary_stage": summary_stage})
+
+
+@pytest.fixture()
+def prompts(tmp_path):
+    """Scratch prompt registry with one template per stage used below."""
+    templates = {
+        "t_themes": "Themes in {transcript}",
+        "t_mood": "Mood in {transcript}",
+        "t_summary": "Summarize {themes} and {mood}",
+    }
+    for name, template in templates.items():
+        (tmp_path / f"{name}.json").write_text(json.dumps({"prompt_template": template}))
+    registry = PromptRegistry(str(tmp_path))
+    registry.expect("t_summary", {"themes", "mood"})
+    with patch("prompt_registry.registry", registry):
+        yield registry
+
+
+FAN_OUT = [
+    {"name": "summary", "prompt": "t_summary", "inputs": {"themes": "themes", "mood": "mood"},
+     "output_schema": {"type": "object", "required": ["summary"]}},
+    {"name": "themes", "prompt": "t_themes", "inputs": {"transcript": "transcript"}},
+    {"name": "mood", "prompt": "t_mood", "inputs": {"transcript": "transcript"}},
+]
+
+
+def _collect(definition, fake_generate, repair_response="still not json", **kwargs):
+    async def collect():
+        return [event async for event in run_chain(definition, {"transcript": "hello"}, **kwargs)]
+
+    async def fake_repair(prompt, **kwargs):
+        return repair_response
+
+    with patch("chain_engine.generate_from_template", fake_generate), \
+            patch("llm_client.ollama.generate", fake_repair):
+        return asyncio.run(collect())
+
+
+def test_shipped_chains_are_valid():
+    """Every chains/*.json loads, and its stages run in dependency order."""
+    chains = chain_engine.load_chain_definitions(chain_engine.config.CARELINK_CHAINS_DIR)
+    assert {"medication", "freeform", "sundowning"} <= set(chains)
+    for definition in chains.values():
+        assert definition.stage_names == ["extract", "analyze", "summarize"]
+        for stage in definition.stages:
+            assert os.path.isfile(os.path.join(chain_engine.config.CARELINK_PROMPTS_DIR, f"{stage.prompt}.json"))
+
+
+def test_definition_validation():
+    """Unknown inputs, duplicate names, cycles and a bad summary stage are rejected."""
+    with pytest.raises(ChainDefinitionError):
+        _definition([{"name": "a", "prompt": "p", "inputs": {"x": "missing"}}])
+    with pytest.raises(ChainDefinitionError):
+        _definition([{"name": "a", "prompt": "p"}, {"name": "a", "prompt": "q"}])
+    with pytest.raises(ChainDefinitionError):
+        _definition([{"name": "a", "prompt": "p", "inputs": {"x": "b"}},
+                     {"name": "b", "prompt": "q", "inputs": {"y": "a"}}])
+    with pytest.raises(ChainDefinitionError):
+        _definition([{"name": "a", "prompt": "p"}], summary_stage="b")
+    with pytest.raises(ChainDefinitionError):
+        ChainDefinition.from_dict({"name": "no-stages"})
+
+
+def test_independent_stages_run_concurrently(prompts):
+    """Stages reading only the transcript overlap; their dependent waits for both."""
+    definition = _definition(FAN_OUT)
+    assert definition.stage_names == ["themes", "mood", "summary"]
+    in_flight, peak, prompts_seen = [0], [0], {}
+
+    async def fake_generate(template, fields, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+        prompts_seen[template] = fields
+        if template.startswith("Summarize"):
+            return json.dumps({"summary": "done"})
+        return json.dumps({"from": template.split()[0]})
+
+    events = _collect(definition, fake_generate)
+
+    assert peak[0] == 2
+    stages = [data["stage"] for event, data in events if event == "stage"]
+    assert stages[-1] == "summary" and set(stages[:2]) == {"themes", "mood"}
+    assert json.loads(prompts_seen["Summarize {themes} and {mood}"]["mood"]) == {"from": "Mood"}
+    assert all(data["elapsed_ms"] >= 0 and "started_ms" in data for _, data in events)
+
+
+def test_failed_stage_stops_the_chain(prompts):
+    """A stage violating its output schema raises and dependents never run."""
+    calls = []
+
+    async def fake_generate(template, fields, **kwargs):
+        calls.append(template)
+        return json.dumps({"not_summary": True}) if template.startswith("Summarize") else "{}"
+
+    with pytest.raises(HTTPException) as error:
+        _collect(_definition(FAN_OUT), fake_generate)
+    assert "summary" in error.value.detail
+
+    async def failing_generate(template, fields, **kwargs):
+        calls.append(template)
+        if template.startswith("Themes"):
+            return "no json here"
+        await asyncio.sleep(0.05)
+        return "{}"
+
+    calls.clear()
+    with pytest.raises(HTTPException):
+        _collect(_definition(FAN_OUT), failing_generate)
+    assert not any(c.startswith("Summarize") for c in calls)
+
+
+def test_invalid_stage_output_is_repaired_once(prompts):
+    """A stage reply that does not validate gets one schema-constrained repair call."""
+    async def fake_generate(template, fields, **kwargs):
+        assert kwargs["structured"].schema["type"] == "object"
+        return "Sure! {\"wrong\": 1}" if template.startswith("Summarize") else "{}"
+
+    events = _collect(_definition(FAN_OUT), fake_generate, repair_response='{"summary": "fixed"}')
+    assert events[-1][1]["data"] == {"summary": "fixed"}
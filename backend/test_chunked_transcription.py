@@ -0,0 +1,65 @@
+import struct
+import threading
+import time
+
+import pytest
+
+import audio_decode
+import chunked_transcription
+
+
+def _pcm(seconds: int, sample_rate: int = 100) -> bytes:
+    """PCM where every sample in second n has the value n."""
+    return b"".join(struct.pack("<h", n) * sample_rate for n in range(seconds))
+
+
+def test_split_pcm_overlaps_windows():
+    chunks = chunked_transcription.split_pcm(_pcm(70), window_sec=30, overlap_sec=2, sample_rate=100)
+    assert [(start, end) for start, end, _ in chunks] == [(0, 30), (28, 58), (56, 70)]
+
+
+def test_split_pcm_short_audio_is_one_chunk():
+    chunks = chunked_transcription.split_pcm(_pcm(5), window_sec=30, overlap_sec=2, sample_rate=100)
+    assert len(chunks) == 1
+    assert chunks[0][1] == 5
+
+
+def test_split_pcm_rejects_overlap_longer_than_window():
+    with pytest.raises(ValueError):
+        chunked_transcription.split_pcm(_pcm(5), window_sec=2, overlap_sec=2)
+
+
+def test_stitch_drops_overlapping_words():
+    texts = ["the patient asked about lunch", "About lunch, and then dinner", "dinner was fine"]
+    assert chunked_transcription.stitch(texts) == "the patient asked about lunch and then dinner was fine"
+
+
+def test_stitch_keeps_text_without_overlap():
+    assert chunked_transcription.stitch(["good morning", "", "how are you"]) == "good morning how are you"
+
+
+def test_transcribe_chunks_runs_in_parallel_and_keeps_order():
+    chunks = chunked_transcription.split_pcm(
+        _pcm(100, sample_rate=16000), window_sec=30, overlap_sec=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_transcribe(wav_bytes):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        first_second = struct.unpack("<h", audio_decode.wav_pcm(wav_bytes)[:2])[0]
+        return f"chunk-from-{first_second}"
+
+    completed = []
+    texts = chunked_transcription.transcribe_chunks(
+        chunks, fake_transcribe, max_workers=4,
+        on_chunk=lambda index, chunk, text: completed.append(index))
+
+    assert texts == ["chunk-from-0", "chunk-from-28", "chunk-from-56", "chunk-from-84"]
+    assert sorted(completed) == [0, 1, 2, 3]
+    assert max(peak) > 1
@@ -0,0 +1,114 @@
+import threading
+import pytest
+import database
+
+
+def test_connection_pragmas(temp_db):
+    """Pooled connections are opened with WAL and the tuned pragmas."""
+    with database.db_cursor() as cursor:
+        assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert cursor.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert cursor.execute("PRAGMA cache_size").fetchone()[0] < 0
+
+
+def test_connection_reused_within_thread(temp_db):
+    """Repeated calls on one thread share a single connection."""
+    with database.db_connection() as first:
+        pass
+    with database.db_connection() as second:
+        pass
+    assert first is second
+
+
+def test_connection_per_thread(temp_db):
+    """Each thread gets its own connection."""
+    main_conn = database.get_connection()
+    seen = []
+
+    def worker():
+        seen.append(database.get_connection())
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert seen and seen[0] is not main_conn
+
+
+def test_close_all_connections_reconnects_other_threads(temp_db):
+    """A thread whose connection was closed by close_all_connections elsewhere gets a new one."""
+    opened = threading.Event()
+    closed = threading.Event()
+    seen = []
+
+    def worker():
+        seen.append(database.get_connection())
+        opened.set()
+        closed.wait(5)
+        conn = database.get_connection()
+        seen.append(conn)
+        seen.append(conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0])
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    opened.wait(5)
+    database.close_all_connections()
+    closed.set()
+    thread.join()
+
+    assert seen[1] is not seen[0]
+    assert seen[2] == 0
+
+
+def test_failed_block_rolls_back(temp_db):
+    """An exception inside db_cursor does not leave a half-written transaction behind."""
+    with pytest.raises(RuntimeError):
+        with database.db_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO sessions (session_id, session_type, start_ts) VALUES (?, ?, ?)",
+                ("rollback-test", "conversation", 1)
+            )
+            raise RuntimeError("boom")
+
+    with database.db_cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sessions WHERE session_id = ?", ("rollback-test",))
+        assert cursor.fetchone()[0] == 0
+
+
+def test_session_list_keyset_pagination(temp_db):
+    """Pages follow (start_ts, session_id) without gaps or repeats, with filters applied."""
+    import crud
+    created = [crud.create_session("meals" if i % 2 else "freeform", 1000 + i // 2, f"p{i % 3}")
+               for i in range(9)]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = crud.get_sessions_list(limit=4, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert len(seen) == 9 and {item.session_id for item in seen} == set(created)
+    assert [(i.start_ts, i.session_id) for i in seen] == sorted(((i.start_ts, i.session_id) for i in seen),
+                                                                  reverse=True)
+
+    meals, _ = crud.get_sessions_list(session_type="meals", start_ts=1001, end_ts=1004)
+    assert [item.start_ts for item in meals] == [1003, 1002, 1001]
+    assert all(item.patient_id == "p0" for item in crud.get_sessions_list(patient_id="p0")[0])
+    with pytest.raises(ValueError):
+        crud.get_sessions_list(cursor="not-a-cursor")
+
+
+def test_summary_snippet_stored_on_write(temp_db):
+    """The list snippet is written with the summary and follows replaces and deletes."""
+    import crud
+    session_id = crud.create_session("freeform", 1000)
+    crud.insert_summary(session_id, "x" * 150)
+    assert crud.get_sessions_list()[0][0].summary_snippet == "x" * 100
+
+    crud.insert_summary(session_id, "Calm afternoon", replace=True)
+    assert crud.get_sessions_list()[0][0].summary_snippet == "Calm afternoon"
+    with database.db_cursor() as cursor:
+        cursor.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+    assert crud.get_sessions_list()[0][0].summary_snippet is None
@@ -3,6 +3,8 @@ import subprocess
 
 from faster_whisper import WhisperModel
 
+from whisper_utils import run_whisper_cli
+
 # ——— Python fallback model (loaded once) ———
 _py_model = WhisperModel("tiny.en", device="cpu")
 
@@ -40,17 +42,8 @@ def transcribe_with_cpp(audio_path: str, model_path: str = None) -> str:
     if not os.path.exists(audio):
         raise FileNotFoundError(f"Audio file not found at: {audio}")
 
-    # Run the C++ CLI
-    cmd = [
-        cli,
-        "--model", model,
-        "--file", audio,
-        "--output-txt",
-        "--output-file", "output",
-        "--print-progress",
-        "--language", "en",
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Run the C++ CLI with a private output directory
+    result, transcript = run_whisper_cli(cli, model, audio, "en")
 
     # Debug output
     print("Whisper stdout:\n", result.stdout)
@@ -60,14 +53,11 @@ def transcribe_with_cpp(audio_path: str, model_path: str = None) -> str:
         raise RuntimeError(
             f"Whisper CLI failed (exit code {result.returncode})")
 
-    # Read and return the transcript
-    out_txt = os.path.join(os.getcwd(), "output.txt")
-    if not os.path.exists(out_txt):
+    if not transcript:
         raise FileNotFoundError(
-            "Expected output.txt not found after transcription.")
+            "Expected transcript output not found after transcription.")
 
-    with open(out_txt, "r", encoding="utf-8") as f:
-        return f.read()
+    return transcript
 
 
 def transcribe_audio(audio_path: str, model_path: str = None) -> str:
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import struct
+import wave
+
+import live_transcription
+
+SAMPLE_RATE = 100
+
+
+def _pcm(start: int, seconds: int) -> bytes:
+    """PCM where every sample in second n has the value n."""
+    return b"".join(struct.pack("<h", n) * SAMPLE_RATE for n in range(start, start + seconds))
+
+
+def _second_words(wav_bytes: bytes) -> str:
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        pcm = wav.readframes(wav.getnframes())
+    step = SAMPLE_RATE * 2
+    return " ".join(f"w{struct.unpack('<h', pcm[i:i + 2])[0]}" for i in range(0, len(pcm), step))
+
+
+def _run(frames, window_sec=10, overlap_sec=2, partial_sec=3, transcribe_fn=_second_words):
+    messages = []
+    stored = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def scenario():
+        transcriber = live_transcription.LiveTranscriber(
+            send=send, transcribe_fn=transcribe_fn,
+            store_chunk=lambda *args: stored.append(args),
+            window_sec=window_sec, overlap_sec=overlap_sec, partial_sec=partial_sec,
+            sample_rate=SAMPLE_RATE)
+        for frame in frames:
+            await transcriber.feed(frame)
+            await asyncio.sleep(0.01)
+        return await transcriber.finish()
+
+    return asyncio.run(scenario()), messages, stored
+
+
+def test_windows_are_finalized_in_order_and_stitched():
+    frames = [_pcm(n, 1) for n in range(25)]
+    transcript, messages, stored = _run(frames)
+
+    assert transcript == " ".join(f"w{n}" for n in range(25))
+    finals = [m for m in messages if m["type"] == "final"]
+    assert [m["chunk_index"] for m in finals] == [0, 1, 2]
+    assert [(m["start_sec"], m["end_sec"]) for m in finals] == [(0, 10), (8, 18), (16, 25)]
+    assert [s[0] for s in stored] == [0, 1, 2]
+
+
+def test_partials_are_sent_for_the_open_window():
+    frames = [_pcm(n, 1) for n in range(7)]
+    _, messages, _ = _run(frames)
+
+    partials = [m for m in messages if m["type"] == "partial"]
+    assert partials
+    assert all(m["chunk_index"] == 0 for m in partials)
+    assert partials[0]["text"].startswith("w0")
+
+
+def test_frames_split_mid_sample_stay_aligned():
+    audio = _pcm(0, 4)
+    frames = [audio[i:i + 7] for i in range(0, len(audio), 7)]
+    transcript, _, _ = _run(frames, partial_sec=100)
+    assert transcript == "w0 w1 w2 w3"
+
+
+def test_no_audio_produces_no_chunks():
+    transcript, messages, stored = _run([])
+    assert transcript == ""
+    assert stored == []
+    assert messages == []
@@ -0,0 +1,56 @@
+import time
+from llm_cache import LLMCache
+
+
+def test_key_depends_on_model_template_and_input():
+    """Changing any component of the key gives a different entry."""
+    cache = LLMCache(ttl_sec=60, max_entries=10)
+    base = cache.make_key("model-a", "T {transcript}", {"transcript": "hi"})[0]
+    assert cache.make_key("model-a", "T {transcript}", {"transcript": "hi"})[0] == base
+    assert cache.make_key("model-b", "T {transcript}", {"transcript": "hi"})[0] != base
+    assert cache.make_key("model-a", "U {transcript}", {"transcript": "hi"})[0] != base
+    assert cache.make_key("model-a", "T {transcript}", {"transcript": "bye"})[0] != base
+
+
+def test_get_put_and_stats(temp_db):
+    """A stored completion is returned on the next lookup and counted as a hit."""
+    cache = LLMCache(ttl_sec=60, max_entries=10)
+    key, t_hash, i_hash = cache.make_key("m", "T", {"x": 1})
+
+    assert cache.get(key) is None
+    cache.put(key, "m", t_hash, i_hash, "completion")
+    assert cache.get(key) == "completion"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_expired_entries_are_misses(temp_db):
+    """Entries older than the TTL are not served."""
+    cache = LLMCache(ttl_sec=0, max_entries=10)
+    key, t_hash, i_hash = cache.make_key("m", "T", {"x": 1})
+    cache.put(key, "m", t_hash, i_hash, "completion")
+    time.sleep(0.01)
+
+    assert cache.get(key) is None
+
+
+def test_lru_eviction(temp_db):
+    """Eviction keeps only the most recently used max_entries rows."""
+    cache = LLMCache(ttl_sec=60, max_entries=2, evict_every=1000)
+    keys = []
+    for i in range(3):
+        key, t_hash, i_hash = cache.make_key("m", "T", {"x": i})
+        cache.put(key, "m", t_hash, i_hash, f"completion {i}")
+        keys.append(key)
+        time.sleep(0.002)
+
+    # Touch the oldest entry so the middle one becomes least recently used
+    cache.get(keys[0])
+    cache.evict()
+
+    assert cache.get(keys[0]) == "completion 0"
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == "completion 2"
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi import HTTPException
+from llm_client import OllamaClient
+
+
+def make_client(handler, **kwargs):
+    """Build a client whose HTTP traffic is served by handler instead of Ollama."""
+    kwargs.setdefault("backoff", 0.01)
+    return OllamaClient("http://ollama.test", "test-model",
+                        transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_generate_returns_response_text():
+    """A successful call returns the 'response' field."""
+    def handler(request):
+        return httpx.Response(200, json={"response": "hello"})
+
+    assert asyncio.run(make_client(handler).generate("hi")) == "hello"
+
+
+def test_generate_retries_transient_errors():
+    """503s are retried with backoff before succeeding."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"response": "recovered"})
+
+    assert asyncio.run(make_client(handler, max_retries=2).generate("hi")) == "recovered"
+    assert len(calls) == 3
+
+
+def test_generate_connect_error_maps_to_503():
+    """An unreachable Ollama surfaces as 503 once retries are used up."""
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(make_client(handler, max_retries=1).generate("hi"))
+    assert exc_info.value.status_code == 503
+
+
+def test_generate_respects_concurrency_limit():
+    """No more than max_concurrency calls are in flight at once."""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return httpx.Response(200, json={"response": "ok"})
+
+    client = make_client(handler, max_concurrency=2)
+
+    async def run_many():
+        return await asyncio.gather(*(client.generate("hi") for _ in range(6)))
+
+    assert asyncio.run(run_many()) == ["ok"] * 6
+    assert peak == 2
+
+
+def test_stream_generate_yields_tokens():
+    """Streaming calls yield each token from Ollama's NDJSON output."""
+    def handler(request):
+        body = "\n".join([
+            json.dumps({"response": "Hel", "done": False}),
+            json.dumps({"response": "lo", "done": False}),
+            json.dumps({"response": "", "done": True}),
+        ])
+        return httpx.Response(200, content=body.encode())
+
+    async def collect():
+        return [token async for token in make_client(handler).stream_generate("hi")]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+
+
+def test_stream_generate_retries_transient_errors():
+    """Streaming calls retry 503s and dropped connections like generate() does."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        if len(calls) == 2:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, content=json.dumps({"response": "ok", "done": True}).encode())
+
+    async def collect(client):
+        return [token async for token in client.stream_generate("hi")]
+
+    assert asyncio.run(collect(make_client(handler, max_retries=2))) == ["ok"]
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(collect(make_client(lambda request: calls.append(request) or httpx.Response(503),
+                                        max_retries=1)))
+    assert exc_info.value.status_code == 502
+    assert len(calls) == 2
@@ -0,0 +1,158 @@
+import sqlite3
+
+import pytest
+
+import database
+import migrations
+from migrations import MigrationError
+
+# db/schema.sql as first released, before schema_version existed
+LEGACY_SCHEMA = """
+CREATE TABLE sessions (session_id TEXT PRIMARY KEY, session_type TEXT NOT NULL, start_ts INTEGER NOT NULL,
+  end_ts INTEGER, notes TEXT);
+CREATE INDEX idx_sessions_start ON sessions(start_ts);
+CREATE TABLE audio_chunks (chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+  file_path TEXT NOT NULL, duration_sec INTEGER, created_ts INTEGER NOT NULL,
+  FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE);
+CREATE INDEX idx_chunks_session ON audio_chunks(session_id);
+CREATE TABLE transcripts (transcript_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+  chunk_id INTEGER, text TEXT NOT NULL, language TEXT, word_count INTEGER, created_ts INTEGER NOT NULL,
+  FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
+  FOREIGN KEY(chunk_id) REFERENCES audio_chunks(chunk_id) ON DELETE CASCADE);
+CREATE TABLE summaries (summary_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL UNIQUE,
+  summary_text TEXT NOT NULL, repetition_json TEXT, agitation_score REAL, mood_label TEXT, suggestions TEXT,
+  created_ts INTEGER NOT NULL, FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE);
+CREATE TABLE trend_cache (week_start_ts INTEGER PRIMARY KEY, top_phrase TEXT, top_phrase_count INTEGER,
+  avg_agitation REAL, med_given INTEGER);
+"""
+
+
+def _objects(path):
+    conn = sqlite3.connect(path)
+    names = {row for row in conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+    conn.close()
+    return names
+
+
+def _write(directory, name, content):
+    (directory / name).write_text(content)
+
+
+def test_new_database_is_stamped_current(temp_db):
+    """A database created from schema.sql records every migration and has nothing left to apply."""
+    with database.db_connection() as conn:
+        assert sorted(migrations.applied(conn)) == [m.version for m in migrations.discover()]
+        assert migrations.migrate(conn) == []
+        assert migrations.pending_backfills(conn) == []
+
+
+def test_legacy_database_migrates_to_current_schema(tmp_path):
+    """A pre-versioning database ends up with the same tables, indexes and triggers as a new one."""
+    fresh = tmp_path / "fresh.db"
+    legacy = tmp_path / "legacy.db"
+    conn = sqlite3.connect(legacy)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO sessions VALUES ('s1', 'freeform', 1000, NULL, 'Patient: Ann')")
+    conn.execute("INSERT INTO summaries (session_id, summary_text, created_ts) VALUES ('s1', 'Calm morning', 1000)")
+    conn.commit()
+    conn.close()
+
+    original_path = database.DB_PATH
+    try:
+        for path in (fresh, legacy):
+            database.DB_PATH = str(path)
+            database.init_database()
+        with database.db_connection() as conn:
+            pending = migrations.pending_backfills(conn)
+            assert [m.label for m in pending] == ["0003_session_list_backfill"]
+            assert migrations.run_backfill(conn, pending[0], pause_sec=0) is True
+            row = conn.execute("SELECT patient_id, summary_snippet FROM sessions").fetchone()
+            assert (row["patient_id"], row["summary_snippet"]) == ("Ann", "Calm morning")
+            assert migrations.status(conn)["pending_backfills"] == []
+    finally:
+        database.close_all_connections()
+        database.DB_PATH = original_path
+    assert _objects(legacy) == _objects(fresh)
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    """A migration that fails part way leaves neither its changes nor its version row."""
+    directory = tmp_path / "migrations"
+    directory.mkdir()
+    _write(directory, "0001_notes.sql", "CREATE TABLE notes (id INTEGER PRIMARY KEY);\n")
+    _write(directory, "0002_broken.sql",
+           "CREATE TABLE tags (id INTEGER PRIMARY KEY);\nINSERT INTO missing_table VALUES (1);\n")
+    conn = sqlite3.connect(tmp_path / "test.db")
+    conn.row_factory = sqlite3.Row
+
+    with pytest.raises(MigrationError, match="0002_broken"):
+        migrations.migrate(conn, migrations.discover(str(directory)))
+    assert sorted(migrations.applied(conn)) == [1]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "notes" in tables and "tags" not in tables
+    conn.close()
+
+
+def test_backfill_resumes_from_saved_position(tmp_path):
+    """A stopped backfill keeps its position and continues from it, one batch per transaction."""
+    directory = tmp_path / "migrations"
+    directory.mkdir()
+    _write(directory, "0001_items.sql", "CREATE TABLE items (id INTEGER PRIMARY KEY, doubled INTEGER);\n"
+                                        "INSERT INTO items (id) VALUES (1), (2), (3), (4), (5);\n")
+    _write(directory, "0002_double.py", '''
+def upgrade(conn):
+    conn.execute("CREATE INDEX idx_items_doubled ON items(doubled)")
+
+
+def backfill(conn, position, batch_size):
+    rows = conn.execute("SELECT id FROM items WHERE id > ? ORDER BY id LIMIT ?", (position, batch_size)).fetchall()
+    if not rows:
+        return None
+    conn.execute("UPDATE items SET doubled = id * 2 WHERE id > ? AND id <= ?", (position, rows[-1][0]))
+    return rows[-1][0]
+''')
+    found = migrations.discover(str(directory))
+    conn = sqlite3.connect(tmp_path / "test.db")
+    conn.row_factory = sqlite3.Row
+    assert migrations.migrate(conn, found) == ["0001_items", "0002_double"]
+    assert migrations.pending_backfills(conn, found) == [found[1]]
+
+    checks = []
+
+    def stop_after_one_batch():
+        checks.append(1)
+        return len(checks) > 1
+
+    assert migrations.run_backfill(conn, found[1], batch_size=2, pause_sec=0,
+                                   should_stop=stop_after_one_batch) is False
+    assert migrations.applied(conn)[2]["backfill_position"] == 2
+    assert migrations.run_backfill(conn, found[1], batch_size=2, pause_sec=0) is True
+    assert [row[0] for row in conn.execute("SELECT doubled FROM items ORDER BY id")] == [2, 4, 6, 8, 10]
+    assert migrations.pending_backfills(conn, found) == []
+    conn.close()
+
+
+def test_discover_rejects_bad_names_and_duplicate_versions(tmp_path):
+    _write(tmp_path, "0001_first.sql", "SELECT 1;\n")
+    _write(tmp_path, "0001_again.sql", "SELECT 1;\n")
+    with pytest.raises(MigrationError, match="already used"):
+        migrations.discover(str(tmp_path))
+    (tmp_path / "0001_again.sql").unlink()
+    _write(tmp_path, "add-index.sql", "SELECT 1;\n")
+    with pytest.raises(MigrationError, match="NNNN_description"):
+        migrations.discover(str(tmp_path))
+
+
+def test_split_statements_keeps_trigger_bodies_whole():
+    script = """-- comment
+CREATE TABLE a (x);
+CREATE TRIGGER a_ai AFTER INSERT ON a BEGIN
+  INSERT INTO a VALUES (1);
+END;
+-- trailing comment
+"""
+    statements = migrations.split_statements(script)
+    assert len(statements) == 2 and statements[1].endswith("END;")
+    with pytest.raises(MigrationError, match="incomplete"):
+        migrations.split_statements("CREATE TABLE b (x)")
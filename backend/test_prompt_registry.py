@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from llm_cache import template_hash
+from prompt_registry import PromptRegistry, PromptTemplateError, registry
+
+
+def _write(directory, name: str, template: str, mtime: float = None):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps({"session_type": name, "prompt_template": template}))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture()
+def prompts_dir(tmp_path):
+    _write(tmp_path, "default", "Summarize: {transcript}", mtime=1000)
+    _write(tmp_path, "meals_extract", "Extract {{\"a\": 1}} from {transcript}", mtime=1000)
+    _write(tmp_path, "meals_summary", "{extracted_data} {analyzed_data}", mtime=1000)
+    return tmp_path
+
+
+def test_shipped_templates_are_valid():
+    """Every template in backend/prompts passes placeholder validation."""
+    assert PromptRegistry(registry.prompts_dir).load_all() == []
+
+
+def test_loads_and_versions_templates(prompts_dir):
+    """Templates are served from memory with a content version matching the LLM cache hash."""
+    prompts = PromptRegistry(str(prompts_dir))
+    assert prompts.load_all() == []
+
+    assert prompts.template("default") == "Summarize: {transcript}"
+    assert prompts.versions()["default"] == template_hash("Summarize: {transcript}")[:12]
+    assert prompts.for_session_type("Unknown").name == "default"
+    with pytest.raises(PromptTemplateError):
+        prompts.get("../default")
+
+
+def test_rejects_mismatched_placeholders(prompts_dir):
+    """A stage template missing a placeholder, or using an unknown one, is rejected."""
+    _write(prompts_dir, "meals_analyze", "Analyze {transcript}")
+    prompts = PromptRegistry(str(prompts_dir))
+
+    errors = prompts.load_all()
+    assert len(errors) == 1 and "meals_analyze" in errors[0]
+    assert "meals_analyze" not in prompts.versions()
+    with pytest.raises(PromptTemplateError):
+        PromptRegistry(str(prompts_dir)).load_all(strict=True)
+
+
+def test_reloads_only_when_mtime_changes(prompts_dir):
+    """Edits are picked up by mtime; a broken edit keeps the last good version."""
+    prompts = PromptRegistry(str(prompts_dir), check_interval=0)
+    prompts.load_all()
+    first = prompts.get("default")
+
+    # Same mtime: content is not re-read
+    _write(prompts_dir, "default", "Changed: {transcript}", mtime=1000)
+    assert prompts.get("default") is first
+
+    _write(prompts_dir, "default", "Changed: {transcript}", mtime=2000)
+    assert prompts.template("default") == "Changed: {transcript}"
+    assert prompts.reloads == 1
+
+    _write(prompts_dir, "default", "Broken: {transcript", mtime=3000)
+    assert prompts.template("default") == "Changed: {transcript}"
+    assert "default" in prompts.status()["errors"]
@@ -0,0 +1,59 @@
+import json
+import subprocess
+import time
+
+import audio_decode
+import config
+import provision_whisper
+
+X86_CPUINFO = """processor\t: 0
+flags\t\t: fpu vme sse sse2 avx avx2 fma f16c avx512f avx512bw
+"""
+
+ARM_CPUINFO = """processor\t: 0
+Features\t: fp asimd evtstrm aes crc32
+"""
+
+
+def test_parse_cpu_features():
+    assert provision_whisper.parse_cpu_features(X86_CPUINFO) == {"avx", "avx2", "fma", "f16c", "avx512f"}
+    assert provision_whisper.parse_cpu_features(ARM_CPUINFO) == {"neon"}
+
+
+def test_build_variants_follow_cpu_features():
+    names = [name for name, _ in provision_whisper.build_variants({"avx", "avx2", "fma", "f16c", "avx512f"})]
+    assert names == ["native", "avx2", "avx512"]
+
+    names = [name for name, _ in provision_whisper.build_variants({"neon"}, blas=True)]
+    assert names == ["native", "native-blas"]
+
+    _, flags = provision_whisper.build_variants({"avx2", "fma", "f16c"}, blas=True)[-1]
+    assert "-DGGML_AVX2=ON" in flags and "-DGGML_BLAS=ON" in flags
+
+
+def test_benchmark_and_profile_pick_fastest(tmp_path):
+    clip = tmp_path / "clip.wav"
+    clip.write_bytes(audio_decode.pcm_to_wav(b"\0\0" * 16000 * 2))
+
+    def fake_run(cli_path, model_path, audio_path, language, threads=None):
+        # More threads is faster up to 4, then contention makes it slower
+        cost = {1: 0.04, 2: 0.02, 4: 0.01, 8: 0.015}[threads]
+        time.sleep(cost)
+        return subprocess.CompletedProcess(args=[], returncode=0, stdout="", stderr=""), "text"
+
+    results = provision_whisper.benchmark("cli", "model", [(str(clip), 2.0)], [1, 2, 4, 8], run=fake_run)
+    for row in results:
+        row.update(variant="avx2", build_dir="/b", cli_path="/b/bin/whisper-cli", server_path=None)
+    best = provision_whisper.pick_fastest(results + [{"variant": "avx512", "error": "build failed"}])
+    assert best["threads"] == 4
+
+    profile_path = tmp_path / "profile.json"
+    provision_whisper.write_profile(str(profile_path), best, {"avx2"}, results, "model", 1)
+    profile = json.loads(profile_path.read_text())
+    assert profile["cli_path"] == "/b/bin/whisper-cli"
+    assert profile["threads"] == 4
+    assert config.load_whisper_profile(str(profile_path))["variant"] == "avx2"
+
+
+def test_missing_profile_loads_empty(tmp_path):
+    assert config.load_whisper_profile(str(tmp_path / "missing.json")) == {}
@@ -0,0 +1,154 @@
+import inspect
+import random
+import re
+import sqlite3
+
+import pytest
+
+import crud
+import database
+import migrations
+
+# Plan steps that mean a query's cost grows with the table rather than the result. Ordered index
+# scans ("SCAN sessions USING INDEX ...") are allowed: the session list walks one and stops at LIMIT.
+_FULL_SCAN = re.compile(r"^SCAN \w+(?: AS \w+)?$")
+_TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+SESSIONS = 3000
+CHUNKS_PER_SESSION = 4
+
+
+@pytest.fixture(scope="module")
+def seeded_db(tmp_path_factory):
+    """A database large enough that a missing index would change the plan."""
+    original_path = database.DB_PATH
+    database.DB_PATH = str(tmp_path_factory.mktemp("plans") / "carelink_plans.db")
+    database.init_database()
+    rng = random.Random(3)
+    with database.db_cursor() as cursor:
+        for i in range(SESSIONS):
+            session_id = f"session-{i:05d}"
+            ts = 1700000000000 + i * 3600000
+            cursor.execute(
+                "INSERT INTO sessions (session_id, session_type, start_ts, patient_id) VALUES (?, ?, ?, ?)",
+                (session_id, rng.choice(("freeform", "medication", "sundowning")), ts, f"patient-{i % 40}"))
+            for n in range(CHUNKS_PER_SESSION):
+                cursor.execute(
+                    "INSERT INTO audio_chunks (session_id, file_path, duration_sec, created_ts) VALUES (?, ?, ?, ?)",
+                    (session_id, f"rec/{session_id}-{n}.wav", 15, ts + n))
+                cursor.execute(
+                    "INSERT INTO transcripts (session_id, chunk_id, text, created_ts) VALUES (?, ?, ?, ?)",
+                    (session_id, cursor.lastrowid, f"chunk {n} of session {i}", ts + n))
+            if i % 3:
+                cursor.execute(
+                    "INSERT INTO summaries (session_id, summary_text, repetition_json, agitation_score, created_ts) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, f"summary {i}", '[{"phrase": "home", "count": 2}]', rng.random() * 10, ts))
+    yield database.DB_PATH
+    database.close_all_connections()
+    database.DB_PATH = original_path
+
+
+def _exercise_crud():
+    """Call every crud function the way the routes do; crud.py queries only run from here."""
+    session_id = crud.create_session("medication", 1700000000000 + 5 * 3600000, "patient-7")
+    crud.get_session(session_id)
+    crud.update_session_end(session_id, 1700000000000 + 6 * 3600000, notes="done")
+    chunk_id = crud.insert_audio_chunk(session_id, "rec/new.wav", 30)
+    transcript_id = crud.insert_transcript(session_id, "where is my coat", chunk_id=chunk_id)
+    crud.update_transcript_text(transcript_id, "where is my blue coat")
+    crud.insert_summary(session_id, "asked about her coat", [{"phrase": "coat", "count": 2}], 3.0, "calm")
+    crud.insert_summary(session_id, "asked about her coat twice", replace=True)
+    crud.insert_chain_stage_result(session_id, "medication", "extract", {"medications": []}, 12)
+    crud.get_session_detail("session-01500")
+    crud.get_session_transcripts("session-01500")
+
+    page, cursor = crud.get_sessions_list(limit=50)
+    crud.get_sessions_list(limit=50, cursor=cursor)
+    crud.get_sessions_list(limit=50, session_type="sundowning", cursor=cursor)
+    crud.get_sessions_list(limit=50, patient_id="patient-3", start_ts=1700000000000, end_ts=1800000000000)
+    crud.get_sessions_list(limit=50, session_type="freeform", start_ts=1700000000000)
+    crud.encode_cursor(page[-1].start_ts, page[-1].session_id)
+    crud.decode_cursor(cursor)
+    crud.delete_session(session_id)
+
+
+def _traced_statements():
+    statements = []
+    conn = database.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        _exercise_crud()
+    finally:
+        conn.set_trace_callback(None)
+    # Triggers fired along the way are traced only as "-- TRIGGER name" lines; _trigger_statements plans their bodies
+    return [s for s in statements if re.match(r"\s*(SELECT|UPDATE|DELETE|INSERT)", s, re.IGNORECASE)]
+
+
+def _trigger_statements(conn):
+    """(trigger, statement) for each statement in a trigger body, with NEW./OLD. columns as parameters."""
+    statements = []
+    for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name"):
+        body = sql[re.search(r"\bBEGIN\b", sql, re.IGNORECASE).end():sql.rindex("END")]
+        for statement in migrations.split_statements(body):
+            statements.append((name, re.sub(r"\b(?:new|old)\.\w+", "?", statement, flags=re.IGNORECASE)))
+    return statements
+
+
+def _plan_problems(conn, statement):
+    problems = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", [None] * statement.count("?")):
+        detail = row[3]
+        if _FULL_SCAN.search(detail) or _TEMP_SORT.search(detail):
+            problems.append(f"{detail}  <-  {' '.join(statement.split())[:160]}")
+    return problems
+
+
+def test_every_crud_function_is_exercised():
+    """New crud functions must be added to _exercise_crud so their queries get plan-checked."""
+    source = inspect.getsource(_exercise_crud)
+    public = [name for name, func in inspect.getmembers(crud, inspect.isfunction)
+              if func.__module__ == "crud" and not name.startswith("_")]
+    assert [name for name in public if f"crud.{name}(" not in source] == []
+
+
+def test_crud_queries_use_indexes(seeded_db):
+    """No crud query scans a whole table or sorts in a temp B-tree."""
+    conn = sqlite3.connect(seeded_db)
+    problems = []
+    for statement in _traced_statements():
+        problems.extend(_plan_problems(conn, statement))
+    conn.close()
+    assert problems == []
+
+
+def test_trigger_bodies_use_indexes(seeded_db):
+    """Every statement a trigger runs (e.g. summaries_fts_bi's lookup by session_id) is index-driven."""
+    conn = sqlite3.connect(seeded_db)
+    statements = _trigger_statements(conn)
+    assert any(name == "summaries_fts_bi" and "FROM summaries WHERE session_id = ?" in statement
+               for name, statement in statements)
+    problems = []
+    for name, statement in statements:
+        problems.extend(f"{name}: {problem}" for problem in _plan_problems(conn, statement))
+    conn.close()
+    assert problems == []
+
+
+def test_foreign_keys_are_indexed(seeded_db):
+    """Every child column of a foreign key leads an index, so cascading deletes never scan."""
+    conn = sqlite3.connect(seeded_db)
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%'")]
+    missing = []
+    for table in tables:
+        leading = set()
+        for index in conn.execute(f"PRAGMA index_list({table})"):
+            columns = list(conn.execute(f"PRAGMA index_info({index[1]})"))
+            if columns:
+                leading.add(columns[0][2])
+        for fk in conn.execute(f"PRAGMA foreign_key_list({table})"):
+            if fk[3] not in leading:
+                missing.append(f"{table}.{fk[3]} -> {fk[2]}")
+    conn.close()
+    assert missing == []
@@ -2,9 +2,9 @@ import pytest
 import json
 import time
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from .main import app
-from . import database
+import database
 import os
 
 client = TestClient(app)
@@ -18,8 +18,10 @@ def setup_test_db():
     database.init_database()
     yield
     # Cleanup
-    if os.path.exists("test_carelink.db"):
-        os.remove("test_carelink.db")
+    database.close_all_connections()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("test_carelink.db" + suffix):
+            os.remove("test_carelink.db" + suffix)
 
 
 def test_root_endpoint():
@@ -49,17 +51,20 @@ def test_start_session():
     return data["session_id"]
 
 
-@patch('subprocess.run')
-def test_transcribe_mock(mock_subprocess):
+@patch('whisper_utils.run_measured')
+def test_transcribe_mock(mock_run):
     """Test transcription with mocked whisper.cpp."""
     # Setup mock
-    mock_subprocess.return_value = MagicMock(returncode=0, stderr="")
+    mock_run.return_value = MagicMock(returncode=0, stderr="", seconds=0.5, peak_rss_bytes=None)
 
     # Create a session first
     session_id = test_start_session()
 
-    # Mock file existence
-    with patch('os.path.exists', return_value=True), \
+    # Mock a resolved whisper setup and file existence
+    ready_setup = {"state": "ready", "binary_path": "/fake/whisper-cli",
+                   "model_path": "/fake/ggml-base.en.bin", "error": None}
+    with patch.dict('whisper_utils._setup', ready_setup), \
+            patch('os.path.exists', return_value=True), \
             patch('builtins.open', create=True) as mock_open:
         mock_open.return_value.__enter__.return_value.read.return_value = "This is a test transcript."
 
@@ -73,22 +78,17 @@ def test_transcribe_mock(mock_subprocess):
         assert "transcript" in data
 
 
-@patch('requests.post')
-def test_summarize_mock(mock_requests):
+@patch('llm_client.OllamaClient.generate', new_callable=AsyncMock)
+def test_summarize_mock(mock_generate):
     """Test summarization with mocked Ollama API."""
     # Setup mock
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {
-        "response": json.dumps({
-            "summary": "Test summary",
-            "repetition_json": [{"phrase": "test", "count": 2}],
-            "agitation_score": 3.0,
-            "mood_label": "calm",
-            "suggestions": "Test suggestions"
-        })
-    }
-    mock_requests.return_value = mock_response
+    mock_generate.return_value = json.dumps({
+        "summary": "Test summary",
+        "repetition_json": [{"phrase": "test", "count": 2}],
+        "agitation_score": 3.0,
+        "mood_label": "calm",
+        "suggestions": "Test suggestions"
+    })
 
     # Create a session first
     session_id = test_start_session()
@@ -106,6 +106,484 @@ def test_summarize_mock(mock_requests):
     assert "mood_label" in data
 
 
+@patch('routes.audio.transcribe_audio_bytes', return_value=" Queued transcript. ")
+def test_record_audio_job(mock_transcribe):
+    """Test that uploads return a job id and the transcript is available via polling."""
+    response = client.post(
+        "/api/record-audio",
+        files={"audio": ("recording.wav", b"RIFF0000WAVE", "audio/wav")},
+        data={"session_type": "conversation"}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(50):
+        job = client.get(f"/api/record-audio/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "completed"
+    assert job["result"]["transcript"] == "Queued transcript."
+    session_id = job["result"]["metadata"]["session_id"]
+    assert client.get(f"/api/session/{session_id}").status_code == 200
+
+    os.remove(os.path.join("recordings", job["result"]["metadata"]["audio_file"]))
+
+
+@patch('routes.audio.transcribe_audio_bytes', return_value="Duplicate upload transcript.")
+def test_record_audio_duplicate_upload_uses_cache(mock_transcribe):
+    """Test that re-uploading identical audio returns the stored transcript without whisper."""
+    audio_bytes = b"RIFF1234WAVEduplicate"
+    results = []
+    for _ in range(2):
+        response = client.post(
+            "/api/record-audio",
+            files={"audio": ("recording.wav", audio_bytes, "audio/wav")},
+            data={"session_type": "conversation"}
+        )
+        job_id = response.json()["job_id"]
+        for _ in range(50):
+            job = client.get(f"/api/record-audio/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.05)
+        assert job["status"] == "completed"
+        results.append(job["result"])
+        os.remove(os.path.join("recordings", job["result"]["metadata"]["audio_file"]))
+
+    assert [r["transcript"] for r in results] == ["Duplicate upload transcript."] * 2
+    assert mock_transcribe.call_count == 1
+
+
+@patch('routes.audio.transcribe_audio_bytes', return_value="Decoded in memory.")
+@patch('audio_decode.decode_to_pcm', return_value=b"\x00\x00" * 1600)
+def test_record_audio_webm_without_archive(mock_decode, mock_transcribe):
+    """Test that WebM uploads are decoded in memory and nothing is written when archival is off."""
+    before = set(os.listdir("recordings"))
+    with patch('config.CARELINK_ARCHIVE_RECORDINGS', False):
+        response = client.post(
+            "/api/record-audio",
+            files={"audio": ("recording.webm", b"\x1aE\xdf\xa3webm-no-archive", "audio/webm")},
+            data={"session_type": "conversation"}
+        )
+    job_id = response.json()["job_id"]
+    for _ in range(50):
+        job = client.get(f"/api/record-audio/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "completed"
+    assert job["result"]["transcript"] == "Decoded in memory."
+    assert job["result"]["metadata"]["audio_file"] is None
+    assert mock_decode.call_count == 1
+    assert mock_transcribe.call_args[0][0].startswith(b"RIFF")
+    assert set(os.listdir("recordings")) == before
+
+
+def _second_words(wav_bytes, model_path=None):
+    """Fake whisper: one word per second of audio, named after the sample value."""
+    import struct
+    import audio_decode
+    pcm = audio_decode.wav_pcm(wav_bytes)
+    samples_per_sec = audio_decode.WHISPER_SAMPLE_RATE * 2
+    return " ".join(
+        f"w{struct.unpack('<h', pcm[i:i + 2])[0]}" for i in range(0, len(pcm), samples_per_sec))
+
+
+@patch('routes.audio.transcribe_audio_bytes', side_effect=_second_words)
+def test_record_audio_long_recording_is_chunked(mock_transcribe):
+    """Test that long recordings are transcribed as stored, stitched chunks."""
+    import io
+    import struct
+    import wave
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"".join(struct.pack("<h", n) * 16000 for n in range(70)))
+
+    response = client.post(
+        "/api/record-audio",
+        files={"audio": ("long.wav", buffer.getvalue(), "audio/wav")},
+        data={"session_type": "conversation"}
+    )
+    job_id = response.json()["job_id"]
+    for _ in range(100):
+        job = client.get(f"/api/record-audio/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "completed", job
+    assert job["result"]["transcript"] == " ".join(f"w{n}" for n in range(70))
+    assert mock_transcribe.call_count == 3
+
+    session_id = job["result"]["metadata"]["session_id"]
+    detail = client.get(f"/api/session/{session_id}").json()
+    chunk_rows = [t for t in detail["transcripts"] if t["chunk_id"] is not None]
+    assert len(chunk_rows) == 3
+    assert len(detail["audio_chunks"]) == 3
+
+    os.remove(os.path.join("recordings", job["result"]["metadata"]["audio_file"]))
+
+
+def test_record_audio_failed_chunk_fails_job_and_is_not_cached():
+    """A chunk whisper-cli fails on fails the whole job instead of caching a transcript with a gap."""
+    import io
+    import struct
+    import wave
+    import config
+    import transcription_cache
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"".join(struct.pack("<h", n) * 16000 for n in range(100, 170)))
+    recording = buffer.getvalue()
+
+    def fake_cli(cmd, input):
+        words = _second_words(input)
+        if "w140" in words.split():
+            return MagicMock(returncode=1, stdout=b"", stderr=b"failed to decode", seconds=0.1, peak_rss_bytes=None)
+        return MagicMock(returncode=0, stdout=words.encode(), stderr=b"", seconds=0.1, peak_rss_bytes=None)
+
+    with patch('transcribe.pool_for', return_value=None), patch('transcribe.get_whisper_binary', return_value="whisper-cli"), \
+            patch('transcribe.run_measured', side_effect=fake_cli), \
+            patch('config.CARELINK_TWO_TIER_TRANSCRIPTION', False), patch('config.CARELINK_ARCHIVE_RECORDINGS', False):
+        job_id = client.post(
+            "/api/record-audio",
+            files={"audio": ("long.wav", recording, "audio/wav")},
+            data={"session_type": "conversation"}
+        ).json()["job_id"]
+        for _ in range(100):
+            job = client.get(f"/api/record-audio/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.05)
+
+    assert job["status"] == "failed", job
+    assert "failed to decode" in job["error"]
+    model = transcription_cache.model_name(config.CARELINK_WHISPER_MODEL_PATH)
+    assert transcription_cache.cache.get(transcription_cache.audio_hash(recording), model, "en") is None
+
+
+@patch('routes.live.transcribe_audio_bytes', side_effect=_second_words)
+def test_live_transcribe_websocket(mock_transcribe):
+    """Test that live PCM frames produce final segments, stored chunks and a stitched transcript."""
+    import struct
+    with patch('config.CARELINK_LIVE_WINDOW_SEC', 4), patch('config.CARELINK_CHUNK_OVERLAP_SEC', 1), \
+            patch('config.CARELINK_ARCHIVE_RECORDINGS', False):
+        with client.websocket_connect("/api/live-transcribe?session_type=conversation") as ws:
+            session = ws.receive_json()
+            assert session["type"] == "session"
+            for n in range(10):
+                ws.send_bytes(struct.pack("<h", n) * 16000)
+            ws.send_text(json.dumps({"type": "stop"}))
+
+            messages = []
+            while True:
+                message = ws.receive_json()
+                messages.append(message)
+                if message["type"] in ("done", "error"):
+                    break
+
+    done = messages[-1]
+    assert done["type"] == "done", done
+    assert done["transcript"] == " ".join(f"w{n}" for n in range(10))
+    finals = [m for m in messages if m["type"] == "final"]
+    assert [m["chunk_index"] for m in finals] == [0, 1, 2]
+
+    detail = client.get(f"/api/session/{session['session_id']}").json()
+    assert len(detail["audio_chunks"]) == 3
+    assert detail["end_ts"] is not None
+
+
+def _run_live_session(frames):
+    """Send PCM frames then stop; returns the session message and the last message."""
+    with client.websocket_connect("/api/live-transcribe?session_type=conversation") as ws:
+        session = ws.receive_json()
+        for frame in frames:
+            ws.send_bytes(frame)
+        ws.send_text(json.dumps({"type": "stop"}))
+        while True:
+            message = ws.receive_json()
+            if message["type"] in ("done", "error"):
+                return session, message
+
+
+def _session_exists(session_id):
+    with database.db_cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.fetchone() is not None
+
+
+def test_live_transcribe_without_audio_leaves_nothing(tmp_path):
+    """A live session stopped before any audio keeps neither its row nor an empty archive."""
+    with patch('config.CARELINK_ARCHIVE_RECORDINGS', True), patch('routes.live.RECORDINGS_DIR', str(tmp_path)):
+        session, done = _run_live_session([])
+    assert done["type"] == "done"
+    assert not _session_exists(session["session_id"])
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch('routes.live.transcribe_audio_bytes', side_effect=RuntimeError("whisper crashed"))
+def test_live_transcribe_failure_discards_session(mock_transcribe, tmp_path):
+    """A live session that fails part way is deleted together with its archived audio."""
+    with patch('config.CARELINK_LIVE_WINDOW_SEC', 4), patch('config.CARELINK_CHUNK_OVERLAP_SEC', 1), \
+            patch('config.CARELINK_ARCHIVE_RECORDINGS', True), patch('routes.live.RECORDINGS_DIR', str(tmp_path)):
+        session, error = _run_live_session([b"\1\0" * 16000] * 5)
+    assert error["type"] == "error"
+    assert "whisper crashed" in error["detail"]
+    assert not _session_exists(session["session_id"])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_live_transcribe_rejects_unknown_encoding():
+    """Test that unsupported encodings are refused."""
+    with client.websocket_connect("/api/live-transcribe?encoding=mp3") as ws:
+        message = ws.receive_json()
+    assert message["type"] == "error"
+
+
+def _slow_final(wav_bytes, model_path=None):
+    time.sleep(0.3)
+    return "The accurate final transcript."
+
+
+@patch('routes.audio.transcribe_audio_bytes', side_effect=_slow_final)
+@patch('routes.audio.transcribe_preview_bytes', return_value=" the quick draft ")
+def test_record_audio_two_tier_preview_then_final(mock_preview, mock_final):
+    """Test that a preview is published first and then replaced by the final transcript."""
+    response = client.post(
+        "/api/record-audio",
+        files={"audio": ("recording.wav", b"RIFF0000WAVEtwo-tier", "audio/wav")},
+        data={"session_type": "conversation"}
+    )
+    job_id = response.json()["job_id"]
+
+    seen = []
+    for _ in range(100):
+        job = client.get(f"/api/record-audio/{job_id}").json()
+        if job["result"]:
+            seen.append(job["result"]["transcript_status"])
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.02)
+
+    assert seen[0] == "preview"
+    assert job["status"] == "completed"
+    assert job["result"]["transcript_status"] == "final"
+    assert job["result"]["transcript"] == "The accurate final transcript."
+
+    session_id = job["result"]["metadata"]["session_id"]
+    detail = client.get(f"/api/session/{session_id}").json()
+    assert [t["text"] for t in detail["transcripts"]] == ["The accurate final transcript."]
+    assert detail["transcripts"][0]["transcript_id"] == job["result"]["transcript_id"]
+
+    os.remove(os.path.join("recordings", job["result"]["metadata"]["audio_file"]))
+
+
+@patch('routes.audio.transcribe_audio_bytes', side_effect=_slow_final)
+@patch('routes.audio.transcribe_preview_bytes', return_value="the quick draft")
+def test_record_audio_events_stream_preview_and_final(mock_preview, mock_final):
+    """Test that the events stream notifies the client of the preview and the upgrade."""
+    response = client.post(
+        "/api/record-audio",
+        files={"audio": ("recording.wav", b"RIFF0000WAVEevents", "audio/wav")},
+        data={"session_type": "conversation"}
+    )
+    job_id = response.json()["job_id"]
+
+    events = []
+    with client.stream("GET", f"/api/record-audio/{job_id}/events") as stream:
+        for line in stream.iter_lines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+            elif line.startswith("data: ") and events[-1] in ("preview", "final"):
+                data = json.loads(line[len("data: "):])
+                if events[-1] == "final":
+                    final = data
+
+    assert "preview" in events
+    assert events[-1] == "final"
+    assert events.index("preview") < events.index("final")
+    assert final["transcript"] == "The accurate final transcript."
+
+    os.remove(os.path.join("recordings", final["metadata"]["audio_file"]))
+
+
+def test_record_audio_final_not_delayed_by_preview():
+    """The accurate pass starts without waiting for the preview, which only covers the first window."""
+    import audio_decode
+    import whisper_models
+    preview_audio = []
+
+    def slow_preview(wav_bytes):
+        preview_audio.append(whisper_models.wav_seconds(wav_bytes))
+        time.sleep(1.5)
+        return "a late draft"
+
+    recording = audio_decode.pcm_to_wav(b"\0\0" * 16000 * 5)
+    with patch('routes.audio.transcribe_preview_bytes', side_effect=slow_preview), \
+            patch('routes.audio.transcribe_audio_bytes', return_value="final words"), \
+            patch('config.CARELINK_CHUNK_WINDOW_SEC', 2), patch('config.CARELINK_CHUNK_OVERLAP_SEC', 0):
+        started = time.monotonic()
+        job_id = client.post(
+            "/api/record-audio",
+            files={"audio": ("recording.wav", recording, "audio/wav")},
+            data={"session_type": "conversation"}
+        ).json()["job_id"]
+        for _ in range(100):
+            job = client.get(f"/api/record-audio/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.02)
+        elapsed = time.monotonic() - started
+
+    assert job["status"] == "completed"
+    assert elapsed < 1.0
+    assert preview_audio == [2.0]
+
+    # The preview finishing afterwards neither stores a row nor replaces the final result
+    time.sleep(1.7)
+    job = client.get(f"/api/record-audio/{job_id}").json()
+    assert job["result"]["transcript_status"] == "final"
+    session_id = job["result"]["metadata"]["session_id"]
+    detail = client.get(f"/api/session/{session_id}").json()
+    assert "a late draft" not in [t["text"] for t in detail["transcripts"]]
+
+    os.remove(os.path.join("recordings", job["result"]["metadata"]["audio_file"]))
+
+
+def test_record_audio_job_not_found():
+    """Test polling an unknown job."""
+    response = client.get("/api/record-audio/does-not-exist")
+    assert response.status_code == 404
+
+
+@patch('llm_client.OllamaClient.generate', new_callable=AsyncMock)
+def test_chain_run_pipeline(mock_generate):
+    """Test that /api/{chain}/run streams every stage and stores the summary."""
+    mock_generate.side_effect = [
+        json.dumps({"medication_events": [], "repeated_questions": ["What time is it?"]}),
+        json.dumps({"compliance": "good"}),
+        json.dumps({
+            "summary": "Pipeline summary",
+            "tone": "calm",
+            "repeated_questions": ["What time is it?"],
+            "key_moments": [],
+            "tags": ["cooperative"],
+            "agitation_score": 1.5,
+            "mood_label": "calm"
+        })
+    ]
+    session_id = test_start_session()
+
+    response = client.post("/api/medication/run", json={
+        "session_id": session_id,
+        "transcript": "Caregiver: time for your pills."
+    })
+
+    assert response.status_code == 200
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["stage", "stage", "stage", "done"]
+
+    detail = client.get(f"/api/session/{session_id}").json()
+    assert detail["summary"]["summary_text"] == "Pipeline summary"
+
+    with database.db_cursor() as cursor:
+        cursor.execute(
+            "SELECT stage FROM chain_stage_results WHERE session_id = ? ORDER BY result_id", (session_id,))
+        assert sorted(row[0] for row in cursor.fetchall()) == ["analyze", "extract", "summarize"]
+
+
+def test_chain_run_unknown_chain():
+    """Test that an unknown chain name is rejected."""
+    response = client.post("/api/unknown/run", json={"session_id": "x", "transcript": "t"})
+    assert response.status_code == 404
+
+
+def test_summarize_stream():
+    """Test that ?stream=true forwards tokens and then the stored result."""
+    completion = json.dumps({
+        "summary": "Streamed summary",
+        "repetition_json": [],
+        "agitation_score": 1.0,
+        "mood_label": "calm"
+    })
+
+    async def fake_stream(self, prompt, **kwargs):
+        for i in range(0, len(completion), 10):
+            yield completion[i:i + 10]
+
+    session_id = test_start_session()
+    with patch('llm_client.OllamaClient.stream_generate', fake_stream):
+        response = client.post("/api/summarize?stream=true", json={
+            "session_id": session_id,
+            "transcript": "This is a test transcript for streamed summarization.",
+            "session_type": "conversation"
+        })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[0] == "token"
+    assert events[-1] == "result"
+
+    detail = client.get(f"/api/session/{session_id}").json()
+    assert detail["summary"]["summary_text"] == "Streamed summary"
+
+
+def test_process_session_stream_stores_fallback_on_error():
+    """A streamed /process-session whose LLM call fails still stores the fallback analysis."""
+    from fastapi import HTTPException as FastAPIHTTPException
+
+    async def failing_stream(self, prompt, **kwargs):
+        raise FastAPIHTTPException(status_code=503, detail="Cannot connect to Ollama API.")
+        yield
+
+    session_id = test_start_session()
+    with patch('llm_client.OllamaClient.stream_generate', failing_stream):
+        response = client.post("/api/process-session?stream=true&bypass_cache=true", json={
+            "transcript": "A transcript whose streamed analysis fails.",
+            "metadata": {"session_id": session_id, "session_type": "conversation"}
+        })
+
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["result"]
+    detail = client.get(f"/api/session/{session_id}").json()
+    assert detail["summary"]["summary_text"].startswith("Transcription completed but AI analysis failed")
+
+
+@patch('llm_client.OllamaClient.generate', new_callable=AsyncMock)
+def test_summarize_uses_llm_cache(mock_generate):
+    """Test that repeat summaries are served from the cache unless bypassed."""
+    mock_generate.return_value = json.dumps({
+        "summary": "Cached summary",
+        "repetition_json": [],
+        "agitation_score": 0.5,
+        "mood_label": "calm"
+    })
+    request_body = {
+        "transcript": "A transcript that is summarized more than once.",
+        "session_type": "conversation"
+    }
+
+    for _ in range(2):
+        response = client.post("/api/summarize", json={"session_id": test_start_session(), **request_body})
+        assert response.status_code == 200
+    assert mock_generate.call_count == 1
+
+    response = client.post("/api/summarize?bypass_cache=true",
+                           json={"session_id": test_start_session(), **request_body})
+    assert response.status_code == 200
+    assert mock_generate.call_count == 2
+
+
 def test_store_session():
     """Test storing/finalizing a session."""
     # Create a session first
@@ -185,3 +663,63 @@ def test_cascade_delete():
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+def test_whisper_models_endpoints():
+    """Models are listed with stats; unknown names are rejected for selection and uploads."""
+    response = client.get("/api/whisper/models")
+    assert response.status_code == 200
+    assert {"models", "selection", "engine_model"} <= set(response.json())
+
+    response = client.put("/api/whisper/models/selection",
+                          json={"session_types": {"meals": "no-such-model"}})
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/record-audio",
+        files={"audio": ("recording.wav", b"RIFF0000WAVE", "audio/wav")},
+        data={"session_type": "conversation", "model": "no-such-model"}
+    )
+    assert response.status_code == 400
+
+
+def test_batch_summarize_routes():
+    """A batch matching no sessions completes immediately; unknown batches are 404."""
+    response = client.post("/api/batch/summarize", json={"session_type": "no-such-type"})
+    assert response.status_code == 202
+    batch = response.json()
+    assert batch["status"] == "completed" and batch["total"] == 0
+
+    assert client.get(f"/api/batch/summarize/{batch['batch_id']}").json()["batch_id"] == batch["batch_id"]
+    assert client.post(f"/api/batch/summarize/{batch['batch_id']}/cancel").status_code == 409
+    assert client.get("/api/batch/summarize/missing").status_code == 404
+    assert client.post("/api/batch/summarize", json={"start_ts": 5, "end_ts": 5}).status_code == 400
+
+
+def test_trends_route():
+    """Weekly trends are served from trend_cache; inverted ranges are rejected."""
+    response = client.get("/api/trends?weeks=4")
+    assert response.status_code == 200
+    assert isinstance(response.json()["weeks"], list)
+    assert client.get("/api/trends?start_ts=10&end_ts=5").status_code == 400
+
+
+def test_search_route():
+    """Search validates its query and returns paginated results."""
+    response = client.get("/api/search", params={"q": "zzzunlikelyword", "limit": 5})
+    assert response.status_code == 200
+    assert response.json()["total"] == 0 and response.json()["limit"] == 5
+    assert client.get("/api/search", params={"q": "?!"}).status_code == 400
+    assert client.get("/api/search", params={"q": "x", "scope": "audio"}).status_code == 422
+
+
+def test_get_sessions_list_cursor():
+    """next_cursor pages through sessions; a malformed cursor or an offset is a 400."""
+    for _ in range(3):
+        test_start_session()
+    first = client.get("/api/sessions", params={"limit": 2}).json()
+    assert len(first["sessions"]) == 2 and first["next_cursor"]
+    second = client.get("/api/sessions", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert not {s["session_id"] for s in first["sessions"]} & {s["session_id"] for s in second["sessions"]}
+    assert client.get("/api/sessions", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/api/sessions", params={"offset": 50}).status_code == 400
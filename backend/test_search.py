@@ -0,0 +1,102 @@
+import pytest
+
+import crud
+import search
+from database import db_cursor
+from search import SearchQueryError
+
+
+def _session(transcripts, summary=None, session_type="freeform", start_ts=1000) -> str:
+    session_id = crud.create_session(session_type, start_ts)
+    for text in transcripts:
+        crud.insert_transcript(session_id, text)
+    if summary:
+        crud.insert_summary(session_id, summary)
+    return session_id
+
+
+def test_build_match_query_quotes_words():
+    assert search.build_match_query("her husband?") == '"her" "husband"'
+    assert search.build_match_query('NOT "x" OR hus*') == '"NOT" "x" "OR" "hus"*'
+    with pytest.raises(SearchQueryError):
+        search.build_match_query("?!")
+
+
+def test_ranked_snippets_and_pagination(temp_db):
+    """Stemmed matches from both sources, best first, highlighted and paginated."""
+    once = _session(["She talked about the garden and her husband."])
+    often = _session(["Husband, husband: she keeps asking where her husband is."],
+                     summary="Asked repeatedly about her husband.", session_type="sundowning")
+    _session(["Breakfast was quiet."])
+
+    page = search.search("asking husband")
+    assert page["total"] == 1
+    assert [r["session_id"] for r in page["results"]] == [often]
+    assert page["results"][0]["source"] in ("transcripts", "summaries")
+    assert "<mark>husband</mark>" in page["results"][0]["snippet"]
+
+    page = search.search("husband")
+    assert page["total"] == 2 and [r["session_id"] for r in page["results"]] == [often, once]
+    assert search.search("husband", limit=1, offset=1)["results"][0]["session_id"] == once
+    assert search.search("husband", scopes=["summaries"])["total"] == 1
+    assert search.search("husband", session_type="freeform")["total"] == 1
+    assert search.search('husband NOT garden', raw=True)["total"] == 1
+    with pytest.raises(SearchQueryError):
+        search.search('"unbalanced', raw=True)
+
+
+def test_chunked_session_is_one_result(temp_db):
+    """Chunk rows and the stitched full row of one session give a single hit, counted once."""
+    session_id = crud.create_session("freeform", 1000)
+    for text in ("where is my husband", "he went to the garden"):
+        crud.insert_transcript(session_id, text, chunk_id=crud.insert_audio_chunk(session_id, "rec.wav#t=0,30"))
+    full_id = crud.insert_transcript(session_id, "where is my husband he went to the garden")
+    other = _session(["Her husband phoned."])
+
+    page = search.search("husband", scopes=["transcripts"])
+    assert page["total"] == 2
+    assert sorted(r["session_id"] for r in page["results"]) == sorted([session_id, other])
+    assert search.search("husband garden")["results"][0]["id"] == full_id
+
+
+def test_triggers_keep_index_in_sync(temp_db):
+    """Edits, summary replacement and cascading deletes are reflected in the index."""
+    session_id = _session(["Asked for tea."], summary="Wanted tea.")
+    transcript_id = crud.get_session_transcripts(session_id)[0].transcript_id
+
+    crud.update_transcript_text(transcript_id, "Asked for coffee.")
+    assert search.search("tea", scopes=["transcripts"])["total"] == 0
+    assert search.search("coffee")["total"] == 1
+
+    crud.insert_summary(session_id, "Wanted biscuits.", replace=True)
+    assert search.search("tea")["total"] == 0
+    assert search.search("biscuits")["total"] == 1
+
+    crud.delete_session(session_id)
+    assert search.search("coffee OR biscuits", raw=True)["total"] == 0
+    with db_cursor() as cursor:
+        for fts in ("transcripts_fts", "summaries_fts"):
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('integrity-check')")
+
+
+def test_ensure_index_rebuilds_missing_rows(temp_db):
+    """Rows that predate the FTS tables are indexed once at startup."""
+    _session(["Looked for her keys."])
+    with db_cursor() as cursor:
+        cursor.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('delete-all')")
+    assert search.search("keys")["total"] == 0
+
+    assert search.ensure_index() == ["transcripts"]
+    assert search.search("keys")["total"] == 1
+    assert search.ensure_index() == []
+
+
+def test_paging_past_sessions_with_many_matching_rows(temp_db):
+    """Sessions are still found when better sessions have more matching rows than one lookup batch."""
+    busy = _session([f"Husband, husband, husband: visit {n}." for n in range(10)], session_type="sundowning")
+    quiet = _session(["The nurse mentioned her husband once during a long and otherwise calm afternoon."])
+
+    page = search.search("husband", scopes=["transcripts"], limit=1, offset=1)
+    assert page["total"] == 2 and [r["session_id"] for r in page["results"]] == [quiet]
+    assert [r["session_id"] for r in search.search("husband", limit=1)["results"]] == [busy]
+    assert [r["session_id"] for r in search.search("husband", session_type="freeform", limit=1)["results"]] == [quiet]
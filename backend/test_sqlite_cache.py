@@ -0,0 +1,27 @@
+import time
+
+from transcription_cache import TranscriptionCache
+
+
+def test_transcription_cache_lru_and_stats(temp_db):
+    """The transcript cache shares the LLM cache's LRU trimming and counters, without a TTL."""
+    cache = TranscriptionCache(max_entries=2, evict_every=3)
+    for i in range(3):
+        cache.put(f"audio-{i}", "ggml-base.en.bin", "en", f"transcript {i}")
+        time.sleep(0.002)
+        if i == 1:
+            # Touch the first entry so the second becomes least recently used
+            assert cache.get("audio-0", "ggml-base.en.bin", "en") == "transcript 0"
+
+    assert cache.get("audio-1", "ggml-base.en.bin", "en") is None
+    assert cache.get("audio-2", "ggml-base.en.bin", "en") == "transcript 2"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 2, 1)
+    assert "ttl_sec" not in stats
+
+
+def test_disabled_transcription_cache_stores_nothing(temp_db):
+    cache = TranscriptionCache(max_entries=10, enabled=False)
+    cache.put("audio", "ggml-base.en.bin", "en", "transcript")
+    assert cache.get("audio", "ggml-base.en.bin", "en") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,62 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+import llm_client
+from models import SessionSummaryOutput
+from structured_output import StructuredOutput, StructuredOutputError, extract_json
+
+SUMMARY = StructuredOutput.from_model(SessionSummaryOutput)
+VALID = {"summary": "Calm afternoon", "repetition_json": [{"phrase": "where is Tom", "count": 3}],
+         "agitation_score": 2.5, "mood_label": "calm", "suggestions": "Keep routine"}
+
+
+def test_extracts_json_from_noisy_completions():
+    """Fences, prose around the object, trailing commas and truncation are recovered."""
+    text = json.dumps(VALID)
+    assert extract_json(text) == VALID
+    assert extract_json(f"Here you go:\n```json\n{text}\n```\nHope this helps!") == VALID
+    assert extract_json(f"Summary below {text} -- end") == VALID
+    assert extract_json('{"summary": "a", "tags": ["x", "y",],}') == {"summary": "a", "tags": ["x", "y"]}
+    assert extract_json('{"summary": "cut off mid sen') == {"summary": "cut off mid sen"}
+    assert extract_json('{"summary": "a", "mood_label":') == {"summary": "a"}
+    assert extract_json("no json here") is None
+
+
+def test_validates_against_the_pydantic_schema():
+    """The schema sent to Ollama comes from the model; replies are validated and defaulted."""
+    assert SUMMARY.schema["required"] == ["summary"]
+    parsed = SUMMARY.parse('{"summary": "ok", "repetition_json": ["again"]}')
+    assert parsed["mood_label"] == "unknown" and parsed["agitation_score"] == 0.0
+    with pytest.raises(StructuredOutputError):
+        SUMMARY.parse('{"mood_label": "calm"}')
+    with pytest.raises(StructuredOutputError):
+        SUMMARY.parse('{"summary": "ok", "agitation_score": "very"}')
+    with pytest.raises(StructuredOutputError):
+        SUMMARY.parse("no json here")
+
+
+def test_generate_structured_repairs_once():
+    """An invalid completion triggers one schema-constrained repair call, then gives up."""
+    calls = []
+
+    async def fake_generate(prompt, request=None, **options):
+        calls.append(options)
+        return '{"mood_label": "calm"}' if len(calls) == 1 else json.dumps(VALID)
+
+    with patch("llm_client.ollama.generate", fake_generate), patch("llm_client.cache.enabled", False):
+        parsed = asyncio.run(llm_client.generate_structured("{transcript}", {"transcript": "t"}, SUMMARY))
+    assert parsed["summary"] == "Calm afternoon"
+    assert len(calls) == 2 and all(call["format"] == SUMMARY.schema for call in calls)
+
+    async def always_broken(prompt, request=None, **options):
+        calls.append(options)
+        return "still broken"
+
+    calls.clear()
+    with patch("llm_client.ollama.generate", always_broken), patch("llm_client.cache.enabled", False):
+        with pytest.raises(StructuredOutputError):
+            asyncio.run(llm_client.generate_structured("{transcript}", {"transcript": "t"}, SUMMARY))
+    assert len(calls) == 2
@@ -0,0 +1,53 @@
+
+import crud
+import trends
+from database import db_cursor
+
+WEEK = trends.WEEK_MS
+# Monday 2024-01-01 00:00 UTC
+MONDAY = 1704067200000
+
+
+def _summarized(start_ts: int, phrases, agitation: float, session_type: str = "freeform") -> str:
+    session_id = crud.create_session(session_type, start_ts)
+    crud.insert_summary(session_id, "summary", repetition_json=phrases, agitation_score=agitation)
+    return session_id
+
+
+def test_week_start_is_monday_utc():
+    assert trends.week_start(MONDAY) == MONDAY
+    assert trends.week_start(MONDAY + WEEK - 1) == MONDAY
+    assert trends.week_start(MONDAY - 1) == MONDAY - WEEK
+
+
+def test_rollup_follows_summary_writes(temp_db):
+    """Inserting, replacing and deleting summaries keeps only the affected week's row current."""
+    first = _summarized(MONDAY + 1000, [{"phrase": "Where is Tom?", "count": 3}, "lunch"], 2.0)
+    _summarized(MONDAY + 2 * trends.DAY_MS, [{"phrase": "where is tom?", "count": 2}], 4.0, "medication")
+    _summarized(MONDAY + WEEK, [], 1.0)
+
+    week = trends.get_trends(start_ts=MONDAY, end_ts=MONDAY + WEEK)
+    assert len(week) == 1
+    assert week[0]["summary_count"] == 2 and week[0]["avg_agitation"] == 3.0 and week[0]["med_given"] == 1
+    assert (week[0]["top_phrase"], week[0]["top_phrase_count"]) == ("Where is Tom?", 5)
+    assert week[0]["phrases"][1] == {"phrase": "lunch", "count": 1}
+
+    crud.insert_summary(first, "redone", repetition_json=[{"phrase": "lunch", "count": 9}],
+                        agitation_score=6.0, replace=True)
+    week = trends.get_trends(start_ts=MONDAY, end_ts=MONDAY + WEEK)[0]
+    assert (week["top_phrase"], week["top_phrase_count"], week["avg_agitation"]) == ("lunch", 9, 5.0)
+
+    assert [w["week_start_ts"] for w in trends.get_trends()] == [MONDAY + WEEK, MONDAY]
+    crud.delete_session(first)
+    assert trends.get_trends(start_ts=MONDAY, end_ts=MONDAY + WEEK)[0]["summary_count"] == 1
+
+
+def test_rebuild_backfills_existing_summaries(temp_db):
+    """Summaries written before the cache was maintained are rolled up once at startup."""
+    _summarized(MONDAY, [{"phrase": "home", "count": 2}], 1.0)
+    with db_cursor() as cursor:
+        cursor.execute("DELETE FROM trend_cache")
+
+    assert trends.rebuild(only_if_empty=True) == 1
+    assert trends.rebuild(only_if_empty=True) == 0
+    assert trends.get_trends()[0]["top_phrase"] == "home"
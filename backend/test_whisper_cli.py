@@ -0,0 +1,89 @@
+import os
+import stat
+import sys
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import whisper_utils
+
+# Stand-in for whisper-cli: writes "<audio contents>" to <--output-file>.txt
+# after a random delay, so overlapping runs would clobber a shared output path.
+STUB_CLI = textwrap.dedent("""\
+    #!{python}
+    import random, sys, time
+    args = sys.argv[1:]
+    audio = args[args.index("--file") + 1]
+    output = args[args.index("--output-file") + 1]
+    time.sleep(random.uniform(0.01, 0.1))
+    with open(audio) as f:
+        text = f.read()
+    with open(output + ".txt", "w") as f:
+        f.write(text)
+""")
+
+
+@pytest.fixture()
+def stub_cli(tmp_path):
+    path = tmp_path / "whisper-cli"
+    path.write_text(STUB_CLI.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    model = tmp_path / "ggml-stub.bin"
+    model.write_bytes(b"")
+    return str(path), str(model)
+
+
+def _audio_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"clip_{i}.wav"
+        path.write_text(f"transcript number {i}")
+        paths.append(str(path))
+    return paths
+
+
+def test_concurrent_cli_runs_keep_their_own_output(stub_cli, tmp_path, monkeypatch):
+    """Many simultaneous transcriptions each get back their own text."""
+    cli, model = stub_cli
+    monkeypatch.chdir(tmp_path)
+    audio_paths = _audio_files(tmp_path, 40)
+
+    with patch("whisper_utils.get_whisper_binary", return_value=cli), \
+            patch("whisper_utils.get_model_path", return_value=model), \
+            patch("whisper_utils.transcribe_with_engine", return_value=None):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(whisper_utils.transcribe_audio_file, audio_paths))
+
+    assert results == [f"transcript number {i}" for i in range(40)]
+    assert not os.path.exists(tmp_path / "output.txt")
+
+
+def test_cli_failure_is_reported(tmp_path):
+    """A non-zero exit surfaces as an HTTP 500 rather than stale output."""
+    failing = tmp_path / "whisper-cli"
+    failing.write_text(f"#!{sys.executable}\nimport sys\nsys.exit(3)\n")
+    failing.chmod(failing.stat().st_mode | stat.S_IEXEC)
+    audio = _audio_files(tmp_path, 1)[0]
+
+    with patch("whisper_utils.get_whisper_binary", return_value=str(failing)), \
+            patch("whisper_utils.get_model_path", return_value=str(tmp_path / "model.bin")), \
+            patch("whisper_utils.transcribe_with_engine", return_value=None):
+        with pytest.raises(whisper_utils.HTTPException) as exc:
+            whisper_utils.transcribe_audio_file(audio)
+    assert exc.value.status_code == 500
+
+
+def test_engine_silence_is_not_a_failure(tmp_path):
+    """An empty transcript from the engine is returned and recorded, not retried on the CLI."""
+    audio = _audio_files(tmp_path, 1)[0]
+    pool = MagicMock(**{"last_request_seconds.return_value": 0.2, "peak_rss_bytes.return_value": 1024})
+    runs = []
+
+    with patch("whisper_utils.pool_for", return_value=pool), \
+            patch("whisper_utils.transcribe_with_engine", return_value=""), \
+            patch("whisper_utils.run_whisper_cli") as cli:
+        assert whisper_utils.transcribe_audio_file(audio, on_run=lambda *run: runs.append(run)) == ""
+    cli.assert_not_called()
+    assert runs == [(0.2, 1024)]
@@ -0,0 +1,179 @@
+import os
+import stat
+import sys
+import textwrap
+import time
+import pytest
+import whisper_engine
+
+
+STUB_SERVER = textwrap.dedent('''\
+    #!{python}
+    """Stand-in for whisper.cpp's whisper-server: answers every inference with fixed text."""
+    import json, sys
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    port = int(sys.argv[sys.argv.index("--port") + 1])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({{"text": " stub transcript "}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+''')
+
+
+@pytest.fixture()
+def stub_binary(tmp_path):
+    """Write an executable stub whisper-server script."""
+    path = tmp_path / "whisper-server"
+    path.write_text(STUB_SERVER.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.fixture()
+def engine(stub_binary, tmp_path):
+    """Start an engine against the stub and stop it afterwards."""
+    engine = whisper_engine.WhisperServerEngine(port=18178, startup_timeout=15)
+    engine.start(stub_binary, str(tmp_path / "ggml-stub.bin"))
+    yield engine
+    engine.stop()
+
+
+def test_engine_starts_and_warms_up(engine):
+    """The engine reports ready with load and warm-up timings after start()."""
+    status = engine.status()
+    assert status["state"] == whisper_engine.READY
+    assert status["load_seconds"] is not None
+    assert status["warmup_seconds"] is not None
+
+
+def test_engine_transcribes(engine, tmp_path):
+    """Transcriptions go to the resident server rather than a new process."""
+    audio_path = tmp_path / "clip.wav"
+    audio_path.write_bytes(whisper_engine._silent_wav(0.1))
+
+    assert engine.transcribe(str(audio_path)) == "stub transcript"
+    assert engine.status()["requests_served"] == 1
+
+
+def test_engine_transcribes_in_memory_audio(engine):
+    """In-memory WAV bytes are posted without a temporary file."""
+    assert engine.transcribe_bytes(whisper_engine._silent_wav(0.1)) == "stub transcript"
+    assert engine.status()["requests_served"] == 1
+
+
+def test_engine_pool_serves_concurrent_requests(stub_binary, tmp_path):
+    """A pool hands each concurrent request its own idle instance."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = whisper_engine.WhisperEnginePool(size=2, port=18180, startup_timeout=15)
+    pool.start(stub_binary, str(tmp_path / "ggml-stub.bin"))
+    try:
+        audio = whisper_engine._silent_wav(0.1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            texts = list(executor.map(lambda _: pool.transcribe_bytes(audio), range(6)))
+        assert texts == ["stub transcript"] * 6
+        status = pool.status()
+        assert status["ready_instances"] == 2
+        assert sum(i["requests_served"] for i in status["instances"]) == 6
+    finally:
+        pool.stop()
+
+
+def test_engine_pool_reload_during_inflight_request(stub_binary, tmp_path):
+    """
+    A reload hands the restarted instance to requests already waiting, and the
+    request in flight across the reload does not queue the instance a second time.
+    """
+    import threading
+
+    pool = whisper_engine.WhisperEnginePool(size=1, port=18182, startup_timeout=15, request_timeout=60)
+    pool.start(stub_binary, str(tmp_path / "ggml-stub.bin"))
+    instance = pool.engines[0]
+    serve = instance.transcribe_bytes
+    in_flight, finish = threading.Event(), threading.Event()
+
+    def slow_first_request(wav_bytes, language="en"):
+        if not in_flight.is_set():
+            in_flight.set()
+            finish.wait(10)
+            return "first"
+        return serve(wav_bytes, language)
+
+    instance.transcribe_bytes = slow_first_request
+    audio = whisper_engine._silent_wav(0.1)
+    results = {}
+    first = threading.Thread(target=lambda: results.update(first=pool.transcribe_bytes(audio)))
+    waiting = threading.Thread(target=lambda: results.update(waiting=pool.transcribe_bytes(audio)))
+    try:
+        first.start()
+        assert in_flight.wait(5)
+        waiting.start()
+        pool.stop()
+        pool.start(stub_binary, str(tmp_path / "ggml-stub.bin"))
+
+        waiting.join(10)
+        assert results.get("waiting") == "stub transcript"
+        finish.set()
+        first.join(10)
+        assert results["first"] == "first"
+        assert list(pool._idle) == [instance]
+    finally:
+        finish.set()
+        pool.stop()
+
+
+def test_engine_pool_times_requests_after_borrow(stub_binary, tmp_path):
+    """last_request_seconds covers the inference only, not the wait for an idle instance."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = whisper_engine.WhisperEnginePool(size=1, port=18183, startup_timeout=15)
+    pool.start(stub_binary, str(tmp_path / "ggml-stub.bin"))
+    instance = pool.engines[0]
+    serve = instance.transcribe_bytes
+
+    def slow(wav_bytes, language="en"):
+        time.sleep(0.3)
+        return serve(wav_bytes, language)
+
+    instance.transcribe_bytes = slow
+    audio = whisper_engine._silent_wav(0.1)
+
+    def timed(_):
+        started = time.monotonic()
+        pool.transcribe_bytes(audio)
+        return time.monotonic() - started, pool.last_request_seconds()
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            timings = list(executor.map(timed, range(2)))
+        # One request queued behind the other, but both report only their own inference time
+        assert max(total for total, _ in timings) >= 0.55
+        assert all(0.3 <= seconds < 0.5 for _, seconds in timings)
+    finally:
+        pool.stop()
+
+
+def test_engine_missing_binary_fails(tmp_path):
+    """A missing server binary leaves the engine in the failed state."""
+    engine = whisper_engine.WhisperServerEngine(port=18179, startup_timeout=1)
+    with pytest.raises(whisper_engine.WhisperEngineError):
+        engine.start(str(tmp_path / "nope"), str(tmp_path / "ggml-stub.bin"))
+    assert engine.status()["state"] == whisper_engine.FAILED
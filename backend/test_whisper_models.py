@@ -0,0 +1,136 @@
+import io
+import wave
+
+import pytest
+
+from whisper_models import ModelRegistry, UnknownModelError, model_name, parse_session_models, wav_seconds
+
+
+def _model_file(directory, name: str) -> str:
+    path = directory / f"ggml-{name}.bin"
+    path.write_bytes(b"lmgg" + b"\x00" * 16)
+    return str(path)
+
+
+@pytest.fixture()
+def models_dir(tmp_path):
+    directory = tmp_path / "models"
+    directory.mkdir()
+    for name in ("base.en", "base.en-q5_0", "base.en-q8_0", "tiny.en"):
+        _model_file(directory, name)
+    return directory
+
+
+def _registry(models_dir, session_models=None) -> ModelRegistry:
+    return ModelRegistry(str(models_dir), str(models_dir / "ggml-base.en.bin"), session_models)
+
+
+def test_model_name_and_session_mapping():
+    """File names map to registry names; the env mapping ignores malformed items."""
+    assert model_name("/m/ggml-base.en-q5_0.bin") == "base.en-q5_0"
+    assert parse_session_models("sundowning=base.en, meals = tiny.en ,bogus,=x") == {
+        "sundowning": "base.en", "meals": "tiny.en"}
+
+
+def test_lists_quantized_variants(temp_db, models_dir):
+    """Every ggml file is listed with its family and quantization."""
+    models = {m["name"]: m for m in _registry(models_dir).list_models()}
+
+    assert set(models) == {"base.en", "base.en-q5_0", "base.en-q8_0", "tiny.en"}
+    assert models["base.en-q5_0"]["family"] == "base.en"
+    assert models["base.en-q5_0"]["quantization"] == "q5_0"
+    assert models["base.en"]["quantization"] == "f16"
+    assert models["tiny.en"]["stats"] is None
+
+
+def test_select_precedence(temp_db, models_dir):
+    """Explicit request beats session type, which beats the default selection."""
+    registry = _registry(models_dir, {"meals": "tiny.en"})
+
+    assert registry.select()["name"] == "base.en"
+    assert registry.select(session_type="meals")["name"] == "tiny.en"
+    assert registry.select("base.en-q8_0", "meals")["name"] == "base.en-q8_0"
+
+    registry.set_selection("default", "base.en-q5_0")
+    assert registry.select(session_type="freeform")["name"] == "base.en-q5_0"
+    assert registry.select(session_type="meals")["name"] == "tiny.en"
+
+    with pytest.raises(UnknownModelError):
+        registry.select("large-v3")
+
+
+def test_selection_persists_and_clears(temp_db, models_dir):
+    """Runtime choices survive a new registry; clearing restores the env mapping."""
+    _registry(models_dir, {"meals": "tiny.en"}).set_selection("meals", "base.en-q5_0")
+
+    registry = _registry(models_dir, {"meals": "tiny.en"})
+    assert registry.select(session_type="meals")["name"] == "base.en-q5_0"
+
+    registry.set_selection("meals", None)
+    assert registry.select(session_type="meals")["name"] == "tiny.en"
+
+
+def test_record_run_reports_rtf_and_peak_memory(temp_db, models_dir):
+    """Runs accumulate into a real-time factor; peak memory keeps the maximum."""
+    registry = _registry(models_dir)
+    path = str(models_dir / "ggml-base.en-q5_0.bin")
+    registry.record_run(path, audio_seconds=10.0, processing_seconds=2.0, peak_rss_bytes=200)
+    registry.record_run(path, audio_seconds=30.0, processing_seconds=4.0, peak_rss_bytes=100)
+
+    stats = {m["name"]: m["stats"] for m in registry.list_models()}["base.en-q5_0"]
+    assert stats["runs"] == 2
+    assert stats["audio_seconds"] == 40.0
+    assert stats["real_time_factor"] == 0.15
+    assert stats["peak_rss_bytes"] == 200
+
+
+def test_cli_runs_record_their_own_peak_memory(temp_db, models_dir):
+    """A small run after a large one records its own peak, not the largest child's; failures are skipped."""
+    import sys
+    from unittest.mock import patch
+
+    import transcribe
+    from whisper_engine import _silent_wav
+    from whisper_utils import run_measured
+
+    # Children hold their peak briefly, as whisper holds its model until it exits
+    big = run_measured([sys.executable, "-c", "import time; b = bytearray(200 * 1024 * 1024); "
+                                              "b[::4096] = b'x' * len(b[::4096]); time.sleep(0.2)"])
+    # Memory the parent had touched before the fork must not count towards the child
+    inherited = bytearray(300 * 1024 * 1024)
+    inherited[::4096] = b"x" * len(inherited[::4096])
+    small = run_measured([sys.executable, "-c", "import time; time.sleep(0.1)"])
+    del inherited
+    assert big.returncode == 0 and small.returncode == 0
+    assert big.peak_rss_bytes > 200 * 1024 * 1024
+    assert small.peak_rss_bytes < 100 * 1024 * 1024
+
+    registry = _registry(models_dir)
+    path = str(models_dir / "ggml-tiny.en.bin")
+    audio = _silent_wav(1.0)
+    cli = [sys.executable, "-c", "import sys; sys.stdin.buffer.read(); print('hello')"]
+    with patch("transcribe.registry", registry), patch("transcribe.get_whisper_binary", return_value=cli[0]), \
+            patch("transcribe.run_measured", side_effect=lambda cmd, input: run_measured(cli, input=input)):
+        assert transcribe._cli_transcribe_bytes(audio, path).strip() == "hello"
+    stats = {m["name"]: m["stats"] for m in registry.list_models()}["tiny.en"]
+    assert stats["runs"] == 1 and stats["peak_rss_bytes"] < big.peak_rss_bytes / 2
+
+    failing = [sys.executable, "-c", "import sys; sys.exit(3)"]
+    with patch("transcribe.registry", registry), patch("transcribe.get_whisper_binary", return_value=cli[0]), \
+            patch("transcribe.run_measured", side_effect=lambda cmd, input: run_measured(failing, input=input)):
+        with pytest.raises(transcribe.TranscriptionError, match="code 3"):
+            transcribe._cli_transcribe_bytes(audio, path)
+    assert {m["name"]: m["stats"] for m in registry.list_models()}["tiny.en"]["runs"] == 1
+
+
+def test_wav_seconds():
+    """Duration comes from the WAV header; unreadable audio counts as zero."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\x00\x00" * 8000)
+
+    assert wav_seconds(buffer.getvalue()) == 0.5
+    assert wav_seconds(b"not audio") == 0.0
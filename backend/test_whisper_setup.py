@@ -0,0 +1,83 @@
+import stat
+from unittest.mock import patch
+
+import pytest
+
+import whisper_utils
+
+
+@pytest.fixture()
+def whisper_dir(tmp_path):
+    """A fake whisper.cpp checkout with built binaries and a ggml model."""
+    bin_dir = tmp_path / "build" / "bin"
+    bin_dir.mkdir(parents=True)
+    for name in ("whisper-cli", "whisper-server"):
+        binary = bin_dir / name
+        binary.write_text("#!/bin/sh\n")
+        binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "ggml-base.en.bin").write_bytes(b"lmgg" + b"\0" * 16)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def fresh_setup():
+    with patch.dict(whisper_utils._setup, {"state": whisper_utils.UNRESOLVED}):
+        yield
+
+
+def _configure(whisper_dir, **overrides):
+    settings = {
+        "CARELINK_WHISPER_DIR": str(whisper_dir),
+        "CARELINK_WHISPER_CLI_PATH": "",
+        "CARELINK_WHISPER_SERVER_PATH": "",
+        "CARELINK_WHISPER_MODEL_PATH": str(whisper_dir / "models" / "ggml-base.en.bin"),
+    }
+    settings.update(overrides)
+    return patch.multiple("config", **settings)
+
+
+def test_resolves_once_and_serves_from_cache(whisper_dir):
+    with _configure(whisper_dir):
+        setup = whisper_utils.resolve_whisper_setup()
+        assert setup["state"] == whisper_utils.READY
+        assert setup["binary_path"].endswith("whisper-cli")
+        assert setup["server_binary_path"].endswith("whisper-server")
+
+        # The hot path never touches the filesystem after startup
+        with patch("whisper_utils.os.path.isfile", side_effect=AssertionError("probed")), \
+                patch("whisper_utils.os.makedirs", side_effect=AssertionError("probed")):
+            assert whisper_utils.get_whisper_binary() == setup["binary_path"]
+            assert whisper_utils.get_model_path() == setup["model_path"]
+            assert whisper_utils.ensure_whisper_setup() == (setup["binary_path"], setup["model_path"])
+
+
+def test_missing_binary_fails_fast_without_building(whisper_dir):
+    (whisper_dir / "build" / "bin" / "whisper-cli").unlink()
+    with _configure(whisper_dir), patch("whisper_utils.subprocess.check_call") as build:
+        setup = whisper_utils.resolve_whisper_setup()
+        assert setup["state"] == whisper_utils.FAILED
+        assert "whisper-cli not found" in setup["error"]
+        with pytest.raises(whisper_utils.HTTPException) as exc:
+            whisper_utils.get_whisper_binary()
+    assert exc.value.status_code == 503
+    build.assert_not_called()
+
+
+def test_invalid_model_is_rejected(whisper_dir):
+    (whisper_dir / "models" / "ggml-base.en.bin").write_text("<html>404</html>")
+    with _configure(whisper_dir):
+        setup = whisper_utils.resolve_whisper_setup()
+    assert setup["state"] == whisper_utils.FAILED
+    assert "not a ggml model" in setup["error"]
+
+
+def test_configured_paths_override_detection(whisper_dir, tmp_path_factory):
+    elsewhere = tmp_path_factory.mktemp("custom")
+    cli = elsewhere / "my-whisper"
+    cli.write_text("#!/bin/sh\n")
+    cli.chmod(cli.stat().st_mode | stat.S_IEXEC)
+    with _configure(whisper_dir, CARELINK_WHISPER_CLI_PATH=str(cli)):
+        setup = whisper_utils.resolve_whisper_setup()
+    assert setup["binary_path"] == str(cli)
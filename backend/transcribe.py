@@ -1,31 +1,88 @@
 from pathlib import Path
+import logging
 import subprocess
 import sys
 
-WHISPER_BINARY = Path(__file__).parents[1] / "whisper.cpp" / "build" / "bin" / "whisper-cli"
-MODEL_PATH     = Path(__file__).parents[1] / "whisper.cpp" / "models" / "ggml-base.en.bin"
+from typing import Optional
+
+from whisper_engine import transcribe_with_engine, transcribe_bytes_with_engine, preview_engine, pool_for
+from whisper_utils import get_whisper_binary, get_model_path, get_preview_model_path, run_measured
+from whisper_models import registry
+import config
+
+logger = logging.getLogger(__name__)
+
+# Configured model; identifies transcripts in the cache without touching disk
+MODEL_PATH = Path(config.CARELINK_WHISPER_MODEL_PATH)
+
+class TranscriptionError(RuntimeError):
+    """Raised when whisper-cli exits with an error, so no partial transcript is stored or cached."""
+
+def _cli_failed(returncode: int, stderr: str):
+    logger.error(f"Whisper failed (exit {returncode}): {stderr.strip()}")
+    raise TranscriptionError(f"whisper-cli exited with code {returncode}: {stderr.strip()[-500:]}")
 
 def transcribe_audio(audio_path: str) -> str:
     # Convert string path to Path object
     audio_path = Path(audio_path)
     
     assert audio_path.exists(), f"File not found: {audio_path}"
-    assert WHISPER_BINARY.exists(), "Whisper binary not built!"
-    assert MODEL_PATH.exists(), "Model not downloaded!"
 
+    # Resident engine keeps the model loaded; fall back to a one-off CLI run
+    transcript = transcribe_with_engine(str(audio_path))
+    if transcript is not None:
+        return transcript
+
+    # Paths were resolved and validated once at startup
     result = subprocess.run([
-        str(WHISPER_BINARY),
-        "-m", str(MODEL_PATH),
+        get_whisper_binary(),
+        "-m", get_model_path(),
+        "-t", str(config.CARELINK_WHISPER_THREADS),
         "-f", str(audio_path)
     ], capture_output=True, text=True)
 
     if result.returncode != 0:
-        print("Whisper failed:")
-        print(result.stderr)
-        return ""
+        _cli_failed(result.returncode, result.stderr)
 
     return result.stdout
 
+def _cli_transcribe_bytes(wav_bytes: bytes, model_path: str) -> str:
+    # whisper-cli reads the audio from stdin when given "-f -"
+    result = run_measured([
+        get_whisper_binary(),
+        "-m", model_path,
+        "-t", str(config.CARELINK_WHISPER_THREADS),
+        "-nt",
+        "-f", "-"
+    ], input=wav_bytes)
+
+    if result.returncode != 0:
+        _cli_failed(result.returncode, result.stderr.decode("utf-8", errors="replace"))
+
+    # Failed runs are not recorded; this child's own peak memory, not every child's
+    registry.record_transcription(model_path, wav_bytes, result.seconds, result.peak_rss_bytes)
+    return result.stdout.decode("utf-8", errors="replace")
+
+def _engine_or_cli_bytes(wav_bytes: bytes, model_path: str, pool) -> str:
+    transcript = transcribe_bytes_with_engine(wav_bytes, pool=pool) if pool is not None else None
+    if transcript is None:
+        return _cli_transcribe_bytes(wav_bytes, model_path)
+    # Timed from when an instance was free, so queueing at peak load does not inflate the RTF
+    registry.record_transcription(model_path, wav_bytes, pool.last_request_seconds(), pool.peak_rss_bytes())
+    return transcript
+
+def transcribe_audio_bytes(wav_bytes: bytes, model_path: Optional[str] = None) -> str:
+    """Transcribe in-memory WAV audio without writing it to disk."""
+    model_path = model_path or get_model_path()
+    return _engine_or_cli_bytes(wav_bytes, model_path, pool_for(model_path))
+
+def transcribe_preview_bytes(wav_bytes: bytes) -> Optional[str]:
+    """Quick transcript from the small preview model, or None if none is configured."""
+    preview_model_path = get_preview_model_path()
+    if not preview_model_path:
+        return None
+    return _engine_or_cli_bytes(wav_bytes, preview_model_path, preview_engine)
+
 # --- CLI usage ---
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -0,0 +1,66 @@
+"""
+Transcript cache keyed by audio content.
+Duplicate uploads (same bytes, same whisper model, same language) return the
+stored transcript instead of running whisper again.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Optional
+
+import config
+from sqlite_cache import SQLiteLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def audio_hash(data: bytes) -> str:
+    """sha256 of raw audio bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """sha256 of an audio file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_name(model_path) -> str:
+    """Identify a whisper model by file name (e.g. ggml-base.en.bin)."""
+    return os.path.basename(str(model_path))
+
+
+class TranscriptionCache(SQLiteLRUCache):
+    """SQLite-backed audio-hash -> transcript cache with LRU trimming."""
+
+    table = "transcription_cache"
+
+    def make_key(self, audio_sha256: str, model: str, language: str) -> str:
+        return hashlib.sha256(f"{audio_sha256}\0{model}\0{language}".encode("utf-8")).hexdigest()
+
+    def get(self, audio_sha256: str, model: str, language: str) -> Optional[str]:
+        """Return the cached transcript for this audio, or None."""
+        if not self.enabled:
+            return None
+        text = self._lookup(self.make_key(audio_sha256, model, language), "text")
+        if text is not None:
+            logger.info(f"Transcript cache hit for audio {audio_sha256[:12]} ({model}, {language})")
+        return text
+
+    def put(self, audio_sha256: str, model: str, language: str, text: str):
+        """Remember the transcript produced for this audio."""
+        if not self.enabled or not text:
+            return
+        self._store({"cache_key": self.make_key(audio_sha256, model, language),
+                     "audio_sha256": audio_sha256, "model": model, "language": language, "text": text})
+
+
+# Process-wide cache consulted by /api/transcribe and /api/record-audio
+cache = TranscriptionCache(
+    max_entries=config.CARELINK_TRANSCRIPT_CACHE_MAX_ENTRIES,
+    enabled=config.CARELINK_TRANSCRIPT_CACHE_ENABLED,
+)
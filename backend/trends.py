@@ -0,0 +1,146 @@
+"""
+Weekly trend rollups.
+trend_cache holds one row per week (Monday 00:00 UTC, by session start):
+summary count, average agitation, medication sessions and the most
+repeated phrases from repetition_json. Writers call record_summary in the
+same transaction as the summary write, which recomputes only that week, so
+reading trends costs the same however much history has accumulated.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from database import db_cursor
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 3600 * 1000
+WEEK_MS = 7 * DAY_MS
+# 1970-01-01 was a Thursday; the first Monday is four days later
+_MONDAY_OFFSET_MS = 4 * DAY_MS
+# Phrases kept per week in phrases_json
+TOP_PHRASES = 10
+
+
+def week_start(ts_ms: int) -> int:
+    """Start (Monday 00:00 UTC, epoch ms) of the week containing ts_ms."""
+    return (ts_ms - _MONDAY_OFFSET_MS) // WEEK_MS * WEEK_MS + _MONDAY_OFFSET_MS
+
+
+def count_phrases(repetition_json: Optional[str], counts: Dict[str, list]):
+    """Add one summary's repetition_json ([{"phrase", "count"}] or [str]) into counts."""
+    if not repetition_json:
+        return
+    try:
+        items = json.loads(repetition_json)
+    except ValueError:
+        return
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict):
+            phrase, count = item.get("phrase"), item.get("count", 1)
+        else:
+            phrase, count = item, 1
+        if not isinstance(phrase, str) or not phrase.strip():
+            continue
+        try:
+            count = max(1, int(count))
+        except (TypeError, ValueError):
+            count = 1
+        # Group case-insensitively, keep the first spelling seen
+        entry = counts.setdefault(phrase.strip().casefold(), [phrase.strip(), 0])
+        entry[1] += count
+
+
+def refresh_week(cursor: sqlite3.Cursor, week_start_ts: int):
+    """Recompute one week's rollup from its summaries (removing it if none are left)."""
+    cursor.execute(
+        """SELECT s.session_type, m.agitation_score, m.repetition_json
+           FROM sessions s JOIN summaries m ON m.session_id = s.session_id
+           WHERE s.start_ts >= ? AND s.start_ts < ?""",
+        (week_start_ts, week_start_ts + WEEK_MS)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.execute("DELETE FROM trend_cache WHERE week_start_ts = ?", (week_start_ts,))
+        return
+
+    counts: Dict[str, list] = {}
+    scores = []
+    med_given = 0
+    for row in rows:
+        count_phrases(row["repetition_json"], counts)
+        if row["agitation_score"] is not None:
+            scores.append(row["agitation_score"])
+        if (row["session_type"] or "").lower() == "medication":
+            med_given += 1
+
+    phrases = sorted(counts.values(), key=lambda entry: (-entry[1], entry[0].casefold()))[:TOP_PHRASES]
+    top_phrase, top_count = phrases[0] if phrases else (None, None)
+    cursor.execute(
+        """INSERT OR REPLACE INTO trend_cache (week_start_ts, top_phrase, top_phrase_count, avg_agitation,
+           med_given, summary_count, phrases_json, updated_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (week_start_ts, top_phrase, top_count, sum(scores) / len(scores) if scores else None, med_given,
+         len(rows), json.dumps([{"phrase": p, "count": c} for p, c in phrases]), int(time.time() * 1000))
+    )
+
+
+def record_summary(cursor: sqlite3.Cursor, session_id: str):
+    """Update the rollup for the week of a session whose summary was just written or removed."""
+    cursor.execute("SELECT start_ts FROM sessions WHERE session_id = ?", (session_id,))
+    row = cursor.fetchone()
+    if row is not None:
+        refresh_week(cursor, week_start(row["start_ts"]))
+
+
+def rebuild(only_if_empty: bool = False) -> int:
+    """Recompute every week that has summaries; returns the number of weeks written."""
+    with db_cursor() as cursor:
+        if only_if_empty:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM trend_cache)")
+            if cursor.fetchone()[0]:
+                return 0
+        cursor.execute(
+            "SELECT DISTINCT s.start_ts FROM sessions s JOIN summaries m ON m.session_id = s.session_id")
+        weeks = sorted({week_start(row["start_ts"]) for row in cursor.fetchall()})
+        cursor.execute("DELETE FROM trend_cache")
+        for week in weeks:
+            refresh_week(cursor, week)
+    if weeks:
+        logger.info(f"Rebuilt trend_cache: {len(weeks)} weeks")
+    return len(weeks)
+
+
+def get_trends(start_ts: Optional[int] = None, end_ts: Optional[int] = None, limit: int = 12) -> List[dict]:
+    """Cached weekly rollups, most recent first, for weeks starting in [start_ts, end_ts)."""
+    clauses, params = [], []
+    if start_ts is not None:
+        clauses.append("week_start_ts >= ?")
+        params.append(week_start(start_ts))
+    if end_ts is not None:
+        clauses.append("week_start_ts < ?")
+        params.append(end_ts)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with db_cursor() as cursor:
+        cursor.execute(
+            f"""SELECT week_start_ts, top_phrase, top_phrase_count, avg_agitation, med_given,
+                summary_count, phrases_json, updated_ts
+                FROM trend_cache {where} ORDER BY week_start_ts DESC LIMIT ?""",
+            (*params, limit)
+        )
+        return [
+            {
+                "week_start_ts": row["week_start_ts"],
+                "summary_count": row["summary_count"],
+                "avg_agitation": row["avg_agitation"],
+                "med_given": row["med_given"],
+                "top_phrase": row["top_phrase"],
+                "top_phrase_count": row["top_phrase_count"],
+                "phrases": json.loads(row["phrases_json"]) if row["phrases_json"] else [],
+                "updated_ts": row["updated_ts"],
+            }
+            for row in cursor.fetchall()
+        ]
@@ -0,0 +1,428 @@
+"""
+Resident whisper.cpp transcription engine.
+Keeps a whisper-server process running with the model loaded once, so each
+transcription is a local HTTP call instead of a fresh whisper-cli process
+that reloads ggml-base.en.bin from disk.
+"""
+
+import collections
+import io
+import logging
+import os
+import subprocess
+import threading
+import time
+import wave
+from typing import Optional
+
+import requests
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Engine states reported through /health/whisper
+STOPPED = "stopped"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+class WhisperEngineError(Exception):
+    """Raised when the resident engine cannot serve a request."""
+
+
+def _silent_wav(seconds: float = 1.0, sample_rate: int = 16000) -> bytes:
+    """Build a short silent 16 kHz mono WAV used to warm the model up."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+class WhisperServerEngine:
+    """Manages one long-lived whisper.cpp server process."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8178, threads: int = 4,
+                 startup_timeout: float = 60.0, request_timeout: float = 300.0):
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.state = STOPPED
+        self.error: Optional[str] = None
+        self.binary_path: Optional[str] = None
+        self.model_path: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.requests_served = 0
+        self.total_seconds = 0.0
+        self._process: Optional[subprocess.Popen] = None
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def is_ready(self) -> bool:
+        return self.state == READY and self._process is not None and self._process.poll() is None
+
+    def start(self, binary_path: str, model_path: str):
+        """Launch the server, wait for the model to load and run a warm-up pass."""
+        with self._lock:
+            if self.is_ready():
+                return
+            self.binary_path = binary_path
+            self.model_path = model_path
+            self.state = STARTING
+            self.error = None
+            try:
+                self._launch()
+                self._warm_up()
+                self.state = READY
+                logger.info(
+                    f"Whisper engine ready on {self.base_url} "
+                    f"(load {self.load_seconds:.2f}s, warm-up {self.warmup_seconds:.2f}s)")
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                self._terminate()
+                logger.error(f"Whisper engine failed to start: {str(e)}")
+                raise WhisperEngineError(str(e))
+
+    def stop(self):
+        with self._lock:
+            self._terminate()
+            self.state = STOPPED
+
+    def _launch(self):
+        if not os.path.isfile(self.binary_path):
+            raise WhisperEngineError(f"whisper server binary not found at {self.binary_path}")
+
+        cmd = [
+            self.binary_path,
+            "--model", self.model_path,
+            "--host", self.host,
+            "--port", str(self.port),
+            "--threads", str(self.threads),
+        ]
+        started = time.monotonic()
+        self._process = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # The server only starts listening once the model is in memory
+        deadline = started + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise WhisperEngineError(
+                    f"whisper server exited during startup (code {self._process.returncode})")
+            try:
+                self._session.get(self.base_url, timeout=1)
+                self.load_seconds = time.monotonic() - started
+                return
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+        raise WhisperEngineError(
+            f"whisper server did not become ready within {self.startup_timeout:.0f}s")
+
+    def _warm_up(self):
+        started = time.monotonic()
+        self._post_inference(("warmup.wav", _silent_wav(), "audio/wav"), "en")
+        self.warmup_seconds = time.monotonic() - started
+
+    def _terminate(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def _post_inference(self, file_field, language: str) -> str:
+        response = self._session.post(
+            f"{self.base_url}/inference",
+            files={"file": file_field},
+            data={"response_format": "json", "language": language},
+            timeout=self.request_timeout
+        )
+        if response.status_code != 200:
+            raise WhisperEngineError(
+                f"whisper server error {response.status_code}: {response.text[:200]}")
+        return response.json().get("text", "").strip()
+
+    def transcribe(self, audio_path: str, language: str = "en") -> str:
+        """Transcribe a WAV file with the already-loaded model."""
+        with open(audio_path, "rb") as f:
+            return self._transcribe_file_field(
+                (os.path.basename(audio_path), f, "audio/wav"), language)
+
+    def transcribe_bytes(self, wav_bytes: bytes, language: str = "en") -> str:
+        """Transcribe in-memory WAV audio with the already-loaded model."""
+        return self._transcribe_file_field(("audio.wav", wav_bytes, "audio/wav"), language)
+
+    def _transcribe_file_field(self, file_field, language: str) -> str:
+        if not self.is_ready():
+            raise WhisperEngineError(f"whisper engine is not ready (state: {self.state})")
+
+        started = time.monotonic()
+        try:
+            text = self._post_inference(file_field, language)
+        except requests.exceptions.RequestException as e:
+            # Process may have died; report it so callers fall back to the CLI
+            if self._process is None or self._process.poll() is not None:
+                self.state = FAILED
+                self.error = f"whisper server exited: {str(e)}"
+            raise WhisperEngineError(str(e))
+
+        self.requests_served += 1
+        self.total_seconds += time.monotonic() - started
+        return text
+
+    def peak_rss_bytes(self) -> Optional[int]:
+        """High-water resident memory of the server process (Linux only)."""
+        if self._process is None:
+            return None
+        try:
+            with open(f"/proc/{self._process.pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def status(self) -> dict:
+        """Snapshot for /health/whisper."""
+        return {
+            "engine": "server",
+            "state": self.state if self.state != READY or self.is_ready() else FAILED,
+            "error": self.error,
+            "url": self.base_url,
+            "binary_path": self.binary_path,
+            "model_path": self.model_path,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "requests_served": self.requests_served,
+            "avg_request_seconds": (self.total_seconds / self.requests_served
+                                    if self.requests_served else None),
+        }
+
+
+class WhisperEnginePool:
+    """
+    Several resident servers on consecutive ports. whisper-server runs one
+    inference at a time, so concurrent requests (e.g. the chunks of a long
+    recording) each borrow an idle instance.
+    """
+
+    def __init__(self, size: int = 1, host: str = "127.0.0.1", port: int = 8178,
+                 threads: int = 4, startup_timeout: float = 60.0,
+                 request_timeout: float = 300.0):
+        self.request_timeout = request_timeout
+        self.engines = [
+            WhisperServerEngine(host=host, port=port + i, threads=threads,
+                                startup_timeout=startup_timeout,
+                                request_timeout=request_timeout)
+            for i in range(max(1, size))
+        ]
+        # Idle instances, for the pool's lifetime (reloads drain it rather than
+        # replace it, so waiting borrowers are not stranded on an old queue)
+        self._idle: "collections.deque[WhisperServerEngine]" = collections.deque()
+        self._idle_changed = threading.Condition()
+        # Per calling thread: inference time of its last request, excluding the wait for an instance
+        self._requests = threading.local()
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return self.engines[0].model_path
+
+    def is_ready(self) -> bool:
+        return any(e.is_ready() for e in self.engines)
+
+    def start(self, binary_path: str, model_path: str):
+        """Start every instance; succeeds as long as at least one comes up."""
+        errors = []
+        for e in self.engines:
+            try:
+                e.start(binary_path, model_path)
+                self._release(e)
+            except WhisperEngineError as err:
+                errors.append(f"port {e.port}: {str(err)}")
+        if not self.is_ready():
+            raise WhisperEngineError("; ".join(errors))
+
+    def stop(self):
+        """Stop every instance and empty the idle queue; waiting borrowers keep waiting on it."""
+        with self._idle_changed:
+            self._idle.clear()
+        for e in self.engines:
+            e.stop()
+
+    def _release(self, e: WhisperServerEngine):
+        """
+        Mark an instance idle unless it is dead or already queued: after a
+        reload, start() has queued an instance a borrower may still return.
+        """
+        with self._idle_changed:
+            if e.is_ready() and e not in self._idle:
+                self._idle.append(e)
+                self._idle_changed.notify()
+
+    def _take(self) -> WhisperServerEngine:
+        deadline = time.monotonic() + self.request_timeout
+        with self._idle_changed:
+            while True:
+                while self._idle:
+                    e = self._idle.popleft()
+                    # Dead instances are not handed out
+                    if e.is_ready():
+                        return e
+                # Re-checked while waiting so a pool that stays down fails fast (callers fall back to the CLI)
+                if not self.is_ready():
+                    raise WhisperEngineError("no whisper engine instance is ready")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WhisperEngineError("timed out waiting for an idle whisper engine")
+                self._idle_changed.wait(min(remaining, 1.0))
+
+    def _borrow(self, method: str, *args) -> str:
+        e = self._take()
+        started = time.monotonic()
+        try:
+            text = getattr(e, method)(*args)
+            self._requests.seconds = time.monotonic() - started
+            return text
+        finally:
+            self._release(e)
+
+    def last_request_seconds(self) -> Optional[float]:
+        """Inference time of this thread's last successful request (queueing excluded)."""
+        return getattr(self._requests, "seconds", None)
+
+    def transcribe(self, audio_path: str, language: str = "en") -> str:
+        return self._borrow("transcribe", audio_path, language)
+
+    def transcribe_bytes(self, wav_bytes: bytes, language: str = "en") -> str:
+        return self._borrow("transcribe_bytes", wav_bytes, language)
+
+    def peak_rss_bytes(self) -> Optional[int]:
+        peaks = [p for p in (e.peak_rss_bytes() for e in self.engines) if p]
+        return max(peaks) if peaks else None
+
+    def status(self) -> dict:
+        """Primary instance snapshot plus per-instance detail for /health/whisper."""
+        instances = [e.status() for e in self.engines]
+        return {
+            **instances[0],
+            "ready_instances": sum(1 for e in self.engines if e.is_ready()),
+            "instances": instances,
+        }
+
+
+# Process-wide engine pool shared by every transcription path
+engine = WhisperEnginePool(
+    size=config.CARELINK_WHISPER_SERVER_INSTANCES,
+    port=config.CARELINK_WHISPER_SERVER_PORT,
+    threads=config.CARELINK_WHISPER_THREADS,
+    startup_timeout=config.CARELINK_WHISPER_STARTUP_TIMEOUT_SEC,
+)
+
+# Single instance serving the small preview model, on the next free port
+preview_engine = WhisperEnginePool(
+    size=1,
+    port=config.CARELINK_WHISPER_SERVER_PORT + config.CARELINK_WHISPER_SERVER_INSTANCES,
+    threads=config.CARELINK_WHISPER_THREADS,
+    startup_timeout=config.CARELINK_WHISPER_STARTUP_TIMEOUT_SEC,
+)
+
+
+def start_engine(model_path: Optional[str] = None):
+    """
+    Start the resident engines if enabled. model_path overrides the configured
+    model (e.g. a runtime-selected quantized one). Failures leave the CLI
+    fallback in place.
+    """
+    if config.CARELINK_WHISPER_ENGINE != "server":
+        logger.info("Resident whisper engine disabled; using whisper-cli per request")
+        return
+
+    from whisper_utils import ensure_whisper_setup, get_whisper_server_binary, get_preview_model_path
+    try:
+        _, configured_model_path = ensure_whisper_setup()
+        model_path = model_path or configured_model_path
+        server_binary = get_whisper_server_binary()
+        engine.start(server_binary, model_path)
+    except Exception as e:
+        logger.warning(f"Resident whisper engine unavailable, falling back to whisper-cli: {str(e)}")
+        return
+
+    preview_model_path = get_preview_model_path()
+    if preview_model_path:
+        try:
+            preview_engine.start(server_binary, preview_model_path)
+        except WhisperEngineError as e:
+            logger.warning(f"Preview whisper engine unavailable, previews use whisper-cli: {str(e)}")
+
+
+def stop_engines():
+    engine.stop()
+    preview_engine.stop()
+
+
+def pool_for(model_path: Optional[str]) -> Optional[WhisperEnginePool]:
+    """Resident pool already serving this model, if any; None means use whisper-cli."""
+    if model_path is None:
+        return engine
+    for pool in (engine, preview_engine):
+        if pool.model_path and os.path.abspath(pool.model_path) == os.path.abspath(model_path):
+            return pool
+    return None
+
+
+def reload_engine(model_path: str):
+    """Restart the main pool on another model; requests use whisper-cli meanwhile."""
+    if config.CARELINK_WHISPER_ENGINE != "server":
+        return
+    if engine.model_path and os.path.abspath(engine.model_path) == os.path.abspath(model_path):
+        return
+
+    from whisper_utils import get_whisper_server_binary
+    server_binary = engine.engines[0].binary_path or get_whisper_server_binary()
+    engine.stop()
+    try:
+        engine.start(server_binary, model_path)
+        logger.info(f"Whisper engine now serving {os.path.basename(model_path)}")
+    except WhisperEngineError as e:
+        logger.warning(f"Whisper engine could not load {model_path}, using whisper-cli: {str(e)}")
+
+
+def transcribe_with_engine(audio_path: str, language: str = "en",
+                           pool: Optional[WhisperEnginePool] = None) -> Optional[str]:
+    """Transcribe via the resident engine, or return None if it cannot serve."""
+    pool = pool or engine
+    if not pool.is_ready():
+        return None
+    try:
+        return pool.transcribe(audio_path, language)
+    except WhisperEngineError as e:
+        logger.warning(f"Resident whisper engine failed, falling back to whisper-cli: {str(e)}")
+        return None
+
+
+def transcribe_bytes_with_engine(wav_bytes: bytes, language: str = "en",
+                                 pool: Optional[WhisperEnginePool] = None) -> Optional[str]:
+    """In-memory counterpart of transcribe_with_engine; pool defaults to the main engine."""
+    pool = pool or engine
+    if not pool.is_ready():
+        return None
+    try:
+        return pool.transcribe_bytes(wav_bytes, language)
+    except WhisperEngineError as e:
+        logger.warning(f"Resident whisper engine failed, falling back to whisper-cli: {str(e)}")
+        return None
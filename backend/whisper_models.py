@@ -0,0 +1,216 @@
+"""
+Registry of the ggml whisper models installed on this machine.
+Lists every models/ggml-*.bin (including q5_0 / q8_0 quantized variants),
+picks one per request or per session type, and keeps the measured real-time
+factor and peak memory of each model in SQLite so the choice can be traded
+for throughput at runtime without redeploying.
+"""
+
+import glob
+import io
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import wave
+from typing import Dict, List, Optional, Union
+
+import config
+from database import db_cursor
+
+logger = logging.getLogger(__name__)
+
+_MODEL_FILE = re.compile(r"^ggml-(?P<name>.+)\.bin$")
+_QUANTIZATION = re.compile(r"-(?P<quant>q\d_\d|q\d_k|f16|f32)$")
+
+# Selection scope used when neither the request nor the session type picks a model
+DEFAULT_SCOPE = "default"
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request names a model that is not installed."""
+
+
+def model_name(model_path: str) -> str:
+    """Registry name of a model file: models/ggml-base.en-q5_0.bin -> base.en-q5_0."""
+    basename = os.path.basename(str(model_path))
+    match = _MODEL_FILE.match(basename)
+    return match.group("name") if match else basename
+
+
+def _describe(path: str) -> dict:
+    name = model_name(path)
+    quant = _QUANTIZATION.search(name)
+    return {
+        "name": name,
+        "path": os.path.abspath(path),
+        "family": name[:quant.start()] if quant else name,
+        "quantization": quant.group("quant") if quant else "f16",
+        "size_bytes": os.path.getsize(path),
+    }
+
+
+def parse_session_models(spec: str) -> Dict[str, str]:
+    """Parse "sundowning=base.en,meals=tiny.en-q5_0" into {session_type: model}."""
+    mapping = {}
+    for item in spec.split(","):
+        session_type, _, name = item.partition("=")
+        if session_type.strip() and name.strip():
+            mapping[session_type.strip()] = name.strip()
+    return mapping
+
+
+def wav_seconds(audio: Union[bytes, str]) -> float:
+    """Duration of WAV bytes or a WAV file; 0.0 for anything wave cannot read."""
+    try:
+        with wave.open(io.BytesIO(audio) if isinstance(audio, bytes) else audio, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, RuntimeError, OSError):
+        return 0.0
+
+
+class ModelRegistry:
+    """Installed models, the active selection and per-model performance counters."""
+
+    def __init__(self, models_dir: str, default_model_path: str,
+                 session_models: Optional[Dict[str, str]] = None):
+        self.models_dir = models_dir
+        self.default_model_path = default_model_path
+        self.session_models = dict(session_models or {})
+        self._models: Dict[str, dict] = {}
+        self._selection: Dict[str, str] = {}
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Re-scan the models directory and reload the stored selection. Startup/admin only."""
+        models = {}
+        for path in sorted(glob.glob(os.path.join(self.models_dir, "ggml-*.bin"))):
+            info = _describe(path)
+            models[info["name"]] = info
+
+        with db_cursor() as cursor:
+            cursor.execute("SELECT scope, model FROM whisper_model_selection")
+            stored = {row["scope"]: row["model"] for row in cursor.fetchall()}
+
+        with self._lock:
+            self._models = models
+            # Environment mapping first, runtime choices stored in the database win
+            self._selection = {**self.session_models, **stored}
+            self._scanned = True
+        logger.info(f"Whisper models available: {', '.join(models) or 'none'}")
+
+    def _ensure_scanned(self):
+        if not self._scanned:
+            self.refresh()
+
+    def get(self, name: str) -> dict:
+        self._ensure_scanned()
+        default = model_name(self.default_model_path)
+        if name in self._models:
+            return self._models[name]
+        if name == default:
+            # The configured model may live outside models_dir
+            return {"name": default, "path": os.path.abspath(self.default_model_path),
+                    "family": default, "quantization": None, "size_bytes": None}
+        raise UnknownModelError(f"Unknown whisper model: {name}")
+
+    def select(self, requested: Optional[str] = None, session_type: Optional[str] = None) -> dict:
+        """Model for a transcription: explicit request, then session type, then default."""
+        self._ensure_scanned()
+        if requested:
+            return self.get(requested)
+        with self._lock:
+            name = (self._selection.get(session_type) if session_type else None) \
+                or self._selection.get(DEFAULT_SCOPE)
+        return self.get(name or model_name(self.default_model_path))
+
+    def selection(self) -> Dict[str, str]:
+        self._ensure_scanned()
+        with self._lock:
+            return dict(self._selection)
+
+    def set_selection(self, scope: str, name: Optional[str]):
+        """Pin a model for a session type (or the default scope); None clears it."""
+        if name is not None:
+            self.get(name)
+        with db_cursor() as cursor:
+            if name is None:
+                cursor.execute("DELETE FROM whisper_model_selection WHERE scope = ?", (scope,))
+            else:
+                cursor.execute(
+                    """INSERT OR REPLACE INTO whisper_model_selection (scope, model, updated_ts)
+                       VALUES (?, ?, ?)""",
+                    (scope, name, int(time.time() * 1000))
+                )
+        with self._lock:
+            if name is None:
+                self._selection.pop(scope, None)
+                if scope in self.session_models:
+                    self._selection[scope] = self.session_models[scope]
+            else:
+                self._selection[scope] = name
+
+    def record_run(self, model_path: str, audio_seconds: float, processing_seconds: float,
+                   peak_rss_bytes: Optional[int] = None):
+        """Add one transcription to the model's real-time factor and memory figures."""
+        if audio_seconds <= 0:
+            return
+        with db_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO whisper_model_stats
+                   (model, runs, audio_seconds, processing_seconds, peak_rss_bytes, last_used_ts)
+                   VALUES (?, 1, ?, ?, ?, ?)
+                   ON CONFLICT(model) DO UPDATE SET
+                     runs = runs + 1,
+                     audio_seconds = audio_seconds + excluded.audio_seconds,
+                     processing_seconds = processing_seconds + excluded.processing_seconds,
+                     peak_rss_bytes = MAX(COALESCE(peak_rss_bytes, 0), COALESCE(excluded.peak_rss_bytes, 0)),
+                     last_used_ts = excluded.last_used_ts""",
+                (model_name(model_path), audio_seconds, processing_seconds,
+                 peak_rss_bytes, int(time.time() * 1000))
+            )
+
+    def record_transcription(self, model_path: str, audio, processing_seconds: float,
+                             peak_rss_bytes: Optional[int]):
+        """Record one successful transcription, timed from when an engine or CLI process took it."""
+        try:
+            self.record_run(model_path, wav_seconds(audio), processing_seconds, peak_rss_bytes)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record whisper model stats: {str(e)}")
+
+    def stats(self) -> Dict[str, dict]:
+        with db_cursor() as cursor:
+            cursor.execute(
+                "SELECT model, runs, audio_seconds, processing_seconds, peak_rss_bytes, last_used_ts "
+                "FROM whisper_model_stats")
+            rows = cursor.fetchall()
+        return {
+            row["model"]: {
+                "runs": row["runs"],
+                "audio_seconds": round(row["audio_seconds"], 2),
+                "real_time_factor": (round(row["processing_seconds"] / row["audio_seconds"], 4)
+                                     if row["audio_seconds"] else None),
+                "peak_rss_bytes": row["peak_rss_bytes"] or None,
+                "last_used_ts": row["last_used_ts"],
+            }
+            for row in rows
+        }
+
+    def list_models(self) -> List[dict]:
+        """Installed models with their measured performance."""
+        self._ensure_scanned()
+        stats = self.stats()
+        with self._lock:
+            models = list(self._models.values())
+        return [{**info, "stats": stats.get(info["name"])} for info in models]
+
+
+# Process-wide registry
+registry = ModelRegistry(
+    models_dir=config.CARELINK_WHISPER_MODELS_DIR,
+    default_model_path=config.CARELINK_WHISPER_MODEL_PATH,
+    session_models=parse_session_models(config.CARELINK_WHISPER_SESSION_MODELS),
+)
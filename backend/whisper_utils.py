@@ -3,94 +3,345 @@ Whisper.cpp utilities for offline speech transcription.
 Provides centralized functions for building, locating, and using whisper.cpp.
 """
 
+import logging
 import os
 import sys
 import subprocess
 import tempfile
-from typing import Optional
+import threading
+import time
+from typing import Callable, Optional
 from fastapi import HTTPException, status
+from whisper_engine import transcribe_with_engine, pool_for
+import config
 
+logger = logging.getLogger(__name__)
 
-def get_whisper_binary() -> str:
-    """Get the path to the whisper binary, building if necessary."""
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    whisper_root = os.path.join(project_root, "whisper.cpp")
-    build_dir = os.path.join(whisper_root, "build")
 
-    # Ensure build directory exists
-    os.makedirs(build_dir, exist_ok=True)
+# Setup states reported through /health/whisper
+UNRESOLVED = "unresolved"
+READY = "ready"
+FAILED = "failed"
 
-    # Platform-specific binary paths
-    is_win = sys.platform.startswith("win")
-    if is_win:
-        candidates = [
-            os.path.join(build_dir, "bin", "Release", "whisper-cli.exe"),
-            os.path.join(build_dir, "bin", "Release", "main.exe"),
-        ]
-    else:
-        candidates = [
-            os.path.join(build_dir, "bin", "whisper-cli"),
-            os.path.join(build_dir, "bin", "main"),
-            os.path.join(build_dir, "whisper-cli"),
-            os.path.join(build_dir, "main"),
-        ]
+# ggml model files start with the uint32 magic 0x67676d6c ("ggml"), little-endian
+_GGML_MAGIC = b"lmgg"
+
+# Resolved once by resolve_whisper_setup(); the request path only reads this
+_setup = {
+    "state": UNRESOLVED,
+    "binary_path": None,
+    "server_binary_path": None,
+    "model_path": None,
+    "preview_model_path": None,
+    "error": None,
+}
+_setup_lock = threading.Lock()
+
+
+def _build_dir() -> str:
+    return os.path.join(config.CARELINK_WHISPER_DIR, "build")
+
+
+def _binary_candidates(names: list, build_dir: Optional[str] = None) -> list:
+    """Default locations of a whisper.cpp executable under a build directory."""
+    build_dir = build_dir or _build_dir()
+    if sys.platform.startswith("win"):
+        return [os.path.join(build_dir, "bin", "Release", name + ".exe") for name in names]
+    return [os.path.join(build_dir, "bin", name) for name in names] + \
+        [os.path.join(build_dir, name) for name in names]
+
+
+def find_built_binary(names: list, build_dir: Optional[str] = None) -> Optional[str]:
+    """First existing executable with one of names under a build directory, or None."""
+    for candidate in _binary_candidates(names, build_dir):
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return os.path.abspath(candidate)
+    return None
 
-    # Check if any binary exists
+
+def _find_executable(configured: str, names: list, label: str) -> str:
+    candidates = [configured] if configured else _binary_candidates(names)
     for candidate in candidates:
         if os.path.isfile(candidate):
-            return candidate
+            if not os.access(candidate, os.X_OK):
+                raise RuntimeError(f"{label} at {candidate} is not executable")
+            return os.path.abspath(candidate)
+    raise RuntimeError(
+        f"{label} not found (looked in: {', '.join(candidates)}); "
+        f"build it with `python whisper_utils.py build`")
 
-    # Build if no binary found
-    print("🔨 Building whisper.cpp...")
-    try:
-        subprocess.check_call(
-            ["cmake", whisper_root, "-DCMAKE_BUILD_TYPE=Release"],
-            cwd=build_dir
-        )
-        build_cmd = ["cmake", "--build", ".", "--config", "Release"]
-        if not is_win:
-            build_cmd += ["--", f"-j{os.cpu_count() or 1}"]
-        subprocess.check_call(build_cmd, cwd=build_dir)
-
-        # Check again after build
-        for candidate in candidates:
-            if os.path.isfile(candidate):
-                return candidate
-    except subprocess.CalledProcessError as e:
+
+def _validate_model(model_path: str) -> str:
+    if not os.path.isfile(model_path):
+        raise RuntimeError(
+            f"Whisper model not found at {model_path}. Please run fetch_model.sh first.")
+    with open(model_path, "rb") as f:
+        magic = f.read(4)
+    if magic != _GGML_MAGIC:
+        raise RuntimeError(f"Whisper model at {model_path} is not a ggml model file")
+    return os.path.abspath(model_path)
+
+
+def resolve_whisper_setup(force: bool = False) -> dict:
+    """
+    Locate and validate the whisper.cpp binaries and model once and cache the
+    result. Called at startup; later calls return the cached state unless
+    force=True. Never builds anything.
+    """
+    with _setup_lock:
+        if _setup["state"] != UNRESOLVED and not force:
+            return dict(_setup)
+
+        resolved = {"binary_path": None, "server_binary_path": None,
+                    "model_path": None, "preview_model_path": None, "error": None}
+        try:
+            resolved["binary_path"] = _find_executable(
+                config.CARELINK_WHISPER_CLI_PATH, ["whisper-cli", "main"], "whisper-cli")
+            resolved["model_path"] = _validate_model(config.CARELINK_WHISPER_MODEL_PATH)
+            resolved["state"] = READY
+        except RuntimeError as e:
+            resolved["state"] = FAILED
+            resolved["error"] = str(e)
+            logger.error(f"Whisper setup failed: {str(e)}")
+
+        # The preview model is optional; without it transcription is single-pass
+        if config.CARELINK_TWO_TIER_TRANSCRIPTION:
+            try:
+                resolved["preview_model_path"] = _validate_model(
+                    config.CARELINK_WHISPER_PREVIEW_MODEL_PATH)
+            except RuntimeError as e:
+                logger.warning(f"Two-tier transcription disabled: {str(e)}")
+
+        # The server binary is optional; without it the CLI path still works
+        try:
+            resolved["server_binary_path"] = _find_executable(
+                config.CARELINK_WHISPER_SERVER_PATH, ["whisper-server", "server"], "whisper-server")
+        except RuntimeError as e:
+            logger.warning(str(e))
+
+        _setup.update(resolved)
+        if _setup["state"] == READY:
+            logger.info(f"Whisper ready: {_setup['binary_path']} with {_setup['model_path']}")
+        return dict(_setup)
+
+
+def whisper_setup_status() -> dict:
+    """Cached setup snapshot; no filesystem access."""
+    return dict(_setup)
+
+
+def _ready_setup() -> dict:
+    setup = _setup if _setup["state"] != UNRESOLVED else resolve_whisper_setup()
+    if setup["state"] != READY:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to build whisper.cpp: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Whisper is not ready: {setup['error']}"
         )
+    return setup
 
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail="Whisper binary not found after build"
-    )
 
+def get_whisper_binary() -> str:
+    """Get the path to the whisper-cli binary resolved at startup."""
+    return _ready_setup()["binary_path"]
 
-def get_model_path() -> str:
-    """Get the path to the whisper model."""
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    model_dir = os.path.join(project_root, "whisper.cpp", "models")
-    os.makedirs(model_dir, exist_ok=True)
-    model_path = os.path.join(model_dir, "ggml-base.en.bin")
 
-    if not os.path.isfile(model_path):
+def get_whisper_server_binary() -> str:
+    """Get the path to the whisper.cpp HTTP server resolved at startup."""
+    server_binary = _ready_setup()["server_binary_path"]
+    if not server_binary:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Whisper model not found. Please run fetch_model.sh first."
+            detail=f"Whisper server binary not found in {_build_dir()}"
         )
+    return server_binary
+
+
+def get_model_path() -> str:
+    """Get the path to the whisper model resolved at startup."""
+    return _ready_setup()["model_path"]
+
+
+def get_preview_model_path() -> Optional[str]:
+    """Path to the preview model, or None when two-tier transcription is unavailable."""
+    setup = _setup if _setup["state"] != UNRESOLVED else resolve_whisper_setup()
+    if setup["state"] != READY:
+        return None
+    return setup["preview_model_path"]
+
+
+def build_whisper_cpp(build_dir: Optional[str] = None, cmake_flags: tuple = ()) -> str:
+    """
+    Configure and build whisper.cpp and return the build directory.
+    Run by hand or by provision_whisper.py, never from a request.
+    """
+    whisper_root = config.CARELINK_WHISPER_DIR
+    build_dir = build_dir or _build_dir()
+    os.makedirs(build_dir, exist_ok=True)
+
+    print(f"🔨 Building whisper.cpp in {build_dir} {' '.join(cmake_flags)}")
+    subprocess.check_call(
+        ["cmake", whisper_root, "-DCMAKE_BUILD_TYPE=Release", *cmake_flags],
+        cwd=build_dir
+    )
+    build_cmd = ["cmake", "--build", ".", "--config", "Release"]
+    if not sys.platform.startswith("win"):
+        build_cmd += ["--", f"-j{os.cpu_count() or 1}"]
+    subprocess.check_call(build_cmd, cwd=build_dir)
+    return build_dir
+
+
+class MeasuredProcess(subprocess.CompletedProcess):
+    """CompletedProcess plus the child's own wall time and peak resident memory."""
+
+    def __init__(self, args, returncode, stdout, stderr, seconds: float, peak_rss_bytes: Optional[int]):
+        super().__init__(args, returncode, stdout, stderr)
+        self.seconds = seconds
+        self.peak_rss_bytes = peak_rss_bytes
+
+
+# How often a running child's VmHWM is read; whisper holds its model until exit, so the last sample is the peak
+_RSS_SAMPLE_SEC = 0.02
+
+
+def _vm_hwm_bytes(pid: int) -> Optional[int]:
+    """Peak RSS of a live process's current image from /proc, or None once it has exited."""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def run_measured(cmd: list, input: Optional[bytes] = None, timeout: Optional[float] = None,
+                 cwd: Optional[str] = None, text: bool = False) -> MeasuredProcess:
+    """
+    subprocess.run(cmd, capture_output=True) that also reports the peak RSS
+    of this child alone. On Linux that is VmHWM from /proc/<pid>/status,
+    sampled while the child runs: it belongs to the exec'd image only, while
+    wait4's ru_maxrss also counts the parent memory the child held between
+    fork and exec (the whole server, for a trivial run). Elsewhere the
+    child's wait4 rusage is used; RUSAGE_CHILDREN would be the peak of every
+    child ever waited on. peak_rss_bytes is None when nothing was measured.
+    """
+    if not hasattr(os, "wait4"):
+        started = time.monotonic()
+        result = subprocess.run(cmd, input=input, capture_output=True, timeout=timeout, cwd=cwd)
+        stdout, stderr = result.stdout, result.stderr
+        if text:
+            stdout, stderr = stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+        return MeasuredProcess(cmd, result.returncode, stdout, stderr, time.monotonic() - started, None)
+
+    sample_proc = os.path.isdir("/proc/self")
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    output = {}
+    peak = None
+
+    def sample():
+        nonlocal peak
+        hwm = _vm_hwm_bytes(proc.pid) if sample_proc else None
+        if hwm is not None:
+            peak = hwm if peak is None else max(peak, hwm)
+
+    def read(name, stream):
+        output[name] = stream.read()
+
+    readers = [threading.Thread(target=read, args=(name, stream), daemon=True)
+               for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for reader in readers:
+        reader.start()
+    sample()
+    if input is not None:
+        try:
+            proc.stdin.write(input)
+        except BrokenPipeError:
+            pass
+        proc.stdin.close()
+
+    deadline = None if timeout is None else started + timeout
+    while any(reader.is_alive() for reader in readers):
+        sample()
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            proc.kill()
+            os.wait4(proc.pid, 0)
+            proc.returncode = -9
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        wait = _RSS_SAMPLE_SEC if remaining is None else min(_RSS_SAMPLE_SEC, remaining)
+        for reader in readers:
+            reader.join(wait)
+            if reader.is_alive():
+                break
+    # Output is closed, but the child may not have exited yet
+    sample()
+
+    _, wait_status, usage = os.wait4(proc.pid, 0)
+    seconds = time.monotonic() - started
+    # Popen must not try to reap the pid again
+    proc.returncode = os.waitstatus_to_exitcode(wait_status)
+    proc.stdout.close()
+    proc.stderr.close()
+    if not sample_proc:
+        # macOS reports bytes (other platforms KiB)
+        peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    stdout, stderr = output.get("stdout", b""), output.get("stderr", b"")
+    if text:
+        stdout, stderr = stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+    return MeasuredProcess(cmd, proc.returncode, stdout, stderr, seconds, peak)
 
-    return model_path
 
+def run_whisper_cli(whisper_exe: str, model_path: str, audio_path: str,
+                    language: str = "en", timeout: Optional[float] = None,
+                    threads: Optional[int] = None) -> tuple[MeasuredProcess, str]:
+    """
+    Run whisper-cli once with its --output-txt file in a private temporary
+    directory, so concurrent transcriptions never share an output path.
 
-def transcribe_audio_file(audio_path: str, language: str = "en") -> str:
+    Returns:
+        Tuple of (completed process with its time and peak memory,
+        transcript text or "" if none was written)
+    """
+    with tempfile.TemporaryDirectory(prefix="whisper-job-") as job_dir:
+        output_base = os.path.join(job_dir, "transcript")
+        whisper_cmd = [
+            whisper_exe,
+            "--model", model_path,
+            "--file", os.path.abspath(audio_path),
+            "--output-txt",
+            "--output-file", output_base,
+            "--print-progress",
+            "--language", language,
+        ]
+        if threads:
+            whisper_cmd += ["--threads", str(threads)]
+
+        result = run_measured(whisper_cmd, timeout=timeout, cwd=job_dir, text=True)
+
+        transcript_text = ""
+        output_txt = output_base + ".txt"
+        if os.path.exists(output_txt):
+            with open(output_txt, 'r', encoding='utf-8') as f:
+                transcript_text = f.read().strip()
+
+        return result, transcript_text
+
+
+def transcribe_audio_file(audio_path: str, language: str = "en",
+                          model_path: Optional[str] = None,
+                          on_run: Optional[Callable[[float, Optional[int]], None]] = None) -> str:
     """
     Transcribe an audio file using whisper.cpp.
 
     Args:
         audio_path: Path to the audio file
         language: Language code (default: "en")
+        model_path: Model to use (default: the configured model)
+        on_run: Called with (inference seconds, peak RSS bytes or None)
+            after a successful run, for per-model stats
 
     Returns:
         Transcribed text
@@ -106,61 +357,41 @@ def transcribe_audio_file(audio_path: str, language: str = "en") -> str:
                 detail="Audio file not found"
             )
 
+        # Prefer the resident engine, if one already has this model loaded
+        pool = pool_for(model_path)
+        if pool is not None:
+            transcript_text = transcribe_with_engine(audio_path, language, pool=pool)
+            # None means the engine could not serve; "" is a successful run over silence
+            if transcript_text is not None:
+                if on_run is not None:
+                    on_run(pool.last_request_seconds(), pool.peak_rss_bytes())
+                return transcript_text
+
         # Get whisper binary and model
         whisper_exe = get_whisper_binary()
-        model_path = get_model_path()
+        model_path = model_path or get_model_path()
 
-        # Create temporary file for transcript output
-        with tempfile.NamedTemporaryFile(mode='w+', suffix='.txt', delete=False) as tmp_file:
-            tmp_txt_path = tmp_file.name
+        result, transcript_text = run_whisper_cli(
+            whisper_exe, model_path, audio_path, language,
+            timeout=300,  # 5 minute timeout
+            threads=config.CARELINK_WHISPER_THREADS
+        )
 
-        try:
-            # Call whisper.cpp for transcription
-            whisper_cmd = [
-                whisper_exe,
-                "--model", model_path,
-                "--file", audio_path,
-                "--output-txt",
-                "--output-file", "output",
-                "--print-progress",
-                "--language", language,
-            ]
-
-            result = subprocess.run(
-                whisper_cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,  # 5 minute timeout
-                cwd=os.getcwd()  # Run in current working directory
+        if result.returncode != 0:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Whisper transcription failed: {result.stderr}"
             )
 
-            if result.returncode != 0:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Whisper transcription failed: {result.stderr}"
-                )
-
-            # Read transcription result from output.txt
-            output_txt = os.path.join(os.getcwd(), "output.txt")
-            transcript_text = ""
-            if os.path.exists(output_txt):
-                with open(output_txt, 'r', encoding='utf-8') as f:
-                    transcript_text = f.read().strip()
-                # Clean up output file
-                os.unlink(output_txt)
-
-            if not transcript_text:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="No transcription text generated"
-                )
-
-            return transcript_text
-
-        finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_txt_path):
-                os.unlink(tmp_txt_path)
+        if not transcript_text:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="No transcription text generated"
+            )
+
+        if on_run is not None:
+            on_run(result.seconds, result.peak_rss_bytes)
+        return transcript_text
 
     except subprocess.TimeoutExpired:
         raise HTTPException(
@@ -187,3 +418,12 @@ def ensure_whisper_setup() -> tuple[str, str]:
     binary_path = get_whisper_binary()
     model_path = get_model_path()
     return binary_path, model_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        build_whisper_cpp()
+    setup = resolve_whisper_setup()
+    for key, value in setup.items():
+        print(f"{key}: {value}")
+    sys.exit(0 if setup["state"] == READY else 1)
@@ -1,6 +1,9 @@
 import os
 import subprocess
 
+from whisper_engine import engine, transcribe_with_engine
+from whisper_utils import run_whisper_cli
+
 def transcribe_audio(audio_path: str, model_path: str = None) -> str:
     """
     Transcribes the given audio file using whisper.cpp's whisper-cli.exe via subprocess.
@@ -35,6 +38,12 @@ def transcribe_audio(audio_path: str, model_path: str = None) -> str:
     # 3) Absolute path to the audio file
     audio = os.path.abspath(audio_path)
 
+    # Use the resident engine when it is serving the same model
+    if engine.model_path and os.path.abspath(engine.model_path) == model:
+        transcript = transcribe_with_engine(audio)
+        if transcript is not None:
+            return transcript
+
     # Sanity checks
     if not os.path.exists(cli):
         raise FileNotFoundError(f"Whisper CLI not found at: {cli}")
@@ -43,17 +52,8 @@ def transcribe_audio(audio_path: str, model_path: str = None) -> str:
     if not os.path.exists(audio):
         raise FileNotFoundError(f"Audio file not found at: {audio}")
 
-    # 4) Build and run the CLI command
-    cmd = [
-        cli,
-        "--model",        model,
-        "--file",         audio,
-        "--output-txt",
-        "--output-file",  "output",
-        "--print-progress",
-        "--language",     "en",
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # 4) Run the CLI with a private output directory (safe to call concurrently)
+    result, transcript = run_whisper_cli(cli, model, audio, "en")
 
     # Debug prints
     print("Whisper stdout:\n", result.stdout)
@@ -62,10 +62,8 @@ def transcribe_audio(audio_path: str, model_path: str = None) -> str:
     if result.returncode != 0:
         raise RuntimeError(f"Whisper CLI failed (exit {result.returncode}):\n{result.stderr}")
 
-    # 5) Load and return the transcript
-    out_txt = os.path.join(os.getcwd(), "output.txt")
-    if not os.path.exists(out_txt):
-        raise FileNotFoundError("Expected output.txt not found after transcription.")
+    # 5) Return the transcript
+    if not transcript:
+        raise FileNotFoundError("Expected transcript output not found after transcription.")
 
-    with open(out_txt, "r", encoding="utf-8") as f:
-        return f.read()
+    return transcript
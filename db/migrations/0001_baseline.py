@@ -0,0 +1,142 @@
+"""
+Baseline: bring a database created before schema_version existed up to the
+schema of that time. Every step is idempotent, since such a database may
+already have any part of it.
+"""
+
+# Columns added to existing tables: (table, column, declaration); added before STATEMENTS index them
+COLUMNS = [
+    ("trend_cache", "summary_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("trend_cache", "phrases_json", "TEXT"),
+    ("trend_cache", "updated_ts", "INTEGER"),
+    ("sessions", "patient_id", "TEXT"),
+    ("sessions", "summary_snippet", "TEXT"),
+]
+
+
+STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS chain_stage_results (
+      result_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+      session_id   TEXT NOT NULL,
+      chain        TEXT NOT NULL,
+      stage        TEXT NOT NULL,
+      data_json    TEXT NOT NULL,
+      elapsed_ms   INTEGER,
+      created_ts   INTEGER NOT NULL,
+      FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_chain_results_session ON chain_stage_results(session_id)",
+    """CREATE TABLE IF NOT EXISTS llm_cache (
+      cache_key      TEXT PRIMARY KEY,
+      model          TEXT NOT NULL,
+      template_hash  TEXT NOT NULL,
+      input_hash     TEXT NOT NULL,
+      response       TEXT NOT NULL,
+      created_ts     INTEGER NOT NULL,
+      last_access_ts INTEGER NOT NULL,
+      hit_count      INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access_ts)",
+    """CREATE TABLE IF NOT EXISTS transcription_cache (
+      cache_key      TEXT PRIMARY KEY,
+      audio_sha256   TEXT NOT NULL,
+      model          TEXT NOT NULL,
+      language       TEXT NOT NULL,
+      text           TEXT NOT NULL,
+      created_ts     INTEGER NOT NULL,
+      last_access_ts INTEGER NOT NULL,
+      hit_count      INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_transcription_cache_access ON transcription_cache(last_access_ts)",
+    """CREATE TABLE IF NOT EXISTS whisper_model_selection (
+      scope          TEXT PRIMARY KEY,
+      model          TEXT NOT NULL,
+      updated_ts     INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS whisper_model_stats (
+      model              TEXT PRIMARY KEY,
+      runs               INTEGER NOT NULL DEFAULT 0,
+      audio_seconds      REAL NOT NULL DEFAULT 0,
+      processing_seconds REAL NOT NULL DEFAULT 0,
+      peak_rss_bytes     INTEGER,
+      last_used_ts       INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS summary_batches (
+      batch_id     TEXT PRIMARY KEY,
+      status       TEXT NOT NULL,
+      filter_json  TEXT NOT NULL,
+      concurrency  INTEGER NOT NULL,
+      bypass_cache INTEGER NOT NULL DEFAULT 0,
+      total        INTEGER NOT NULL,
+      created_ts   INTEGER NOT NULL,
+      started_ts   INTEGER,
+      finished_ts  INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_summary_batches_status ON summary_batches(status)",
+    """CREATE TABLE IF NOT EXISTS summary_batch_items (
+      batch_id     TEXT NOT NULL,
+      session_id   TEXT NOT NULL,
+      status       TEXT NOT NULL,
+      error        TEXT,
+      elapsed_ms   INTEGER,
+      finished_ts  INTEGER,
+      PRIMARY KEY (batch_id, session_id),
+      FOREIGN KEY(batch_id)   REFERENCES summary_batches(batch_id) ON DELETE CASCADE,
+      FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_summary_batch_items_status ON summary_batch_items(batch_id, status)",
+    # Full-text search indexes and the triggers keeping them in sync
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+      text, content='transcripts', content_rowid='transcript_id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_ai AFTER INSERT ON transcripts BEGIN
+      INSERT INTO transcripts_fts(rowid, text) VALUES (new.transcript_id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_ad AFTER DELETE ON transcripts BEGIN
+      INSERT INTO transcripts_fts(transcripts_fts, rowid, text) VALUES ('delete', old.transcript_id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_au AFTER UPDATE OF text ON transcripts BEGIN
+      INSERT INTO transcripts_fts(transcripts_fts, rowid, text) VALUES ('delete', old.transcript_id, old.text);
+      INSERT INTO transcripts_fts(rowid, text) VALUES (new.transcript_id, new.text);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+      summary_text, content='summaries', content_rowid='summary_id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_fts_ai AFTER INSERT ON summaries BEGIN
+      INSERT INTO summaries_fts(rowid, summary_text) VALUES (new.summary_id, new.summary_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_fts_ad AFTER DELETE ON summaries BEGIN
+      INSERT INTO summaries_fts(summaries_fts, rowid, summary_text) VALUES ('delete', old.summary_id, old.summary_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_fts_au AFTER UPDATE OF summary_text ON summaries BEGIN
+      INSERT INTO summaries_fts(summaries_fts, rowid, summary_text) VALUES ('delete', old.summary_id, old.summary_text);
+      INSERT INTO summaries_fts(rowid, summary_text) VALUES (new.summary_id, new.summary_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_fts_bi BEFORE INSERT ON summaries BEGIN
+      INSERT INTO summaries_fts(summaries_fts, rowid, summary_text)
+        SELECT 'delete', summary_id, summary_text FROM summaries WHERE session_id = new.session_id;
+    END""",
+    # Keyset pagination of the session list, optionally filtered by type or patient
+    "CREATE INDEX IF NOT EXISTS idx_sessions_start_id ON sessions(start_ts, session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_type_start ON sessions(session_type, start_ts, session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_patient_start ON sessions(patient_id, start_ts, session_id)",
+    # List snippet stored with the session when its summary is written
+    """CREATE TRIGGER IF NOT EXISTS summaries_snippet_ai AFTER INSERT ON summaries BEGIN
+      UPDATE sessions SET summary_snippet = substr(new.summary_text, 1, 100) WHERE session_id = new.session_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_snippet_au AFTER UPDATE OF summary_text ON summaries BEGIN
+      UPDATE sessions SET summary_snippet = substr(new.summary_text, 1, 100) WHERE session_id = new.session_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS summaries_snippet_ad AFTER DELETE ON summaries BEGIN
+      UPDATE sessions SET summary_snippet = NULL WHERE session_id = old.session_id;
+    END""",
+]
+
+
+def upgrade(conn):
+    for table, column, declaration in COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if existing and column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    for statement in STATEMENTS:
+        conn.execute(statement)
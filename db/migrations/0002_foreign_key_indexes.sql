@@ -0,0 +1,5 @@
+-- Foreign keys without an index made every per-session transcript read and
+-- every cascading delete from sessions/audio_chunks scan the child table.
+CREATE INDEX IF NOT EXISTS idx_transcripts_session ON transcripts(session_id, created_ts);
+CREATE INDEX IF NOT EXISTS idx_transcripts_chunk ON transcripts(chunk_id);
+CREATE INDEX IF NOT EXISTS idx_summary_batch_items_session ON summary_batch_items(session_id);
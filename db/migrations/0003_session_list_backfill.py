@@ -0,0 +1,27 @@
+"""
+Fill sessions.patient_id (from 'Patient: X' notes) and sessions.summary_snippet
+for rows written before those columns existed. New rows get both on write, so
+this walks the table once by rowid, a batch at a time, after startup.
+"""
+
+
+def backfill(conn, position, batch_size):
+    last = conn.execute(
+        "SELECT MAX(rowid) FROM (SELECT rowid FROM sessions WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+        (position, batch_size)
+    ).fetchone()[0]
+    if last is None:
+        return None
+    conn.execute(
+        """UPDATE sessions SET patient_id = substr(notes, 10)
+           WHERE rowid > ? AND rowid <= ? AND patient_id IS NULL AND notes LIKE 'Patient: %'""",
+        (position, last)
+    )
+    conn.execute(
+        """UPDATE sessions SET summary_snippet =
+             (SELECT substr(m.summary_text, 1, 100) FROM summaries m WHERE m.session_id = sessions.session_id)
+           WHERE rowid > ? AND rowid <= ? AND summary_snippet IS NULL
+             AND EXISTS (SELECT 1 FROM summaries m WHERE m.session_id = sessions.session_id)""",
+        (position, last)
+    )
+    return last
@@ -1,13 +1,30 @@
 PRAGMA foreign_keys = ON;
 
+-- Applied db/migrations files; a database created from this file has all of them
+CREATE TABLE schema_version (
+  version           INTEGER PRIMARY KEY,
+  name              TEXT NOT NULL,
+  checksum          TEXT NOT NULL,    -- sha256 prefix of the migration file
+  applied_ts        INTEGER NOT NULL,
+  duration_ms       INTEGER NOT NULL,
+  backfill_position INTEGER,          -- resume point of an unfinished batched backfill
+  completed_ts      INTEGER           -- NULL while a backfill is still running
+);
+
 CREATE TABLE sessions (
   session_id   TEXT PRIMARY KEY,      -- UUIDv4
   session_type TEXT NOT NULL,         -- Medication, Conversation, etc.
   start_ts     INTEGER NOT NULL,      -- epoch ms
   end_ts       INTEGER,               -- nullable
-  notes        TEXT
+  notes        TEXT,
+  patient_id   TEXT,
+  summary_snippet TEXT                -- first 100 chars of the summary, kept by triggers
 );
 CREATE INDEX idx_sessions_start ON sessions(start_ts);
+-- Keyset pagination of the session list: (start_ts, session_id), optionally per type or patient
+CREATE INDEX idx_sessions_start_id ON sessions(start_ts, session_id);
+CREATE INDEX idx_sessions_type_start ON sessions(session_type, start_ts, session_id);
+CREATE INDEX idx_sessions_patient_start ON sessions(patient_id, start_ts, session_id);
 
 CREATE TABLE audio_chunks (
   chunk_id     INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -31,6 +48,9 @@ CREATE TABLE transcripts (
   FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
   FOREIGN KEY(chunk_id)   REFERENCES audio_chunks(chunk_id) ON DELETE CASCADE
 );
+-- Per-session transcript reads (ordered by created_ts) and cascades from sessions/audio_chunks
+CREATE INDEX idx_transcripts_session ON transcripts(session_id, created_ts);
+CREATE INDEX idx_transcripts_chunk ON transcripts(chunk_id);
 
 CREATE TABLE summaries (
   summary_id      INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,9 +66,145 @@ CREATE TABLE summaries (
 
 
 CREATE TABLE trend_cache (
-  week_start_ts   INTEGER PRIMARY KEY,
+  week_start_ts   INTEGER PRIMARY KEY,  -- Monday 00:00 UTC, epoch ms (by session start)
   top_phrase      TEXT,
   top_phrase_count INTEGER,
   avg_agitation   REAL,
-  med_given       INTEGER
+  med_given       INTEGER,              -- summarized medication sessions
+  summary_count   INTEGER NOT NULL DEFAULT 0,
+  phrases_json    TEXT,                 -- top phrases [{"phrase":"…","count":5}, …]
+  updated_ts      INTEGER
+);
+
+
+CREATE TABLE chain_stage_results (
+  result_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+  session_id   TEXT NOT NULL,
+  chain        TEXT NOT NULL,         -- medication, freeform, sundowning
+  stage        TEXT NOT NULL,         -- extract, analyze, summarize
+  data_json    TEXT NOT NULL,
+  elapsed_ms   INTEGER,
+  created_ts   INTEGER NOT NULL,
+  FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+CREATE INDEX idx_chain_results_session ON chain_stage_results(session_id);
+
+
+CREATE TABLE llm_cache (
+  cache_key      TEXT PRIMARY KEY,      -- sha256(model, template_hash, input_hash)
+  model          TEXT NOT NULL,
+  template_hash  TEXT NOT NULL,
+  input_hash     TEXT NOT NULL,
+  response       TEXT NOT NULL,
+  created_ts     INTEGER NOT NULL,
+  last_access_ts INTEGER NOT NULL,
+  hit_count      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_llm_cache_access ON llm_cache(last_access_ts);
+
+
+CREATE TABLE transcription_cache (
+  cache_key      TEXT PRIMARY KEY,      -- sha256(audio_sha256, model, language)
+  audio_sha256   TEXT NOT NULL,
+  model          TEXT NOT NULL,         -- whisper model file, e.g. ggml-base.en.bin
+  language       TEXT NOT NULL,
+  text           TEXT NOT NULL,
+  created_ts     INTEGER NOT NULL,
+  last_access_ts INTEGER NOT NULL,
+  hit_count      INTEGER NOT NULL DEFAULT 0
 );
+CREATE INDEX idx_transcription_cache_access ON transcription_cache(last_access_ts);
+
+
+CREATE TABLE whisper_model_selection (
+  scope          TEXT PRIMARY KEY,      -- "default" or a session_type
+  model          TEXT NOT NULL,         -- registry name, e.g. base.en-q5_0
+  updated_ts     INTEGER NOT NULL
+);
+
+
+CREATE TABLE whisper_model_stats (
+  model              TEXT PRIMARY KEY,
+  runs               INTEGER NOT NULL DEFAULT 0,
+  audio_seconds      REAL NOT NULL DEFAULT 0,
+  processing_seconds REAL NOT NULL DEFAULT 0,  -- real-time factor = processing / audio
+  peak_rss_bytes     INTEGER,
+  last_used_ts       INTEGER NOT NULL
+);
+
+
+CREATE TABLE summary_batches (
+  batch_id     TEXT PRIMARY KEY,      -- uuid hex
+  status       TEXT NOT NULL,         -- queued, running, completed, cancelled
+  filter_json  TEXT NOT NULL,         -- session filter the batch was created from
+  concurrency  INTEGER NOT NULL,
+  bypass_cache INTEGER NOT NULL DEFAULT 0,
+  total        INTEGER NOT NULL,
+  created_ts   INTEGER NOT NULL,
+  started_ts   INTEGER,
+  finished_ts  INTEGER
+);
+CREATE INDEX idx_summary_batches_status ON summary_batches(status);
+
+
+CREATE TABLE summary_batch_items (
+  batch_id     TEXT NOT NULL,
+  session_id   TEXT NOT NULL,
+  status       TEXT NOT NULL,         -- pending, done, failed (the checkpoint)
+  error        TEXT,
+  elapsed_ms   INTEGER,
+  finished_ts  INTEGER,
+  PRIMARY KEY (batch_id, session_id),
+  FOREIGN KEY(batch_id)   REFERENCES summary_batches(batch_id) ON DELETE CASCADE,
+  FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+CREATE INDEX idx_summary_batch_items_status ON summary_batch_items(batch_id, status);
+-- Cascade from sessions
+CREATE INDEX idx_summary_batch_items_session ON summary_batch_items(session_id);
+
+
+-- Full-text search: external-content FTS5 indexes kept in sync by triggers
+CREATE VIRTUAL TABLE transcripts_fts USING fts5(
+  text, content='transcripts', content_rowid='transcript_id', tokenize='porter unicode61'
+);
+CREATE TRIGGER transcripts_fts_ai AFTER INSERT ON transcripts BEGIN
+  INSERT INTO transcripts_fts(rowid, text) VALUES (new.transcript_id, new.text);
+END;
+CREATE TRIGGER transcripts_fts_ad AFTER DELETE ON transcripts BEGIN
+  INSERT INTO transcripts_fts(transcripts_fts, rowid, text) VALUES ('delete', old.transcript_id, old.text);
+END;
+CREATE TRIGGER transcripts_fts_au AFTER UPDATE OF text ON transcripts BEGIN
+  INSERT INTO transcripts_fts(transcripts_fts, rowid, text) VALUES ('delete', old.transcript_id, old.text);
+  INSERT INTO transcripts_fts(rowid, text) VALUES (new.transcript_id, new.text);
+END;
+
+CREATE VIRTUAL TABLE summaries_fts USING fts5(
+  summary_text, content='summaries', content_rowid='summary_id', tokenize='porter unicode61'
+);
+CREATE TRIGGER summaries_fts_ai AFTER INSERT ON summaries BEGIN
+  INSERT INTO summaries_fts(rowid, summary_text) VALUES (new.summary_id, new.summary_text);
+END;
+CREATE TRIGGER summaries_fts_ad AFTER DELETE ON summaries BEGIN
+  INSERT INTO summaries_fts(summaries_fts, rowid, summary_text) VALUES ('delete', old.summary_id, old.summary_text);
+END;
+CREATE TRIGGER summaries_fts_au AFTER UPDATE OF summary_text ON summaries BEGIN
+  INSERT INTO summaries_fts(summaries_fts, rowid, summary_text) VALUES ('delete', old.summary_id, old.summary_text);
+  INSERT INTO summaries_fts(rowid, summary_text) VALUES (new.summary_id, new.summary_text);
+END;
+-- INSERT OR REPLACE removes the old summary without firing delete triggers
+-- (recursive_triggers is off), so drop its index entry before the insert
+CREATE TRIGGER summaries_fts_bi BEFORE INSERT ON summaries BEGIN
+  INSERT INTO summaries_fts(summaries_fts, rowid, summary_text)
+    SELECT 'delete', summary_id, summary_text FROM summaries WHERE session_id = new.session_id;
+END;
+
+-- Session-list snippet, stored when the summary is written instead of computed per read
+CREATE TRIGGER summaries_snippet_ai AFTER INSERT ON summaries BEGIN
+  UPDATE sessions SET summary_snippet = substr(new.summary_text, 1, 100) WHERE session_id = new.session_id;
+END;
+CREATE TRIGGER summaries_snippet_au AFTER UPDATE OF summary_text ON summaries BEGIN
+  UPDATE sessions SET summary_snippet = substr(new.summary_text, 1, 100) WHERE session_id = new.session_id;
+END;
+CREATE TRIGGER summaries_snippet_ad AFTER DELETE ON summaries BEGIN
+  UPDATE sessions SET summary_snippet = NULL WHERE session_id = old.session_id;
+END;
@@ -425,8 +425,11 @@ export default function Component() {
         throw new Error('No audio data recorded')
       }
 
-      // Upload audio and get transcript
-      const recordingResponse = await api.recordAudio(audioBlob, selectedSessionType)
+      // Upload audio and get transcript; show the quick preview while the final pass runs
+      const recordingResponse = await api.recordAudio(
+        audioBlob, selectedSessionType, undefined, undefined,
+        (preview) => setRecordingResult(preview)
+      )
       setRecordingResult(recordingResponse)
 
       // Move to analyzing stage
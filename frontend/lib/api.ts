@@ -22,15 +22,28 @@ export interface TranscribeResponse {
 
 export interface RecordAudioResponse {
   transcript: string
+  // 'preview' comes from the small model and is replaced by the 'final' transcript
+  transcript_status?: 'preview' | 'final'
+  transcript_id?: number
   metadata: {
     session_id: string
     timestamp: string
     patient_id: string
     session_type: string
-    audio_file: string
+    audio_file: string | null
   }
 }
 
+export interface RecordAudioJob {
+  job_id: string
+  kind: string
+  status: 'queued' | 'running' | 'completed' | 'failed'
+  stage: string
+  progress: number
+  result: RecordAudioResponse | null
+  error: string | null
+}
+
 export interface ProcessSessionRequest {
   transcript: string
   metadata: {
@@ -38,7 +51,7 @@ export interface ProcessSessionRequest {
     timestamp: string
     patient_id: string
     session_type: string
-    audio_file: string
+    audio_file: string | null
   }
 }
 
@@ -66,6 +79,7 @@ export interface SessionListItem {
 
 export interface SessionListResponse {
   sessions: SessionListItem[]
+  next_cursor: string | null
 }
 
 export interface SessionDetail {
@@ -105,8 +119,12 @@ export class CarelinkAPI {
     return response.json()
   }
 
-  async getSessions(limit: number = 100, offset: number = 0): Promise<SessionListResponse> {
-    const response = await fetch(`${this.baseUrl}/sessions?limit=${limit}&offset=${offset}`)
+  async getSessions(limit: number = 100, cursor?: string | null): Promise<SessionListResponse> {
+    const params = new URLSearchParams({ limit: String(limit) })
+    if (cursor) {
+      params.set('cursor', cursor)
+    }
+    const response = await fetch(`${this.baseUrl}/sessions?${params}`)
     
     if (!response.ok) {
       throw new Error(`Failed to get sessions: ${response.statusText}`)
@@ -126,7 +144,13 @@ export class CarelinkAPI {
   }
 
   // Audio recording and processing
-  async recordAudio(audioBlob: Blob, sessionType: string, patientId: string = "default_patient"): Promise<RecordAudioResponse> {
+  async recordAudio(
+    audioBlob: Blob,
+    sessionType: string,
+    patientId: string = "default_patient",
+    onProgress?: (job: RecordAudioJob) => void,
+    onPreview?: (preview: RecordAudioResponse) => void
+  ): Promise<RecordAudioResponse> {
     const formData = new FormData()
     formData.append('audio', audioBlob, 'recording.wav')
     formData.append('session_type', sessionType)
@@ -141,6 +165,33 @@ export class CarelinkAPI {
       throw new Error(`Failed to record audio: ${response.statusText}`)
     }
 
+    // Transcription runs in the background; poll until the job finishes
+    const { job_id } = await response.json()
+    let previewShown = false
+    while (true) {
+      const job = await this.getRecordAudioJob(job_id)
+      onProgress?.(job)
+      if (job.status === 'completed' && job.result) {
+        return job.result
+      }
+      if (!previewShown && job.result?.transcript_status === 'preview') {
+        previewShown = true
+        onPreview?.(job.result)
+      }
+      if (job.status === 'failed') {
+        throw new Error(`Failed to transcribe audio: ${job.error}`)
+      }
+      await new Promise((resolve) => setTimeout(resolve, 500))
+    }
+  }
+
+  async getRecordAudioJob(jobId: string): Promise<RecordAudioJob> {
+    const response = await fetch(`${this.baseUrl}/record-audio/${jobId}`)
+
+    if (!response.ok) {
+      throw new Error(`Failed to get transcription status: ${response.statusText}`)
+    }
+
     return response.json()
   }
 